@@ -6,27 +6,51 @@
 提供Web API接口
 """
 
-import os
-import re
-from flask import Flask, send_from_directory, jsonify, abort
+import hmac
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Flask, Response, jsonify, abort, redirect, request, stream_with_context
 
 from config import config
 from logger_config import get_logger
-from security_utils import security_validator
-from scheduler_manager import scheduler_manager
-
-# 创建Flask应用
-app = Flask(__name__)
+from security_utils import INVALID_PATH, NOT_FOUND, security_validator
+from compression_utils import StaticAsset, PrecompressedBody, choose_encoding, compress_response, news_cache
+from news_exporter import parse_time_arg, iter_news_records, iter_ndjson, iter_gzip, split_categories
+from llm_client import provider_stats
+from news_alerts import alert_dispatcher, subscription_registry
+from token_budget import token_ledger
+from news_dedup import dedup_index, filter_duplicates
+from entity_index import entity_index
+from news_digest import DATE_PATTERN, daily_digest, render_markdown as render_digest
+from news_parser import iter_items, to_document, to_markdown
+from news_stats import BUCKETS, news_stats
+from news_storage import news_storage
+from news_watcher import news_watcher
+from snapshot_store import snapshot_store
+from keyword_matcher import highlighter
+from scheduler_manager import SchedulerNotRunning, scheduler_manager
+from rate_limiter import ResourceBusy, rate_limiter, service_busy
+
+# 路由蓝图，由 create_app 注册到Flask应用
+bp = Blueprint('news', __name__)
 logger = get_logger('app')
 
+# 首页静态文件（预压缩，按内容哈希缓存）
+index_asset = StaticAsset(config.STATIC_DIR, 'index.html', 'text/html')
+
+
+def _arg_flag(name: str) -> bool:
+    """解析布尔查询参数，如 dedupe=true"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
 
 # 路由处理函数
-@app.route('/')
+@bp.route('/')
 def index():
-    """提供index.html文件"""
+    """跳转到带内容哈希的index.html：跳转本身不缓存，页面内容可被长期缓存，文件变化后哈希随之变化"""
     try:
         logger.info("访问首页")
-        return send_from_directory(config.STATIC_DIR, 'index.html')
+        return _redirect_no_cache('/' + index_asset.hashed_name)
     except FileNotFoundError:
         logger.error("index.html 文件不存在")
         return "index.html 文件不存在", 404
@@ -35,75 +59,266 @@ def index():
         return "服务器内部错误", 500
 
 
-@app.route('/news/<path:news_path>')
+@bp.route('/index.<version>.html')
+def index_hashed(version):
+    """提供带内容哈希的index.html，可被长期缓存；旧版本的地址跳转到当前版本"""
+    try:
+        body = index_asset.load()
+    except FileNotFoundError:
+        logger.error("index.html 文件不存在")
+        return "index.html 文件不存在", 404
+    if version != body.etag:
+        return _redirect_no_cache('/' + index_asset.hashed_name)
+    response = body.make_response(
+        request.headers.get('Accept-Encoding'),
+        {'Cache-Control': f'public, max-age={config.STATIC_CACHE_MAX_AGE}, immutable'}
+    )
+    return response.make_conditional(request)
+
+
+def _redirect_no_cache(location: str) -> Response:
+    response = redirect(location, 302)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@bp.route('/news/<path:news_path>')
 def get_news(news_path):
     """
     安全地提供新闻文件内容
     路径格式: /news/20250927/18-02-58
+    参数: dedupe=true 时去除已标记为重复的条目；structured=true 时附带结构化条目及重点标记；
+          format=json 时返回结构化总结 summary 而不是 markdown 格式的 content
     """
     logger.info(f"请求新闻文件: {news_path}")
+    client = request.remote_addr
+
+    # 校验路径格式，防止目录遍历；非法或最近确认不存在的路径不再访问磁盘
+    rejected = security_validator.check_news_path(news_path, client)
+    if rejected == INVALID_PATH:
+        abort(400, description="非法的文件路径")
+    if rejected == NOT_FOUND:
+        abort(404, description="文件不存在")
+
     try:
-        # 获取安全的文件路径
-        safe_path = security_validator.get_safe_file_path(news_path)
-        if safe_path is None:
-            logger.warning(f"检测到非法文件路径访问: {news_path}")
-            abort(400, description="非法的文件路径")
-
-        # 验证文件访问权限
-        can_access, error_msg = security_validator.validate_file_access(safe_path)
-        if not can_access:
-            if "不存在" in error_msg:
-                logger.warning(f"请求的文件不存在: {news_path}")
-                abort(404, description=error_msg)
-            elif "权限" in error_msg:
-                logger.error(f"没有权限访问文件: {news_path}")
-                abort(403, description=error_msg)
-            else:
-                logger.error(f"文件访问验证失败: {news_path}, 错误: {error_msg}")
-                abort(500, description=f"服务器内部错误: {error_msg}")
-
-        # 读取文件内容
-        with open(safe_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        logger.info(f"成功读取新闻文件: {safe_path}")
-        return jsonify({
+        body = _news_body(news_path, _arg_flag('dedupe'), _arg_flag('structured'),
+                          request.args.get('format') == 'json')
+    except PermissionError as e:
+        logger.error(f"没有权限访问文件: {news_path}, 错误: {e}")
+        abort(403, description="没有读取权限")
+    except Exception as e:
+        logger.error(f"获取新闻文件时发生错误: {e}, 路径: {news_path}")
+        abort(500, description=f"服务器内部错误: {str(e)}")
+
+    if body is None:
+        security_validator.remember_missing(news_path, client)
+        abort(404, description="文件不存在")
+
+    logger.info(f"成功读取新闻: {news_path}")
+    response = body.make_response(request.headers.get('Accept-Encoding'))
+    return response.make_conditional(request)
+
+
+def _news_body(news_path, dedupe, structured, as_json=False):
+    """
+    生成（或从缓存取出）新闻响应体，新闻不存在时返回None
+
+    新闻可能保存为 markdown 或结构化总结（LLM_OUTPUT_FORMAT = 'json'），按存储记录的格式解析，
+    按请求的格式转换，转换结果随响应体缓存
+    """
+    version = news_storage.version(news_path)
+    if version is None:
+        return None
+    if dedupe:
+        # 去重视图还取决于去重索引中的标记
+        version += (frozenset(dedup_index.get_duplicates(news_path)),)
+    cache_key = (news_path, dedupe, structured, as_json)
+
+    body = news_cache.get(cache_key, version)
+    if body is None:
+        summary = news_storage.read_summary(news_path)
+        if summary is None:
+            # 在读取前被清理任务删除
+            return None
+        content, fmt = summary
+        if dedupe:
+            content = filter_duplicates(content, news_path, fmt)
+        payload = {
             'success': True,
-            'path': news_path,
-            'content': content
-        })
+            'path': news_path
+        }
+        if as_json:
+            payload['summary'] = to_document(content, fmt)
+        else:
+            payload['content'] = to_markdown(content, fmt)
+        if structured:
+            payload['items'] = [
+                dict(item, keywords=highlighter.match(item['text'])) for item in iter_items(content, fmt)
+            ]
+            payload['snapshot_id'] = snapshot_store.snapshot_for(news_path)
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        body = PrecompressedBody(data, 'application/json')
+        news_cache.put(cache_key, version, body)
+    return body
+
+
+@bp.route('/news/<date>/digest')
+def get_digest(date):
+    """
+    当天汇总：合并当天各次运行的总结，去除重复条目并按分类分组
+    路径格式: /news/20250927/digest
+    参数: structured=true 时附带条目、出现次数及首次出现的新闻路径
+    """
+    logger.info(f"请求每日汇总: {date}")
+    if not DATE_PATTERN.match(date):
+        abort(400, description="日期格式应为 YYYYMMDD")
 
+    try:
+        body = _digest_body(date, _arg_flag('structured'))
     except Exception as e:
-        logger.error(f"获取新闻文件时发生错误: {e}, 路径: {news_path}")
+        logger.error(f"获取每日汇总时发生错误: {e}, 日期: {date}")
         abort(500, description=f"服务器内部错误: {str(e)}")
 
+    if body is None:
+        abort(404, description=f"没有 {date} 的新闻")
+    response = body.make_response(request.headers.get('Accept-Encoding'))
+    return response.make_conditional(request)
 
-@app.route('/news/list')
-def list_news():
-    """列出所有可用的新闻文件"""
-    logger.info("请求新闻文件列表")
+
+def _digest_body(date, structured):
+    """生成（或从缓存取出）汇总响应体，当天没有汇总时返回None"""
+    version = daily_digest.version(date)
+    if version is None:
+        return None
+
+    cache_key = ('digest', date, structured)
+    body = news_cache.get(cache_key, version)
+    if body is None:
+        data = daily_digest.get(date)
+        payload = {
+            'success': True,
+            'date': date,
+            'sources': data['sources'],
+            'content': render_digest(data, date)
+        }
+        if structured:
+            payload['items'] = [
+                {key: item[key] for key in ('category', 'text', 'highlighted', 'count', 'path', 'last_seen')}
+                for item in data['items']
+            ]
+        body = PrecompressedBody(json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+        news_cache.put(cache_key, version, body)
+    return body
+
+
+@bp.route('/news/stats')
+def get_stats():
+    """
+    按小时或按天的新闻统计：运行次数、条目数、重点条目数、各分类和各重点关键词的条目数
+    参数: from, to（YYYYMMDD 或 ISO 时间，默认最近 STATS_DEFAULT_DAYS 天）, bucket=hour|day（默认 day）
+    """
+    try:
+        end = parse_time_arg(request.args.get('to'), end_of_day=True) or datetime.now()
+        start = parse_time_arg(request.args.get('from')) or \
+            (end - timedelta(days=config.STATS_DEFAULT_DAYS - 1)).replace(hour=0, minute=0, second=0)
+    except ValueError as e:
+        abort(400, description=str(e))
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        abort(400, description=f"bucket 只能是 {' / '.join(BUCKETS)}")
+    if end < start:
+        abort(400, description="to 不能早于 from")
+    if (end - start).total_seconds() > config.STATS_MAX_HOURS * 3600:
+        abort(400, description=f"时间范围不能超过 {config.STATS_MAX_HOURS} 小时")
+
+    start_key = start.strftime('%Y%m%d%H')
+    end_key = end.strftime('%Y%m%d%H')
+    cache_key = ('stats', start_key, end_key, bucket)
+    version = news_stats.version() or (0, 0)
     try:
-        news_files = []
+        body = news_cache.get(cache_key, version)
+        if body is None:
+            result = news_stats.query(start, end, bucket)
+            payload = {
+                'success': True,
+                'from': start.strftime('%Y-%m-%dT%H:00'),
+                'to': end.strftime('%Y-%m-%dT%H:00'),
+                'bucket': bucket,
+                **result
+            }
+            body = PrecompressedBody(json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+            news_cache.put(cache_key, version, body)
+    except Exception as e:
+        logger.error(f"获取新闻统计时发生错误: {e}")
+        abort(500, description=f"服务器内部错误: {str(e)}")
 
-        if not os.path.exists(config.NEWS_DIR):
-            logger.warning(f"新闻目录不存在: {config.NEWS_DIR}")
-            return jsonify({'success': True, 'files': []})
+    response = body.make_response(request.headers.get('Accept-Encoding'))
+    return response.make_conditional(request)
 
-        # 遍历news目录
-        for date_dir in os.listdir(config.NEWS_DIR):
-            date_path = os.path.join(config.NEWS_DIR, date_dir)
 
-            # 检查是否是目录且符合日期格式
-            if os.path.isdir(date_path) and re.match(r'^\d{8}$', date_dir):
-                # 遍历日期目录下的文件
-                for filename in os.listdir(date_path):
-                    if filename.endswith('.md'):
-                        # 移除.md扩展名
-                        time_part = filename[:-3]
-                        news_files.append(f"{date_dir}/{time_part}")
+@bp.route('/news/entity/<query>')
+def get_entity(query):
+    """
+    提到某只股票的新闻条目（最新的在前），可按代码、名称或别名查询
+    参数: limit（默认且最多 ENTITY_QUERY_LIMIT 条）
+    """
+    try:
+        limit = int(request.args.get('limit', config.ENTITY_QUERY_LIMIT))
+    except ValueError:
+        abort(400, description="limit 必须是整数")
+    if limit <= 0:
+        abort(400, description="limit 必须大于0")
+    limit = min(limit, config.ENTITY_QUERY_LIMIT)
+
+    cache_key = ('entity', query, limit)
+    version = entity_index.version() or (0, 0)
+    try:
+        body = news_cache.get(cache_key, version)
+        if body is None:
+            result = entity_index.query(query, limit)
+            if result is not None:
+                payload = {'success': True, **result}
+                body = PrecompressedBody(json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+                news_cache.put(cache_key, version, body)
+    except Exception as e:
+        logger.error(f"查询实体索引时发生错误: {e}, 实体: {query}")
+        abort(500, description=f"服务器内部错误: {str(e)}")
+
+    if body is None:
+        abort(404, description=f"股票词典中没有: {query}")
+
+    response = body.make_response(request.headers.get('Accept-Encoding'))
+    return response.make_conditional(request)
+
+
+@bp.route('/news/list')
+def list_news():
+    """
+    列出所有可用的新闻文件
+    参数: dedupe=true 时不列出全部由重复条目组成的文件
+    """
+    logger.info("请求新闻文件列表")
+    try:
+        dedupe = _arg_flag('dedupe')
+        if news_watcher.running and not dedupe:
+            # 列表由目录监视增量维护，响应体按列表版本缓存
+            version = news_watcher.version
+            body = news_cache.get(('list',), version)
+            if body is None:
+                news_files = news_watcher.paths()
+                body = PrecompressedBody(
+                    json.dumps({'success': True, 'files': news_files}, ensure_ascii=False).encode('utf-8'),
+                    'application/json'
+                )
+                news_cache.put(('list',), version, body)
+            response = body.make_response(request.headers.get('Accept-Encoding'))
+            return response.make_conditional(request)
 
         # 按时间排序（最新的在前）
-        news_files.sort(reverse=True)
+        news_files = news_watcher.paths() if news_watcher.running else news_storage.list_paths()
+
+        if dedupe:
+            news_files = [f for f in news_files if not dedup_index.is_fully_duplicate(f)]
 
         logger.info(f"成功获取新闻文件列表，共 {len(news_files)} 个文件")
         return jsonify({
@@ -116,7 +331,46 @@ def list_news():
         abort(500, description=f"服务器内部错误: {str(e)}")
 
 
-@app.route('/scheduler/status')
+@bp.route('/export')
+def export_news():
+    """
+    以 NDJSON 流式导出新闻条目
+    参数: from, to（YYYYMMDD 或 ISO 时间）, category（可重复或逗号分隔）, dedupe=true
+    """
+    logger.info(f"请求导出新闻: {request.query_string.decode('utf-8', 'replace')}")
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'), end_of_day=True)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    categories = split_categories(request.args.getlist('category'))
+    chunks = iter_ndjson(iter_news_records(start, end, categories, dedupe=_arg_flag('dedupe')))
+
+    headers = {'Cache-Control': 'no-store', 'Vary': 'Accept-Encoding'}
+    if choose_encoding(request.headers.get('Accept-Encoding'), ('gzip',)):
+        chunks = iter_gzip(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/x-ndjson',
+        headers=headers
+    )
+
+
+def _job_queue_status():
+    if config.FETCH_MODE != 'queue':
+        return None
+    from job_queue import get_job_queue
+    try:
+        return get_job_queue().get_status()
+    except Exception as e:
+        logger.error(f"获取任务队列状态失败: {e}")
+        return {'error': str(e)}
+
+
+@bp.route('/scheduler/status')
 def scheduler_status():
     """获取调度器状态"""
     logger.info("请求调度器状态")
@@ -124,14 +378,25 @@ def scheduler_status():
         status = scheduler_manager.get_status()
         return jsonify({
             'success': True,
-            **status
+            **status,
+            'alerts': alert_dispatcher.get_status(),
+            'llm_providers': provider_stats.summary(),
+            'token_usage': token_ledger.get_status(),
+            'news_watcher': news_watcher.get_status(),
+            'rate_limit': rate_limiter.get_status(),
+            'job_queue': _job_queue_status()
         })
     except Exception as e:
         logger.error(f"获取调度器状态时发生错误: {e}")
         abort(500, description=f"服务器内部错误: {str(e)}")
 
 
-@app.route('/scheduler/run-now')
+def _client_addr():
+    return request.remote_addr
+
+
+@bp.route('/scheduler/run-now')
+@rate_limiter.limit('run-now', config.RUN_NOW_PER_MINUTE, config.RUN_NOW_BURST, _client_addr)
 def run_news_now():
     """手动执行一次新闻抓取"""
     logger.info("收到手动执行新闻抓取请求")
@@ -142,60 +407,118 @@ def run_news_now():
             'message': '手动执行任务已添加到队列',
             'job_id': job_id
         })
+    except ResourceBusy as e:
+        return service_busy(e)
+    except SchedulerNotRunning as e:
+        logger.error(str(e))
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         logger.error(f"添加手动执行任务时发生错误: {e}")
         abort(500, description=f"服务器内部错误: {str(e)}")
 
 
-@app.route('/scheduler/cleanup-now')
+@bp.route('/scheduler/cleanup-now')
+@rate_limiter.limit('cleanup-now', config.CLEANUP_NOW_PER_MINUTE, config.CLEANUP_NOW_BURST, _client_addr)
 def run_cleanup_now():
-    """手动执行一次新闻清理"""
+    """手动执行一次新闻清理（后台执行，结果见 /scheduler/status 的 last_cleanup）"""
     logger.info("收到手动执行新闻清理请求")
     try:
-        from news_cleaner import clean_old_news
-        result = clean_old_news()
-
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'message': '新闻清理执行成功',
-                'deleted_files': result['deleted_files'],
-                'deleted_dirs': result['deleted_dirs'],
-                'cutoff_time': result['cutoff_time']
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': '新闻清理执行失败',
-                'error': result['error'],
-                'deleted_files': result['deleted_files'],
-                'deleted_dirs': result['deleted_dirs']
-            }), 500
+        job_id = scheduler_manager.add_manual_cleanup_job()
+        return jsonify({
+            'success': True,
+            'message': '新闻清理任务已添加到队列',
+            'job_id': job_id
+        }), 202
+    except ResourceBusy as e:
+        return service_busy(e)
+    except SchedulerNotRunning as e:
+        logger.error(str(e))
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
-        logger.error(f"执行新闻清理时发生错误: {e}")
+        logger.error(f"添加新闻清理任务时发生错误: {e}")
         abort(500, description=f"服务器内部错误: {str(e)}")
 
 
+def _require_alert_token() -> None:
+    """
+    订阅管理接口需要令牌（请求头 Authorization: Bearer <ALERT_ADMIN_TOKEN>）；
+    未配置令牌时接口关闭，否则任何人都能让服务器向任意地址发送请求
+    """
+    if not config.ALERT_ADMIN_TOKEN:
+        abort(403, description="未配置 ALERT_ADMIN_TOKEN，订阅管理接口已关闭")
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else ''
+    if not hmac.compare_digest(token.encode('utf-8'), config.ALERT_ADMIN_TOKEN.encode('utf-8')):
+        abort(401, description="订阅管理令牌无效")
+
+
+@bp.route('/alerts/subscriptions', methods=['GET'])
+def list_subscriptions():
+    """列出关键词订阅"""
+    _require_alert_token()
+    logger.info("请求关键词订阅列表")
+    return jsonify({'success': True, 'subscriptions': subscription_registry.list()})
+
+
+@bp.route('/alerts/subscriptions', methods=['POST'])
+def add_subscription():
+    """
+    添加关键词订阅
+    请求体: {"keywords": ["宁德时代", "算力"], "url": "https://example.com/webhook"}
+    """
+    _require_alert_token()
+    body = request.get_json(silent=True) or {}
+    keywords = body.get('keywords')
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    try:
+        subscription = subscription_registry.add(keywords or [], body.get('url'))
+    except ValueError as e:
+        abort(400, description=str(e))
+    return jsonify({'success': True, 'subscription': subscription}), 201
+
+
+@bp.route('/alerts/subscriptions/<subscription_id>', methods=['DELETE'])
+def delete_subscription(subscription_id):
+    """删除关键词订阅"""
+    _require_alert_token()
+    if not subscription_registry.remove(subscription_id):
+        abort(404, description="订阅不存在")
+    return jsonify({'success': True})
+
+
+@bp.after_app_request
+def after_request(response):
+    """对较大的JSON响应按客户端支持的编码压缩"""
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+
 # 错误处理器
-@app.errorhandler(400)
+@bp.app_errorhandler(400)
 def bad_request(error):
-    logger.warning(f"400错误: {error.description}")
+    security_validator.log_throttle.warning(logger, request.remote_addr, f"400错误: {error.description}")
     return jsonify({'success': False, 'error': str(error.description)}), 400
 
 
-@app.errorhandler(403)
+@bp.app_errorhandler(401)
+def unauthorized(error):
+    security_validator.log_throttle.warning(logger, request.remote_addr, f"401错误: {error.description}")
+    return jsonify({'success': False, 'error': str(error.description)}), 401
+
+
+@bp.app_errorhandler(403)
 def forbidden(error):
-    logger.warning(f"403错误: {error.description}")
+    security_validator.log_throttle.warning(logger, request.remote_addr, f"403错误: {error.description}")
     return jsonify({'success': False, 'error': str(error.description)}), 403
 
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
-    logger.warning(f"404错误: {error.description}")
+    security_validator.log_throttle.warning(logger, request.remote_addr, f"404错误: {error.description}")
     return jsonify({'success': False, 'error': str(error.description)}), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     logger.error(f"500错误: {error.description}")
     return jsonify({'success': False, 'error': str(error.description)}), 500
@@ -204,6 +527,16 @@ def internal_error(error):
 def create_app():
     """创建并配置Flask应用"""
     logger.info("创建Flask应用")
+    config.ensure_dirs()
+
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+
+    # 启动时预压缩首页，避免首个请求承担压缩开销
+    try:
+        index_asset.load()
+    except FileNotFoundError:
+        logger.error("index.html 文件不存在")
     return app
 
 
@@ -211,4 +544,5 @@ if __name__ == '__main__':
     # 这个文件现在主要作为模块导入使用
     # 实际启动应该使用 run.py
     logger.warning("建议使用 run.py 启动应用")
+    app = create_app()
     app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
\ No newline at end of file
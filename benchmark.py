@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能基准测试脚本
+生成不同规模的合成 news/ 目录，测量读接口、清理任务和抓取流程的耗时，
+结果以 JSON 输出，便于前后对比
+
+用法:
+    python3 benchmark.py --sizes day,month -o bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 合成目录规模：(天数, 每天运行次数)
+TREE_SIZES = {
+    'day': (1, 24),
+    'month': (30, 24),
+    'year': (365, 24),
+}
+
+# 各入口模块的导入耗时预算（毫秒，-X importtime 的累计时间）
+IMPORT_TIME_BUDGETS_MS = {
+    'app': 400,
+    'run': 450,
+    'news_cleaner': 100,
+    'news_exporter': 100,
+    'news_fetcher': 100,
+    'scheduler_manager': 100,
+}
+
+CATEGORIES = ('科技', '金融', '能源', '医药', '消费', '地产', '海外')
+WORDS = ('央行', '算力', '人工智能', '降准', '新能源', '芯片', '出口', '政策会议', '海外投行', '订单', '业绩', '并购')
+
+FAKE_SUMMARY = """## 科技
+- 某公司发布新一代芯片
+- <font color="red">人工智能产业政策会议召开</font>
+
+## 金融
+- 央行开展逆回购操作
+"""
+
+FAKE_SUMMARY_JSON = json.dumps({'sections': [
+    {'category': '科技', 'items': [
+        {'text': '某公司发布新一代芯片', 'highlight': False, 'source_time': '09:30'},
+        {'text': '人工智能产业政策会议召开', 'highlight': True, 'source_time': '09:12'},
+    ]},
+    {'category': '金融', 'items': [{'text': '央行开展逆回购操作', 'highlight': False, 'source_time': None}]},
+]}, ensure_ascii=False)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """计算百分位数（样本已排序）"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(pct / 100.0 * (len(samples) - 1)))))
+    return samples[index]
+
+
+def summarize_samples(samples: List[float], wall_time: float) -> Dict[str, float]:
+    """汇总延迟样本（秒）为毫秒统计和吞吐量"""
+    ordered = sorted(samples)
+    return {
+        'requests': len(ordered),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        'throughput_rps': round(len(ordered) / wall_time, 1) if wall_time > 0 else 0.0,
+    }
+
+
+def generate_news_tree(news_dir: str, days: int, runs_per_day: int,
+                       items_per_run: int = 30, end: Optional[datetime] = None,
+                       seed: int = 42) -> List[str]:
+    """
+    生成合成新闻目录
+
+    Args:
+        news_dir: 目标 news 目录
+        days: 天数
+        runs_per_day: 每天的运行次数（均匀分布）
+        items_per_run: 每个文件的新闻条数
+        end: 最后一次运行的时间，默认为当前时间
+        seed: 随机种子，保证结果可复现
+
+    Returns:
+        List[str]: 生成的新闻路径 YYYYMMDD/HH-MM-SS
+    """
+    rng = random.Random(seed)
+    end = (end or datetime.now()).replace(microsecond=0)
+    interval = timedelta(seconds=86400 // runs_per_day)
+    total = days * runs_per_day
+    paths = []
+
+    for i in range(total):
+        run_time = end - interval * (total - 1 - i)
+        date_dir = os.path.join(news_dir, run_time.strftime('%Y%m%d'))
+        os.makedirs(date_dir, exist_ok=True)
+
+        lines = []
+        for category in rng.sample(CATEGORIES, 4):
+            lines.append(f"## {category}")
+            for _ in range(items_per_run // 4):
+                text = ''.join(rng.choice(WORDS) for _ in range(4))
+                if rng.random() < 0.1:
+                    lines.append(f'- <font color="red">{text}</font>')
+                else:
+                    lines.append(f"- {text}")
+            lines.append('')
+
+        with open(os.path.join(date_dir, run_time.strftime('%H-%M-%S.md')), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        paths.append(run_time.strftime('%Y%m%d/%H-%M-%S'))
+
+    return paths
+
+
+@contextmanager
+def news_dir_override(news_dir: str) -> Iterator[None]:
+    """临时将应用的新闻目录指向合成目录"""
+    from config import config
+    from compression_utils import news_cache
+
+    old_config = config.NEWS_DIR
+    config.NEWS_DIR = news_dir
+    news_cache.clear()
+    try:
+        yield
+    finally:
+        config.NEWS_DIR = old_config
+        news_cache.clear()
+
+
+def run_requests(send: Callable[[str], int], paths: List[str],
+                 concurrency: int = 1) -> Dict[str, float]:
+    """按给定并发依次请求路径，返回延迟统计"""
+    samples: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(path: str) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        status = send(path)
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append(elapsed)
+            if status != 200:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    if concurrency <= 1:
+        for path in paths:
+            one(path)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, paths))
+    wall_time = time.perf_counter() - wall_start
+
+    result = summarize_samples(samples, wall_time)
+    result['errors'] = errors
+    return result
+
+
+def read_path_targets(news_paths: List[str], count: int, seed: int = 7) -> Dict[str, List[str]]:
+    """生成读接口的请求路径"""
+    rng = random.Random(seed)
+    return {
+        'list': ['/news/list'] * max(1, count // 10),
+        'get': [f"/news/{rng.choice(news_paths)}" for _ in range(count)],
+    }
+
+
+def measure_import_time(module: str, repeat: int = 3) -> float:
+    """
+    在全新解释器中用 -X importtime 测量模块导入耗时
+
+    Returns:
+        float: 多次测量的中位数（毫秒）
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo_dir)
+    samples = []
+    with tempfile.TemporaryDirectory(prefix='news-import-') as work_dir:
+        for _ in range(repeat):
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                cwd=work_dir, env=env, capture_output=True, text=True, timeout=60
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"导入 {module} 失败: {proc.stderr.strip()[-500:]}")
+            for line in proc.stderr.splitlines():
+                # 格式: import time: self [us] | cumulative | imported package
+                parts = line.split('|')
+                if len(parts) == 3 and parts[2].rstrip() == f' {module}':
+                    samples.append(int(parts[1]) / 1000.0)
+                    break
+    return round(statistics.median(samples), 1) if samples else 0.0
+
+
+def check_import_times(budgets: Dict[str, float]) -> Dict[str, Any]:
+    """测量各入口模块导入耗时并与预算比较"""
+    results = {}
+    for module, budget in budgets.items():
+        elapsed = measure_import_time(module)
+        results[module] = {
+            'cumulative_ms': elapsed,
+            'budget_ms': budget,
+            'within_budget': elapsed <= budget,
+        }
+    return results
+
+
+# 目录遍历输入的组成部分，随机组合后交给路径校验
+TRAVERSAL_FRAGMENTS = (
+    '..', '../', '..\\', '%2e%2e', '%2f', '/', '//', '~', '~root', '\x00', '\n', ' ', '.', './',
+    '/etc/passwd', 'C:\\', '20250927', '18-02-58', '٢٠٢٥٠٩٢٧', '１８-０２-５８', '20250927/', '/18-02-58',
+    '.md', '%00', '..%2f', '\u2025', '\uff0e\uff0e',
+)
+
+
+def generate_traversal_inputs(count: int, seed: int = 11) -> List[str]:
+    """生成随机的目录遍历输入，以及在合法路径前后拼接攻击片段的变体"""
+    rng = random.Random(seed)
+    inputs = ['20250927/18-02-58\n', '../20250927/18-02-58', '20250927/../../etc/passwd',
+              '/20250927/18-02-58', '20250927/18-02-58/..', '٢٠٢٥٠٩٢٧/١٨-٠٢-٥٨']
+    for _ in range(count):
+        parts = [rng.choice(TRAVERSAL_FRAGMENTS) for _ in range(rng.randint(1, 6))]
+        if rng.random() < 0.5:
+            parts.insert(rng.randint(0, len(parts)), '20250927/18-02-58')
+        inputs.append(''.join(parts))
+    return inputs
+
+
+def check_path_validation(news_dir: str, count: int = 5000) -> Dict[str, Any]:
+    """
+    路径校验的性质检查：任何被接受的输入都必须是 ASCII 的 YYYYMMDD/HH-MM-SS，
+    且解析后的文件位于新闻目录内
+
+    Returns:
+        Dict[str, Any]: 检查结果，violations 非空表示存在问题
+    """
+    import re
+    from news_parser import SUMMARY_FORMATS
+    from news_storage import FileStorage
+    from security_utils import SecurityValidator
+
+    validator = SecurityValidator()
+    validator.log_throttle.burst = 0
+    storage = FileStorage(news_dir)
+    strict = re.compile(r'[0-9]{8}/[0-9]{2}-[0-9]{2}-[0-9]{2}')
+    root = os.path.realpath(news_dir) + os.sep
+    accepted = 0
+    violations = []
+    for value in generate_traversal_inputs(count):
+        if not validator.is_safe_path(value):
+            continue
+        accepted += 1
+        file_paths = [storage.file_path(value, fmt) for fmt in SUMMARY_FORMATS]
+        if not strict.fullmatch(value) or not all(
+                file_path and os.path.realpath(file_path).startswith(root) for file_path in file_paths):
+            violations.append(value)
+    return {'inputs': count, 'accepted': accepted, 'violations': violations}
+
+
+def bench_summary_formats(news_dir: str, news_paths: List[str], iterations: int) -> Dict[str, Any]:
+    """
+    对比 markdown 和结构化（JSON）总结的读取开销：逐条解析条目（索引、去重、汇总使用），
+    以及 /news/<path>?format=json 的结构化转换
+    """
+    from news_parser import dump_summary, iter_items, to_document
+
+    markdown = []
+    for news_path in news_paths[:iterations]:
+        with open(os.path.join(news_dir, news_path + '.md'), 'r', encoding='utf-8') as f:
+            markdown.append(f.read())
+    structured = [dump_summary(to_document(content, 'markdown')) for content in markdown]
+
+    def measure(contents: List[str], func: Callable[[str], Any]) -> Dict[str, float]:
+        samples = []
+        wall_start = time.perf_counter()
+        for content in contents:
+            start = time.perf_counter()
+            func(content)
+            samples.append(time.perf_counter() - start)
+        return summarize_samples(samples, time.perf_counter() - wall_start)
+
+    return {
+        'items_markdown': measure(markdown, lambda content: list(iter_items(content, 'markdown'))),
+        'items_json': measure(structured, lambda content: list(iter_items(content, 'json'))),
+        'document_markdown': measure(markdown, lambda content: to_document(content, 'markdown')),
+        'document_json': measure(structured, lambda content: to_document(content, 'json')),
+        'bytes_markdown': sum(len(content.encode('utf-8')) for content in markdown),
+        'bytes_json': sum(len(content.encode('utf-8')) for content in structured),
+    }
+
+
+def bench_stats(work_dir: str, news_dir: str, iterations: int) -> Dict[str, Any]:
+    """统计重建耗时，以及按天/按小时查询整个范围的延迟（不经过响应缓存）"""
+    from news_stats import NewsStats
+    from news_storage import FileStorage
+
+    stats = NewsStats(os.path.join(work_dir, 'news_stats.db'))
+    start = time.perf_counter()
+    runs = stats.catch_up(FileStorage(news_dir))
+    rebuild_seconds = time.perf_counter() - start
+
+    first_key, last_key = stats.hour_range()
+    first = datetime.strptime(first_key, '%Y%m%d%H')
+    last = datetime.strptime(last_key, '%Y%m%d%H')
+    hours = sum(1 for bucket in stats.query(first, last, 'hour')['buckets'] if bucket['runs'])
+    result: Dict[str, Any] = {'runs': runs, 'hour_buckets': hours, 'rebuild_ms': round(rebuild_seconds * 1000, 3)}
+    for bucket in ('day', 'hour'):
+        samples = []
+        wall_start = time.perf_counter()
+        for _ in range(min(iterations, 50)):
+            start = time.perf_counter()
+            stats.query(first, last, bucket)
+            samples.append(time.perf_counter() - start)
+        result[f'query_{bucket}'] = summarize_samples(samples, time.perf_counter() - wall_start)
+    return result
+
+
+def bench_path_validation(news_dir: str, news_paths: List[str], iterations: int) -> Dict[str, Any]:
+    """
+    对比旧的路径校验（未编译正则 + safe_join + exists/isfile/access 三次系统调用）
+    与新的快速路径（预编译正则 + 不存在路径的短期缓存 + 一次 os.stat）
+    """
+    import re
+    from werkzeug.security import safe_join
+    from config import config
+    from security_utils import NOT_FOUND, SecurityValidator
+
+    def legacy(news_path: str) -> bool:
+        if any(char in news_path for char in config.DANGEROUS_CHARS) or os.path.isabs(news_path):
+            return False
+        if not re.match(config.ALLOWED_PATH_PATTERN, news_path):
+            return False
+        safe_path = safe_join(news_dir, news_path + '.md')
+        if safe_path is None or not safe_path.startswith(news_dir):
+            return False
+        return os.path.exists(safe_path) and os.path.isfile(safe_path) and os.access(safe_path, os.R_OK)
+
+    validator = SecurityValidator()
+    validator.log_throttle.burst = 0
+
+    def fast(news_path: str) -> bool:
+        if validator.check_news_path(news_path) is not None:
+            return False
+        try:
+            os.stat(os.path.join(news_dir, news_path + '.md'))
+        except FileNotFoundError:
+            validator.negative_cache.put(news_path, NOT_FOUND)
+            return False
+        return True
+
+    rng = random.Random(5)
+    inputs = {
+        'valid': [rng.choice(news_paths) for _ in range(iterations)],
+        'missing': ['19990101/00-00-%02d' % (i % 5) for i in range(iterations)],
+        'traversal': [rng.choice(generate_traversal_inputs(200)) for _ in range(iterations)],
+    }
+    logging.disable(logging.WARNING)
+    try:
+        results = {}
+        for kind, values in inputs.items():
+            results[kind] = {}
+            for name, check in (('legacy', legacy), ('fast', fast)):
+                start = time.perf_counter()
+                for value in values:
+                    check(value)
+                elapsed = time.perf_counter() - start
+                results[kind][f'{name}_us'] = round(elapsed / len(values) * 1e6, 2)
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def bench_test_client(app, news_paths: List[str], count: int) -> Dict[str, Any]:
+    """通过 Flask 测试客户端测量读接口"""
+    client = app.test_client()
+    targets = read_path_targets(news_paths, count)
+    headers = {'Accept-Encoding': 'gzip'}
+
+    def send(path: str) -> int:
+        return client.get(path, headers=headers).status_code
+
+    return {name: run_requests(send, paths) for name, paths in targets.items()}
+
+
+def bench_real_server(app, news_paths: List[str], count: int, concurrency: int) -> Dict[str, Any]:
+    """启动真实 HTTP 服务测量读接口"""
+    import requests
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    local = threading.local()
+
+    def send(path: str) -> int:
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        return session.get(base_url + path, timeout=30).status_code
+
+    try:
+        targets = read_path_targets(news_paths, count)
+        return {name: run_requests(send, paths, concurrency) for name, paths in targets.items()}
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def bench_cleanup(news_dir: str, days: int, runs_per_day: int) -> Dict[str, Any]:
+    """测量清理任务耗时（约一半文件过期）"""
+    from news_cleaner import clean_old_news
+
+    generate_news_tree(news_dir, days, runs_per_day)
+    threshold = max(1, days * 24 // 2)
+    start = time.perf_counter()
+    result = clean_old_news(hours_threshold=threshold, news_dir=news_dir, prune_indexes=False)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': round(elapsed, 4),
+        'hours_threshold': threshold,
+        'deleted_files': result['deleted_files'],
+        'deleted_dirs': result['deleted_dirs'],
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """本地新闻页面和 OpenAI 兼容接口的桩服务"""
+
+    latency = 0.0
+    page = '<html><body>' + ''.join(
+        f'<div class="telegraph">{i}: ' + '央行 算力 人工智能 ' * 10 + '</div>' for i in range(200)
+    ) + '</body></html>'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        body = self.page.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = json.loads(self.rfile.read(length) or b'{}')
+        # 请求结构化输出时返回JSON总结
+        content = FAKE_SUMMARY_JSON if request_body.get('response_format') else FAKE_SUMMARY
+        if self.latency:
+            time.sleep(self.latency)
+        self._send_json({
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'bench-model',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 1000, 'completion_tokens': 100, 'total_tokens': 1100}
+        })
+
+
+@contextmanager
+def stub_server(latency: float = 0.0) -> Iterator[str]:
+    """启动桩服务，返回基础地址"""
+    handler = type('BenchStubHandler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+@contextmanager
+def env_override(values: Dict[str, str]) -> Iterator[None]:
+    """临时设置环境变量（子进程继承）"""
+    old = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in old.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _run_fetches(fetcher, runs: int) -> Dict[str, Any]:
+    samples = []
+    failures = 0
+    wall_start = time.perf_counter()
+    for _ in range(runs):
+        start = time.perf_counter()
+        success, _, error = fetcher.run_news_script()
+        samples.append(time.perf_counter() - start)
+        if not success:
+            failures += 1
+            print(f"抓取流程失败: {error}", file=sys.stderr)
+    result = summarize_samples(samples, time.perf_counter() - wall_start)
+    result['failures'] = failures
+    return result
+
+
+def bench_fetch_pipeline(work_dir: str, runs: int, llm_latency: float,
+                         cassette_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    通过 NewsFetcher 执行完整抓取流程
+
+    默认网页和LLM均由本地桩服务提供；指定 cassette_dir 时回放录制的真实网页和LLM响应（见 cassette.py），
+    llm_latency 作为注入的LLM延迟
+    """
+    from news_fetcher import NewsFetcher
+
+    fetcher = NewsFetcher()
+    fetcher.script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'news.py')
+    fetcher.work_dir = work_dir
+
+    if cassette_dir:
+        from cassette import use_cassette
+        with use_cassette(cassette_dir, 'replay', latency=llm_latency) as server:
+            result = _run_fetches(fetcher, runs)
+            result['cassette'] = server.get_status()
+    else:
+        with stub_server(llm_latency) as base_url:
+            env = {
+                'NEWS_SOURCE_URL': f"{base_url}/telegraph",
+                'OPENAI_BASE_URL': f"{base_url}/v1",
+                'OPENAI_API_KEY': 'bench-key',
+                'DEFAULT_MODEL': 'bench-model',
+            }
+            with env_override(env):
+                result = _run_fetches(fetcher, runs)
+
+    result['llm_latency_ms'] = llm_latency * 1000
+    return result
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """执行所有基准测试"""
+    results: Dict[str, Any] = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'sizes': {},
+    }
+
+    results['import_times'] = check_import_times(IMPORT_TIME_BUDGETS_MS)
+
+    root = tempfile.mkdtemp(prefix='news-bench-')
+    try:
+        from app import create_app
+        app = create_app()
+
+        for size in args.sizes:
+            days, runs_per_day = TREE_SIZES[size]
+            news_dir = os.path.join(root, size, 'news')
+            gen_start = time.perf_counter()
+            news_paths = generate_news_tree(news_dir, days, runs_per_day)
+            size_result: Dict[str, Any] = {
+                'files': len(news_paths),
+                'generate_seconds': round(time.perf_counter() - gen_start, 3),
+            }
+
+            with news_dir_override(news_dir):
+                size_result['test_client'] = bench_test_client(app, news_paths, args.requests)
+                if not args.skip_server:
+                    size_result['real_server'] = bench_real_server(
+                        app, news_paths, args.requests, args.concurrency)
+
+            size_result['path_validation'] = bench_path_validation(news_dir, news_paths, args.requests)
+            size_result['summary_formats'] = bench_summary_formats(news_dir, news_paths, args.requests)
+            size_result['stats'] = bench_stats(os.path.join(root, size), news_dir, args.requests)
+            size_result['cleanup'] = bench_cleanup(os.path.join(root, size, 'cleanup'), days, runs_per_day)
+            results['sizes'][size] = size_result
+            print(f"完成规模 {size}: {len(news_paths)} 个文件", file=sys.stderr)
+
+        if not args.skip_fetch:
+            fetch_dir = os.path.join(root, 'fetch')
+            os.makedirs(fetch_dir)
+            results['fetch_pipeline'] = bench_fetch_pipeline(fetch_dir, args.fetch_runs, args.llm_latency,
+                                                             args.cassette)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='新闻服务性能基准测试')
+    parser.add_argument('--sizes', default='day,month',
+                        help=f"逗号分隔的目录规模，可选: {','.join(TREE_SIZES)}")
+    parser.add_argument('--requests', type=int, default=500, help='每个接口的请求次数')
+    parser.add_argument('--concurrency', type=int, default=8, help='真实服务测试的并发数')
+    parser.add_argument('--fetch-runs', type=int, default=3, help='抓取流程执行次数')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='LLM桩服务的模拟延迟（秒）')
+    parser.add_argument('--cassette', help='回放该录制目录中的网页和LLM响应，代替桩服务（见 cassette.py）')
+    parser.add_argument('--skip-server', action='store_true', help='跳过真实HTTP服务测试')
+    parser.add_argument('--skip-fetch', action='store_true', help='跳过抓取流程测试')
+    parser.add_argument('--with-logging', action='store_true', help='测试时保留INFO日志（默认关闭以减少干扰）')
+    parser.add_argument('--check-imports', action='store_true',
+                        help='只检查导入耗时预算，超出预算时返回非零退出码')
+    parser.add_argument('--check-security', action='store_true',
+                        help='只对路径校验执行目录遍历输入的性质检查，发现问题时返回非零退出码')
+    parser.add_argument('-o', '--output', help='结果输出文件，默认为标准输出')
+    args = parser.parse_args(argv)
+
+    if args.check_security:
+        logging.disable(logging.WARNING)
+        with tempfile.TemporaryDirectory(prefix='news-security-') as news_dir:
+            result = check_path_validation(news_dir)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        if result['violations']:
+            print(f"路径校验接受了 {len(result['violations'])} 个非法输入", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.check_imports:
+        results = check_import_times(IMPORT_TIME_BUDGETS_MS)
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        over = [module for module, result in results.items() if not result['within_budget']]
+        if over:
+            print(f"导入耗时超出预算: {', '.join(over)}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    args.sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in args.sizes if size not in TREE_SIZES]
+    if unknown:
+        parser.error(f"未知的目录规模: {', '.join(unknown)}")
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    results = run_benchmarks(args)
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
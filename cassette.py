@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制/回放模块
+在本地启动代理：录制模式把新闻页面和 LLM 接口的请求/响应转发到真实服务并保存到录制目录，
+回放模式直接用录制的响应应答（可注入延迟），整个抓取流程（news.py、NewsFetcher、调度任务）无需访问外网即可运行
+
+用法:
+    python3 cassette.py record --dir cassettes/demo -- python3 news.py
+    python3 cassette.py replay --dir cassettes/demo --latency 2 -- python3 news.py
+    python3 cassette.py replay --dir cassettes/demo          # 只启动代理，打印需要设置的环境变量
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import quote, unquote
+
+from json_store import write_json_atomic
+from logger_config import get_logger
+
+logger = get_logger('cassette')
+
+MODES = ('record', 'replay')
+# 与 news.py 中的默认来源一致
+DEFAULT_SOURCE_URL = "https://www.cls.cn/telegraph"
+PAGE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+def request_key(data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Cassette:
+    """
+    录制目录
+
+    每条记录一个 JSON 文件：<目录>/<类型>/<序号>-<请求哈希前16位>.json，类型为 http 或 llm。
+    回放时优先按请求哈希匹配；提示词或网页变化导致没有完全相同的请求时，按录制顺序循环使用同类记录
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_key: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        for kind in ('http', 'llm'):
+            kind_dir = os.path.join(self.directory, kind)
+            entries = []
+            try:
+                names = sorted(os.listdir(kind_dir))
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if name.endswith('.json'):
+                    with open(os.path.join(kind_dir, name), 'r', encoding='utf-8') as f:
+                        entries.append(json.load(f))
+            self._entries[kind] = entries
+            self._by_key[kind] = {entry['key']: entry for entry in entries}
+
+    def count(self, kind: str) -> int:
+        return len(self._entries.get(kind, []))
+
+    def record(self, kind: str, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._entries.setdefault(kind, [])
+            entry = dict(entry, key=key, recorded_at=time.time())
+            path = os.path.join(self.directory, kind, f"{len(entries):05d}-{key[:16]}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_json_atomic(path, entry, fsync='none')
+            entries.append(entry)
+            self._by_key.setdefault(kind, {})[key] = entry
+
+    def lookup(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        查找回放记录
+
+        Returns:
+            Optional[Dict[str, Any]]: 记录（附带 matched 表示是否完全匹配），没有同类记录时返回None
+        """
+        entry = self._by_key.get(kind, {}).get(key)
+        if entry is not None:
+            return dict(entry, matched=True)
+        entries = self._entries.get(kind)
+        if not entries:
+            return None
+        with self._lock:
+            index = self._cursor.get(kind, 0)
+            self._cursor[kind] = index + 1
+        return dict(entries[index % len(entries)], matched=False)
+
+
+class CassetteHandler(BaseHTTPRequestHandler):
+    """
+    代理请求处理
+
+    GET  /http/<URL编码的原地址>              新闻页面
+    POST /llm/<服务序号>/v1/chat/completions   OpenAI 兼容接口
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def proxy(self) -> 'CassetteServer':
+        return self.server.proxy
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        body = json.dumps({'error': {'message': message}}, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json')
+
+    def do_GET(self):
+        if not self.path.startswith('/http/'):
+            self._send_error(404, f"未知的路径: {self.path}")
+            return
+        url = unquote(self.path[len('/http/'):])
+        entry = self.proxy.handle('http', {'method': 'GET', 'url': url}, lambda: self._fetch_page(url))
+        if entry is None:
+            self._send_error(502, f"没有可回放的页面: {url}")
+            return
+        self._send(entry['status'], entry['body'].encode('utf-8'), entry['content_type'])
+
+    def do_POST(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) < 3 or parts[0] != 'llm' or not parts[1].isdigit() or not self.path.endswith('/chat/completions'):
+            self._send_error(404, f"未知的路径: {self.path}")
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        index = int(parts[1])
+        request_data = {key: body.get(key) for key in ('model', 'messages', 'max_tokens', 'temperature')}
+        authorization = self.headers.get('Authorization')
+        entry = self.proxy.handle(
+            'llm', dict(request_data, provider=index), lambda: self._forward_llm(index, body, authorization))
+        if entry is None:
+            self._send_error(502, "没有可回放的LLM响应")
+            return
+        self._send(entry['status'], json.dumps(entry['response'], ensure_ascii=False).encode('utf-8'),
+                   'application/json')
+
+    def _fetch_page(self, url: str) -> Dict[str, Any]:
+        import requests
+        response = requests.get(url, headers=PAGE_HEADERS, timeout=30)
+        response.encoding = 'utf-8'
+        return {
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'text/html; charset=utf-8'),
+            'body': response.text
+        }
+
+    def _forward_llm(self, index: int, body: Dict[str, Any], authorization: Optional[str]) -> Dict[str, Any]:
+        import requests
+        upstream = self.proxy.upstreams[index]
+        base_url = upstream.get('base_url') or 'https://api.openai.com/v1'
+        response = requests.post(
+            base_url.rstrip('/') + '/chat/completions',
+            json=body,
+            headers={'Authorization': authorization or f"Bearer {upstream.get('api_key')}"},
+            timeout=float(upstream.get('timeout') or 300)
+        )
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {'error': {'message': response.text[:2000]}}
+        return {'status': response.status_code, 'response': payload, 'provider': upstream.get('name')}
+
+
+class CassetteServer:
+    """录制/回放代理服务"""
+
+    def __init__(self, directory: str, mode: str, upstreams: Optional[List[Dict[str, Any]]] = None,
+                 latency: float = 0.0, page_latency: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"未知的模式: {mode}")
+        self.cassette = Cassette(directory)
+        self.mode = mode
+        self.upstreams = upstreams or []
+        self.latency = latency
+        self.page_latency = page_latency
+        self.stats = {'recorded': 0, 'matched': 0, 'fallback': 0, 'missing': 0, 'errors': 0}
+        self.env: Dict[str, str] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> 'CassetteServer':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), CassetteHandler)
+        self._server.daemon_threads = True
+        self._server.proxy = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='cassette', daemon=True)
+        self._thread.start()
+        logger.info(f"录制/回放代理已启动: {self.base_url}, 模式: {self.mode}, 目录: {self.cassette.directory}")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def handle(self, kind: str, request_data: Dict[str, Any], forward) -> Optional[Dict[str, Any]]:
+        """录制模式转发并保存，回放模式查找记录并按配置注入延迟"""
+        key = request_key(request_data)
+        if self.mode == 'record':
+            try:
+                entry = forward()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"转发请求失败: {e}")
+                return None
+            self.cassette.record(kind, key, dict(entry, request=request_data))
+            self.stats['recorded'] += 1
+            return entry
+
+        entry = self.cassette.lookup(kind, key)
+        if entry is None:
+            self.stats['missing'] += 1
+            return None
+        self.stats['matched' if entry['matched'] else 'fallback'] += 1
+        delay = self.latency if kind == 'llm' else self.page_latency
+        if delay:
+            time.sleep(delay)
+        return entry
+
+    def environment(self, source_url: Optional[str] = None) -> Dict[str, str]:
+        """
+        让抓取脚本经过代理所需的环境变量
+
+        录制模式下每个真实服务对应一个代理地址，保留原有的故障转移顺序；回放模式只需一个
+        """
+        source_url = source_url or os.environ.get('NEWS_SOURCE_URL', DEFAULT_SOURCE_URL)
+        if self.mode == 'record':
+            providers = [
+                dict(upstream, base_url=f"{self.base_url}/llm/{index}/v1")
+                for index, upstream in enumerate(self.upstreams)
+            ]
+        else:
+            providers = [{'name': 'cassette', 'base_url': f"{self.base_url}/llm/0/v1",
+                          'api_key': 'cassette', 'model': self._recorded_model(), 'timeout': 600}]
+        return {
+            'NEWS_SOURCE_URL': f"{self.base_url}/http/{quote(source_url, safe='')}",
+            'LLM_PROVIDERS': json.dumps(providers, ensure_ascii=False),
+            'OPENAI_API_KEY': providers[0]['api_key'] if providers else 'cassette',
+        }
+
+    def _recorded_model(self) -> str:
+        entries = self.cassette._entries.get('llm') or []
+        return (entries[0]['request'].get('model') if entries else None) or 'cassette'
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'directory': self.cassette.directory,
+            'http_entries': self.cassette.count('http'),
+            'llm_entries': self.cassette.count('llm'),
+            **self.stats
+        }
+
+
+def upstream_providers() -> List[Dict[str, Any]]:
+    """录制时转发的真实LLM服务，与 news.py 的配置方式一致（环境变量优先于 secrets.py）"""
+    if os.environ.get('LLM_PROVIDERS'):
+        return json.loads(os.environ['LLM_PROVIDERS'])
+    try:
+        import secrets as news_secrets
+    except ImportError:
+        news_secrets = None
+    providers = getattr(news_secrets, 'LLM_PROVIDERS', None)
+    if providers:
+        return providers
+    return [{
+        'name': 'default',
+        'base_url': os.environ.get('OPENAI_BASE_URL', getattr(news_secrets, 'OPENAI_BASE_URL', None)),
+        'api_key': os.environ.get('OPENAI_API_KEY', getattr(news_secrets, 'OPENAI_API_KEY', None)),
+        'model': os.environ.get('DEFAULT_MODEL', getattr(news_secrets, 'DEFAULT_MODEL', None)),
+    }]
+
+
+@contextmanager
+def use_cassette(directory: str, mode: str = 'replay', latency: float = 0.0,
+                 page_latency: float = 0.0) -> Iterator[CassetteServer]:
+    """
+    启动代理并临时设置当前进程的环境变量
+
+    NewsFetcher 和调度任务启动的抓取脚本继承这些环境变量，因此在 with 块中执行的抓取都经过代理
+    """
+    server = CassetteServer(directory, mode, upstream_providers() if mode == 'record' else None,
+                            latency, page_latency).start()
+    env = server.env = server.environment()
+    old = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        yield server
+    finally:
+        for key, value in old.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        server.stop()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    command = []
+    if '--' in argv:
+        index = argv.index('--')
+        argv, command = argv[:index], argv[index + 1:]
+
+    parser = argparse.ArgumentParser(description='录制或回放抓取流程的网页和LLM请求')
+    parser.add_argument('mode', choices=MODES, help='record=转发到真实服务并保存, replay=使用录制的响应')
+    parser.add_argument('--dir', required=True, help='录制目录')
+    parser.add_argument('--latency', type=float, default=0.0, help='回放时每次LLM请求注入的延迟（秒）')
+    parser.add_argument('--page-latency', type=float, default=0.0, help='回放时每次页面请求注入的延迟（秒）')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'replay' and not os.path.isdir(args.dir):
+        parser.error(f"录制目录不存在: {args.dir}")
+
+    with use_cassette(args.dir, args.mode, args.latency, args.page_latency) as server:
+        if command:
+            start = time.perf_counter()
+            returncode = subprocess.call(command)
+            elapsed = time.perf_counter() - start
+            print(json.dumps({**server.get_status(), 'returncode': returncode, 'seconds': round(elapsed, 3)},
+                             ensure_ascii=False), file=sys.stderr)
+            sys.exit(returncode)
+
+        print("代理已启动，在另一个终端中设置以下环境变量后运行抓取脚本（Ctrl+C 退出）：")
+        for key, value in server.env.items():
+            print(f"export {key}='{value}'")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(json.dumps(server.get_status(), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+响应压缩模块
+提供 gzip/brotli 协商、预压缩资源和压缩后的新闻文档缓存
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from flask import Response
+
+from config import config
+from logger_config import get_logger
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只使用 gzip
+    brotli = None
+
+logger = get_logger('compression')
+
+# 按优先级排列的支持编码
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: Optional[str], supported: Tuple[str, ...] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择压缩编码
+
+    Args:
+        accept_encoding: 请求头 Accept-Encoding 的值
+        supported: 可选的编码，按优先级排列（流式响应只支持 gzip）
+
+    Returns:
+        Optional[str]: 'br' / 'gzip'，客户端不支持时返回None
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """按指定编码压缩数据"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0 保证相同内容的压缩结果一致
+        return gzip.compress(data, compresslevel=config.COMPRESSION_LEVEL, mtime=0)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
+
+
+class PrecompressedBody:
+    """预先压缩好的响应体，保存原文和各编码版本"""
+
+    def __init__(self, data: bytes, mimetype: str):
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(data).hexdigest()[:16]
+        self.variants: Dict[str, bytes] = {}
+        if len(data) >= config.COMPRESSION_MIN_SIZE:
+            for encoding in SUPPORTED_ENCODINGS:
+                compressed = compress(data, encoding)
+                # 压缩后反而更大时不保存该版本
+                if len(compressed) < len(data):
+                    self.variants[encoding] = compressed
+
+    @property
+    def size(self) -> int:
+        """缓存占用的总字节数"""
+        return len(self.data) + sum(len(v) for v in self.variants.values())
+
+    def make_response(self, accept_encoding: Optional[str],
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        """根据客户端支持的编码生成响应"""
+        encoding = choose_encoding(accept_encoding)
+        body = self.variants.get(encoding) if encoding else None
+
+        response = Response(body if body is not None else self.data, mimetype=self.mimetype)
+        if body is not None:
+            response.headers['Content-Encoding'] = encoding
+        if self.variants:
+            response.headers['Vary'] = 'Accept-Encoding'
+        response.set_etag(self.etag)
+        for name, value in (headers or {}).items():
+            response.headers[name] = value
+        return response
+
+
+class StaticAsset:
+    """启动时预压缩的静态文件，文件变化后自动重新加载"""
+
+    def __init__(self, directory: str, filename: str, mimetype: str):
+        self.path = os.path.join(directory, filename)
+        self.filename = filename
+        self.mimetype = mimetype
+        self._version: Optional[Tuple[int, int]] = None
+        self._body: Optional[PrecompressedBody] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> PrecompressedBody:
+        """
+        获取预压缩内容，文件修改后重新压缩
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        st = os.stat(self.path)
+        version = (st.st_mtime_ns, st.st_size)
+        if self._body is not None and self._version == version:
+            return self._body
+
+        with self._lock:
+            if self._body is None or self._version != version:
+                with open(self.path, 'rb') as f:
+                    self._body = PrecompressedBody(f.read(), self.mimetype)
+                self._version = version
+                logger.info(f"已预压缩静态文件: {self.filename}, 版本: {self._body.etag}, "
+                            f"编码: {list(self._body.variants)}")
+            return self._body
+
+    @property
+    def hashed_name(self) -> str:
+        """带内容哈希的文件名，如 index.0123abcd.html"""
+        stem, ext = os.path.splitext(self.filename)
+        return f"{stem}.{self.load().etag}{ext}"
+
+
+class CompressedCache:
+    """
+    压缩后响应体的 LRU 缓存
+
+    缓存项带有版本号（如文件的 mtime 和大小），版本变化时视为未命中
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[Hashable, PrecompressedBody]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[PrecompressedBody]:
+        """获取缓存项，版本不一致时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, version: Hashable, body: PrecompressedBody) -> None:
+        """写入缓存项，超出容量时淘汰最久未使用的项"""
+        if self.max_entries <= 0 or body.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].size
+            self._entries[key] = (version, body)
+            self._bytes += body.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def compress_response(response: Response, accept_encoding: Optional[str]) -> Response:
+    """
+    按需压缩普通响应（after_request 钩子使用）
+
+    跳过流式响应、已编码响应以及小于阈值的响应
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json'):
+        return response
+
+    data = response.get_data()
+    if len(data) < config.COMPRESSION_MIN_SIZE:
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# 全局新闻文档缓存实例
+news_cache = CompressedCache(config.NEWS_CACHE_ENTRIES, config.NEWS_CACHE_MAX_BYTES)
@@ -24,13 +24,99 @@ class Config:
     STATIC_DIR: str = os.path.abspath('.')
     NEWS_DIR: str = os.path.abspath('news')
     LOGS_DIR: str = 'logs'
+    DATA_DIR: str = os.path.abspath('data')  # 索引等运行数据
+
+    # 存储配置
+    STORAGE_BACKEND: str = 'file'  # file=news目录下的markdown文件, sqlite=SQLite数据库（WAL模式）
+    SQLITE_BUSY_TIMEOUT: float = 5.0  # 数据库被锁定时的等待时间（秒）
+    FSYNC_POLICY: str = 'file'  # none=不刷盘, file=替换前刷新文件内容, full=同时刷新目录（断电也不丢文件名）
+    SAVE_COLLISION_RETRIES: int = 60  # 同一秒已有新闻时，依次顺延1秒的最大次数
+    NEWS_WATCHER_POLL_INTERVAL: float = 1.0  # 未安装watchdog时检查新闻目录变化的间隔（秒）
+    NEWS_WATCHER_RESYNC_INTERVAL: float = 60.0  # 使用watchdog时全量核对的间隔（秒），防止丢失事件
 
     # 脚本配置
     NEWS_SCRIPT: str = 'news.py'
     NEWS_SCRIPT_TIMEOUT: int = 300  # 5分钟
+    # 各阶段的时间预算（秒），按脚本输出的阶段标记计时，超过预算仍未进入下一阶段视为卡住并提前终止，0表示不限
+    # summarize 应大于 LLM_DEFAULT_TIMEOUT，留出一个服务超时后切换到下一个服务的时间
+    NEWS_SCRIPT_STAGE_BUDGETS: tuple = (('fetch', 60), ('extract', 60), ('summarize', 180), ('persist', 60))
+    NEWS_SCRIPT_STARTUP_BUDGET: int = 30  # 脚本启动到输出第一个阶段标记的时间预算（秒），0表示不限
+    NEWS_SCRIPT_OUTPUT_LINES: int = 200  # 内存中保留的脚本输出行数，完整输出写入 data/runs/<运行ID>/output.log
+
+    # 网页快照配置（data/snapshots/，按内容哈希保存抓取到的原始网页）
+    SNAPSHOT_ENABLED: bool = True
+    SNAPSHOT_ZSTD_LEVEL: int = 10  # zstd压缩级别（需安装zstandard，否则使用zlib）
+    SNAPSHOT_ZLIB_LEVEL: int = 9  # zlib压缩级别
+    SNAPSHOT_DICTIONARY: bool = False  # 是否用已有快照训练压缩字典（同一网站的页面模板相同，压缩率更高）
+    SNAPSHOT_DICT_MIN_SAMPLES: int = 8  # 训练字典所需的最少快照数
+    SNAPSHOT_DICT_MAX_SAMPLES: int = 64  # 训练字典使用的最近快照数
+    SNAPSHOT_DICT_SIZE: int = 112640  # zstd字典大小（字节）
+
+    # 抓取流程检查点配置（data/runs/<运行ID>/）
+    PIPELINE_MAX_ATTEMPTS: int = 3  # 同一次运行最多尝试次数，重试从失败的阶段继续
+    PIPELINE_RETRY_BASE_SECONDS: int = 60  # 重试等待时间基数，按2的幂递增
+    PIPELINE_RESUME_MAX_AGE: int = 3600  # 超过该秒数的失败运行不再继续（内容已过时），重新抓取
+    PIPELINE_KEEP_HOURS: int = 24  # 运行目录保留时间（小时），由清理任务删除
+
+    # 重新总结配置（news_backfill.py，输出保存在 news/YYYYMMDD/versions/<版本>/）
+    BACKFILL_WORKERS: int = 0  # 提取正文的进程数，0表示CPU核数
+    BACKFILL_LLM_CONCURRENCY: int = 4  # 同时进行的LLM请求数
+    BACKFILL_LLM_PER_MINUTE: float = 30  # 每分钟最多发起的LLM请求数（多个重新总结进程共享），0表示不限制
+    BACKFILL_LLM_BURST: int = 4
+
+    # 新闻统计配置（/news/stats）
+    STATS_DEFAULT_DAYS: int = 7  # 未指定 from 时统计最近几天
+    STATS_MAX_HOURS: int = 24 * 366  # 单次查询最多覆盖的小时数
+
+    # 实体索引配置（/news/entity/<代码或名称>）
+    ENTITY_DICT_FILE: str = os.path.abspath('stocks.txt')  # A股代码和名称词典，每行 代码<TAB>名称[<TAB>别名,...]
+    ENTITY_QUERY_LIMIT: int = 200  # 单次查询最多返回的条目数
+
+    # 任务队列配置
+    FETCH_MODE: str = 'inline'  # inline=Web进程的调度线程直接执行抓取, queue=只写入任务队列，由 news_worker.py 执行
+    JOB_QUEUE_BACKEND: str = 'sqlite'  # sqlite=data/jobs.db（同一台机器共享）, 也可填 "模块:类名" 接入自定义的共享队列
+    NEWS_SOURCES: tuple = ()  # queue模式下的新闻来源URL，每个来源一个任务，可由多个worker并行处理；为空时使用默认来源
+    JOB_LEASE_SECONDS: int = 120  # 任务租约时长（秒），worker 每1/3租约时长续约一次
+    JOB_MAX_ATTEMPTS: int = 3  # 每个任务最多尝试次数
+    JOB_RETRY_BASE_SECONDS: int = 60  # 失败后重新排队的等待时间基数，按2的幂递增
+    JOB_MAX_PENDING: int = 10  # 排队任务上限，超出时 run-now 返回503，0表示不限制
+    JOB_KEEP_HOURS: int = 168  # 已结束任务的保留时间（小时）
+    WORKER_POLL_INTERVAL: float = 2.0  # worker 没有任务时的轮询间隔（秒）
+
+    # LLM服务配置（服务列表见 secrets.py 中的 LLM_PROVIDERS）
+    LLM_DEFAULT_TIMEOUT: int = 120  # 单个服务的默认超时（秒），多个服务的总和应小于脚本超时
+    LLM_HEDGE_ENABLED: bool = False  # 是否启用对冲请求
+    LLM_HEDGE_DELAY: float = 30.0  # 延迟样本不足时，发起对冲请求前的等待时间（秒）
+    LLM_HEDGE_MIN_SAMPLES: int = 5  # 使用p95延迟作为对冲等待时间所需的最少样本数
+    LLM_STATS_WINDOW: int = 50  # 每个服务保留的最近延迟样本数
+
+    # token预算配置（0表示不限制）
+    TOKEN_BUDGET_PER_RUN: int = 24000  # 单次运行的提示词token上限，超出时截断网页内容
+    TOKEN_BUDGET_PER_DAY: int = 400000  # 每天的token上限（提示词+输出），用完后跳过LLM调用
+    LLM_MAX_OUTPUT_TOKENS: int = 2000  # 单次总结的最大输出token数
+    LLM_OUTPUT_FORMAT: str = 'markdown'  # markdown=自由格式的markdown, json=结构化输出（保存为 .json / format='json'，旧客户端按需渲染为markdown；改为默认的计划见 README）
+    LLM_JSON_MODE: str = 'json_schema'  # 结构化输出方式: json_schema=按 SUMMARY_SCHEMA 约束输出, json_object=只要求输出JSON（兼容不支持 json_schema 的服务）
+    PROMPT_STRIP_HTML: bool = True  # 只把网页正文文本发给LLM，去掉脚本、样式和标签
+    TOKEN_USAGE_KEEP_DAYS: int = 30  # 保留多少天的用量统计
+    TOKEN_USAGE_KEEP_RUNS: int = 100  # 保留最近多少次运行的用量记录
+
+    # 限流配置（按客户端和接口的令牌桶）
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = 'memory'  # memory=进程内, sqlite=data目录下的数据库（多个worker进程共享计数）
+    RATE_LIMIT_GLOBAL_FACTOR: int = 5  # 接口整体的速率和容量为单个客户端的倍数，0表示不限制整体
+    RUN_NOW_PER_MINUTE: float = 2  # 每个客户端每分钟可手动触发抓取的次数
+    RUN_NOW_BURST: int = 2
+    CLEANUP_NOW_PER_MINUTE: float = 1  # 每个客户端每分钟可手动触发清理的次数
+    CLEANUP_NOW_BURST: int = 1
+    NEWS_TASK_MAX_CONCURRENT: int = 1  # 同时执行或排队的抓取任务数，超出时返回503
+    CLEANUP_TASK_MAX_CONCURRENT: int = 1  # 同时执行或排队的清理任务数，超出时返回503
 
     # 定时任务配置
     CRON_MINUTE: int = 0  # 每小时的0分执行
+    SCHEDULER_JOBSTORE: str = 'sqlite'  # sqlite=保存到data目录（重启后保留排队任务）, memory=只保存在内存
+    SCHEDULER_MISFIRE_GRACE_TIME: int = 3600  # 任务错过执行时间后仍然执行（补跑）的最长时间（秒）
+    SCHEDULER_COALESCE: bool = True  # 同一任务错过多次时只执行一次
+    SCHEDULER_CATCHUP: str = 'once'  # 重启时错过的周期任务: once=每类任务合并补跑一次, skip=跳过
 
     # 智能调度配置
     DAY_HOURS: str = '6-23'  # 白天时间段（6:00-23:59）
@@ -42,18 +128,69 @@ class Config:
     LOG_FORMAT: str = '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
     LOG_BACKUP_COUNT: int = 30  # 保留30天日志
 
+    # 响应压缩配置
+    COMPRESSION_MIN_SIZE: int = 1024  # 小于该字节数的响应不压缩
+    COMPRESSION_LEVEL: int = 6  # gzip压缩级别
+    BROTLI_QUALITY: int = 5  # brotli压缩级别（需安装brotli）
+    STATIC_CACHE_MAX_AGE: int = 31536000  # 带哈希的静态文件缓存一年
+    NEWS_CACHE_ENTRIES: int = 256  # 压缩后新闻文档缓存条数
+    NEWS_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 压缩后新闻文档缓存上限
+
+    # 新闻去重配置
+    DEDUP_MODE: str = 'mark'  # off=不去重, mark=只标记重复条目, drop=保存时移除重复条目
+    DEDUP_WINDOW_HOURS: int = 24  # 与多少小时内的新闻比较
+    DEDUP_MAX_DISTANCE: int = 6  # SimHash汉明距离不超过该值视为重复（需小于8）
+
+    # 重点新闻标红配置
+    LOCAL_HIGHLIGHT: bool = True  # True=本地按关注列表标红，不再要求LLM标红
+    HIGHLIGHT_KEYWORDS: tuple = ('人工智能', '算力', '央行', '国家政策', '政策会议', '金融会议', '海外投行')
+    HIGHLIGHT_KEYWORDS_FILE: str = os.path.abspath('watchlist.txt')  # 额外的关注关键词文件，每行一个（可选）
+
+    # 关键词提醒配置
+    ALERT_QUEUE_SIZE: int = 100  # 投递队列长度
+    ALERT_WORKERS: int = 2  # 投递线程数
+    ALERT_TIMEOUT: int = 10  # 单次webhook请求超时（秒）
+    ALERT_MAX_ATTEMPTS: int = 5  # 最多尝试次数
+    ALERT_RETRY_BASE_SECONDS: int = 30  # 重试间隔基数，按2的幂递增
+    ALERT_POLL_INTERVAL: int = 30  # 扫描待投递目录的间隔（秒）
+    ALERT_ADMIN_TOKEN: str = os.environ.get('ALERT_ADMIN_TOKEN', '')  # 订阅管理接口的令牌，为空时接口关闭
+    ALERT_ALLOWED_HOSTS: tuple = ()  # webhook 主机白名单（含子域名），为空时允许任意公网主机
+    ALERT_ALLOW_PRIVATE_HOSTS: bool = False  # 允许 webhook 指向本机和内网地址（本地接收端、内网部署），默认关闭
+
     # 文件路径验证配置
     ALLOWED_PATH_PATTERN: str = r'^(\d{8})/(\d{2}-\d{2}-\d{2})$'
     DANGEROUS_CHARS: tuple = ('..', '~')
+    SECURITY_NEGATIVE_TTL: float = 2.0  # 非法或不存在路径的缓存时间（秒）
+    SECURITY_NEGATIVE_CACHE_SIZE: int = 4096  # 缓存的路径数上限
+    SECURITY_LOG_INTERVAL: int = 60  # 告警日志限流周期（秒）
+    SECURITY_LOG_BURST: int = 5  # 每个客户端每周期最多记录的告警条数
 
     def __post_init__(self):
         """初始化后处理"""
-        # 确保目录存在
-        os.makedirs(self.LOGS_DIR, exist_ok=True)
-        os.makedirs(self.NEWS_DIR, exist_ok=True)
-
         # 生成完整的脚本路径
         self.NEWS_SCRIPT_PATH = os.path.join(self.BASE_DIR, self.NEWS_SCRIPT)
+        self.DEDUP_INDEX_PATH = os.path.join(self.DATA_DIR, 'dedup_index.db')
+        self.LLM_STATS_PATH = os.path.join(self.DATA_DIR, 'llm_stats.json')
+        self.TOKEN_USAGE_PATH = os.path.join(self.DATA_DIR, 'token_usage.json')
+        self.SQLITE_DB_PATH = os.path.join(self.DATA_DIR, 'news.db')
+        self.RATE_LIMIT_DB_PATH = os.path.join(self.DATA_DIR, 'rate_limit.db')
+        self.SCHEDULER_DB_PATH = os.path.join(self.DATA_DIR, 'scheduler.db')
+        self.JOB_QUEUE_DB_PATH = os.path.join(self.DATA_DIR, 'jobs.db')
+        self.PIPELINE_RUNS_DIR = os.path.join(self.DATA_DIR, 'runs')
+        self.SNAPSHOT_DIR = os.path.join(self.DATA_DIR, 'snapshots')
+        self.BACKFILL_DIR = os.path.join(self.DATA_DIR, 'backfill')
+        self.DIGEST_DB_PATH = os.path.join(self.DATA_DIR, 'digests.db')
+        self.NEWS_STATS_PATH = os.path.join(self.DATA_DIR, 'news_stats.db')
+        self.ENTITY_DICT_TABLE_PATH = os.path.join(self.DATA_DIR, 'entities', 'stocks.bin')
+        self.ENTITY_INDEX_PATH = os.path.join(self.DATA_DIR, 'entities', 'postings.json')
+        self.ALERT_SUBSCRIPTIONS_PATH = os.path.join(self.DATA_DIR, 'alert_subscriptions.json')
+        self.ALERT_OUTBOX_DIR = os.path.join(self.DATA_DIR, 'alert_outbox')
+
+    def ensure_dirs(self) -> None:
+        """确保运行所需目录存在（由入口按需调用，导入时不再产生副作用）"""
+        os.makedirs(self.LOGS_DIR, exist_ok=True)
+        os.makedirs(self.NEWS_DIR, exist_ok=True)
+        os.makedirs(self.DATA_DIR, exist_ok=True)
 
 
 # 全局配置实例
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+实体索引模块
+从新闻条目中识别A股代码和公司名称（本地词典 + 正则，不调用LLM），维护 实体 -> 条目 的倒排索引，
+保存新闻时增量更新，随新闻一同清理
+
+用法:
+    python3 entity_index.py --build-dict    # 修改 stocks.txt 后重建查找表
+    python3 entity_index.py --rebuild       # 按现有新闻重建索引
+"""
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import config
+from json_store import JsonStore, fsync_directory
+from logger_config import get_logger
+from news_parser import iter_items
+from news_storage import NewsStorage, PATH_FORMAT, news_storage
+
+logger = get_logger('entity_index')
+
+# 股票代码：600519 / SH600519 / 600519.SH，前后不能紧邻数字；后面跟单位的是金额或数量（如 300750万元）
+CODE_PATTERN = re.compile(
+    r'(?<![0-9A-Za-z.])(?:(?:SH|SZ|BJ)\s?)?(\d{6})(?:\.(?:SH|SZ|BJ))?(?!\d|\s*(?:[万亿元手%]|股(?![价票])))',
+    re.IGNORECASE
+)
+CODE_ONLY_PATTERN = re.compile(r'^\d{6}$')
+# 名称后紧跟这些字时是普通词语的一部分（如 中国银行业、中国移动互联网），不算提到该公司
+NAME_STOP_SUFFIXES = ('业', '互联网')
+
+
+class StockDictionary:
+    """
+    A股代码和名称词典
+
+    文本词典（stocks.txt）编译为紧凑的二进制查找表并以 mmap 只读映射，多个进程共享同一份页缓存：
+        头部: MAGIC + 条目数(uint32)
+        记录: 按代码排序的定长记录 (代码 6 字节, 名称偏移 uint32, 名称长度 uint16)
+        名称区: UTF-8 的 "名称\\t别名1,别名2"
+    按代码查找为对定长记录的二分查找；按名称识别使用名称和别名构建的 Aho-Corasick 自动机
+    """
+
+    MAGIC = b'STKDICT1'
+    HEADER = struct.Struct('<8sI')
+    RECORD = struct.Struct('<6sIH')
+
+    def __init__(self, source: str, table_path: str):
+        self.source = source
+        self.table_path = table_path
+        self._mmap: Optional[mmap.mmap] = None
+        self._count = 0
+        self._names: Optional[Dict[str, str]] = None
+        self._matcher = None
+        self._lock = threading.Lock()
+
+    # 查找表
+
+    @staticmethod
+    def parse_source(path: str) -> List[Tuple[str, str, List[str]]]:
+        """读取文本词典，返回按代码排序的 (代码, 名称, 别名)"""
+        entries: Dict[str, Tuple[str, str, List[str]]] = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split('\t')
+                code = fields[0].strip()
+                if not CODE_ONLY_PATTERN.match(code) or len(fields) < 2 or not fields[1].strip():
+                    logger.warning(f"忽略格式不正确的词典行: {line}")
+                    continue
+                aliases = [a.strip() for a in fields[2].split(',') if a.strip()] if len(fields) > 2 else []
+                entries[code] = (code, fields[1].strip(), aliases)
+        return [entries[code] for code in sorted(entries)]
+
+    def build(self) -> int:
+        """将文本词典编译为查找表（原子替换），返回条目数"""
+        entries = self.parse_source(self.source)
+        records = []
+        names = bytearray()
+        for code, name, aliases in entries:
+            data = ('\t'.join([name, ','.join(aliases)])).encode('utf-8')
+            records.append(self.RECORD.pack(code.encode('ascii'), len(names), len(data)))
+            names += data
+
+        directory = os.path.dirname(self.table_path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.table_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(records)))
+            f.write(b''.join(records))
+            f.write(bytes(names))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.table_path)
+        fsync_directory(directory)
+
+        with self._lock:
+            self._close()
+        logger.info(f"股票词典查找表已生成: {self.table_path}（{len(records)} 条，{os.path.getsize(self.table_path)} 字节）")
+        return len(records)
+
+    def _close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._names = None
+        self._matcher = None
+
+    def _stale(self) -> bool:
+        """文本词典比查找表新（或查找表不存在）"""
+        try:
+            source_mtime = os.path.getmtime(self.source)
+        except FileNotFoundError:
+            return False
+        try:
+            return os.path.getmtime(self.table_path) < source_mtime
+        except FileNotFoundError:
+            return True
+
+    def _table(self) -> Optional[mmap.mmap]:
+        """映射查找表；文本词典比查找表新时先重新生成"""
+        if self._mmap is not None:
+            return self._mmap
+        if self._stale():
+            self.build()
+        with self._lock:
+            if self._mmap is not None:
+                return self._mmap
+            if not os.path.exists(self.table_path):
+                return None
+            with open(self.table_path, 'rb') as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = self.HEADER.unpack_from(table, 0)
+            if magic != self.MAGIC:
+                table.close()
+                raise ValueError(f"股票词典查找表格式不正确: {self.table_path}")
+            self._count = count
+            self._mmap = table
+            return table
+
+    def _record(self, table: mmap.mmap, index: int) -> Tuple[bytes, int, int]:
+        return self.RECORD.unpack_from(table, self.HEADER.size + index * self.RECORD.size)
+
+    def _entry(self, table: mmap.mmap, index: int) -> Tuple[str, str, List[str]]:
+        code, offset, length = self._record(table, index)
+        start = self.HEADER.size + self._count * self.RECORD.size + offset
+        name, _, aliases = table[start:start + length].decode('utf-8').partition('\t')
+        return code.decode('ascii'), name, [a for a in aliases.split(',') if a]
+
+    def lookup(self, code: str) -> Optional[str]:
+        """按代码查找公司名称（二分查找），不存在时返回None"""
+        table = self._table()
+        if table is None or not CODE_ONLY_PATTERN.match(code):
+            return None
+        target = code.encode('ascii')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            current = self._record(table, middle)[0]
+            if current < target:
+                low = middle + 1
+            elif current > target:
+                high = middle
+            else:
+                return self._entry(table, middle)[1]
+        return None
+
+    def __iter__(self) -> Iterator[Tuple[str, str, List[str]]]:
+        table = self._table()
+        for index in range(self._count if table is not None else 0):
+            yield self._entry(table, index)
+
+    # 名称识别
+
+    def _name_index(self) -> Tuple[Dict[str, str], Any]:
+        if self._matcher is None:
+            from keyword_matcher import AhoCorasick
+
+            names = {}
+            for code, name, aliases in self:
+                for alias in [name] + aliases:
+                    names.setdefault(alias, code)
+            self._names = names
+            self._matcher = AhoCorasick(names)
+        return self._names, self._matcher
+
+    def resolve(self, query: str) -> Optional[str]:
+        """代码、名称或别名 -> 代码"""
+        query = query.strip()
+        if CODE_ONLY_PATTERN.match(query):
+            return query if self.lookup(query) else None
+        return self._name_index()[0].get(query)
+
+    def find(self, text: str) -> List[str]:
+        """文本中提到的股票代码（代码和名称均识别，去重，按首次出现顺序）"""
+        found: Dict[str, None] = {}
+        names, matcher = self._name_index()
+        for match in CODE_PATTERN.finditer(text):
+            if self.lookup(match.group(1)):
+                found.setdefault(match.group(1), None)
+        for start, alias in matcher.iter_matches(text):
+            if not text.startswith(NAME_STOP_SUFFIXES, start + len(alias)):
+                found.setdefault(names[alias], None)
+        return list(found)
+
+
+class EntityIndex:
+    """
+    实体倒排索引，保存在 data/entities/postings.json
+
+    文件结构:
+        entities: {代码: [{'path', 'ordinal', 'category', 'text', 'highlighted'}]}，按新闻路径排序
+        sources: {新闻路径: [代码]}，重复添加时忽略，清理时按此删除
+    """
+
+    def __init__(self, path: str, dictionary: StockDictionary):
+        self.store = JsonStore(path, lambda: {'entities': {}, 'sources': {}})
+        self.dictionary = dictionary
+
+    def extract(self, content: str, news_path: str, fmt: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """识别一次总结中各条目提到的实体，返回 {代码: [条目]}"""
+        postings: Dict[str, List[Dict[str, Any]]] = {}
+        for ordinal, item in enumerate(iter_items(content, fmt)):
+            for code in self.dictionary.find(item['text']):
+                postings.setdefault(code, []).append({
+                    'path': news_path,
+                    'ordinal': ordinal,
+                    'category': item['category'],
+                    'text': item['text'],
+                    'highlighted': item['highlighted']
+                })
+        return postings
+
+    def add_summary(self, content: str, news_path: str, fmt: Optional[str] = None) -> int:
+        """
+        将一次运行的总结加入索引（同一路径重复添加时忽略）
+
+        Returns:
+            int: 新增的条目-实体关联数
+        """
+        postings = self.extract(content, news_path, fmt)
+        with self.store.update() as data:
+            added = self._add(data, news_path, postings)
+        if added:
+            logger.info(f"实体索引已更新: {news_path}, 实体 {len(postings)} 个, 关联 {added} 条")
+        return added
+
+    @staticmethod
+    def _add(data: Dict[str, Any], news_path: str, postings: Dict[str, List[Dict[str, Any]]]) -> int:
+        if news_path in data['sources']:
+            return 0
+        added = 0
+        for code, items in postings.items():
+            entries = data['entities'].setdefault(code, [])
+            entries.extend(items)
+            if len(entries) > len(items) and entries[-len(items) - 1]['path'] > news_path:
+                # 补充索引较早的新闻时保持按路径排序
+                entries.sort(key=lambda entry: (entry['path'], entry['ordinal']))
+            added += len(items)
+        data['sources'][news_path] = sorted(postings)
+        return added
+
+    def catch_up(self, storage: Optional[NewsStorage] = None) -> int:
+        """
+        索引尚未加入的新闻（索引更新失败或功能上线前保存的新闻），一次写入，由清理任务调用
+
+        Returns:
+            int: 补充索引的新闻数
+        """
+        storage = storage or news_storage
+        sources = self.store.load()['sources']
+        pending = []
+        for news_path in sorted(p for p in storage.list_paths() if p not in sources):
+            summary = storage.read_summary(news_path)
+            if summary is not None:
+                content, fmt = summary
+                pending.append((news_path, self.extract(content, news_path, fmt)))
+        if not pending:
+            return 0
+        with self.store.update() as data:
+            for news_path, postings in pending:
+                self._add(data, news_path, postings)
+        logger.info(f"实体索引补充 {len(pending)} 次运行")
+        return len(pending)
+
+    def prune(self, cutoff_time: datetime) -> int:
+        """
+        删除截止时间之前的新闻的索引（与 clean_old_news 一同执行）
+
+        Returns:
+            int: 删除的新闻数
+        """
+        cutoff_path = cutoff_time.strftime(PATH_FORMAT)
+        with self.store.update() as data:
+            expired = [news_path for news_path in data['sources'] if news_path < cutoff_path]
+            codes = set()
+            for news_path in expired:
+                codes.update(data['sources'].pop(news_path))
+            for code in codes:
+                # 条目按路径排序，过期的都在开头
+                entries = data['entities'].get(code, [])
+                keep = next((i for i, entry in enumerate(entries) if entry['path'] >= cutoff_path), len(entries))
+                if keep == len(entries):
+                    data['entities'].pop(code, None)
+                else:
+                    del entries[:keep]
+        if expired:
+            logger.info(f"实体索引清理完成，删除 {len(expired)} 次运行")
+        return len(expired)
+
+    def query(self, query: str, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        按代码、名称或别名查询提到该公司的条目（最新的在前）
+
+        Returns:
+            Optional[Dict[str, Any]]: {'code', 'name', 'count', 'items'}，词典中没有该实体时返回None
+        """
+        code = self.dictionary.resolve(query)
+        if code is None:
+            return None
+        entries = self.store.load()['entities'].get(code, [])
+        items = entries[::-1][:limit] if limit else entries[::-1]
+        return {'code': code, 'name': self.dictionary.lookup(code), 'count': len(entries), 'items': items}
+
+    def version(self) -> Optional[Tuple[int, int]]:
+        """索引文件版本，用于响应缓存"""
+        try:
+            st = os.stat(self.store.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+# 全局实例
+stock_dictionary = StockDictionary(config.ENTITY_DICT_FILE, config.ENTITY_DICT_TABLE_PATH)
+entity_index = EntityIndex(config.ENTITY_INDEX_PATH, stock_dictionary)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='股票实体索引维护')
+    parser.add_argument('--build-dict', action='store_true', help='按 stocks.txt 重建查找表')
+    parser.add_argument('--rebuild', action='store_true', help='清空后按现有新闻重建索引')
+    args = parser.parse_args(argv)
+
+    config.ensure_dirs()
+    if args.build_dict:
+        count = stock_dictionary.build()
+        print(f"✅ 查找表已生成: {count} 条")
+    if args.rebuild:
+        with entity_index.store.update() as data:
+            data['entities'] = {}
+            data['sources'] = {}
+    added = entity_index.catch_up()
+    print(f"✅ 索引完成，补充 {added} 次运行")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务队列模块
+持久化的本地任务队列：Web进程只负责写入，news_worker.py 领取任务（带租约和心跳）后执行抓取
+"""
+
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import config
+from logger_config import get_logger
+
+logger = get_logger('job_queue')
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """排队任务数已达上限"""
+
+
+class JobQueue:
+    """
+    任务队列接口
+
+    任务以字典表示：{'id', 'kind', 'payload', 'status', 'attempts', 'max_attempts', ...}。
+    领取任务时获得一个租约，worker 需在租约到期前续约；租约过期的任务可以被其他 worker 重新领取
+    """
+
+    name = 'base'
+
+    def enqueue(self, kind: str, payload: Optional[Dict[str, Any]] = None, dedupe_key: Optional[str] = None,
+                max_attempts: Optional[int] = None) -> Tuple[int, bool]:
+        """
+        写入任务
+
+        Args:
+            kind: 任务类型
+            payload: 任务参数（可JSON序列化）
+            dedupe_key: 去重键，已有相同键的排队任务时不再写入
+            max_attempts: 最多尝试次数，默认 JOB_MAX_ATTEMPTS
+
+        Returns:
+            Tuple[int, bool]: (任务ID, 是否新写入)
+
+        Raises:
+            QueueFull: 排队任务数已达 JOB_MAX_PENDING
+        """
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, kinds: Sequence[str], lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """领取一个可执行的任务，没有时返回None"""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """续约，租约已被其他 worker 接管时返回False"""
+        raise NotImplementedError
+
+    def complete(self, job_id: int, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """标记任务完成"""
+        raise NotImplementedError
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry_delay: Optional[float] = None) -> bool:
+        """
+        标记本次执行失败
+
+        未达到最多尝试次数时重新排队（retry_delay 秒后可领取），否则标记为失败
+        """
+        raise NotImplementedError
+
+    def release(self, job_id: int, worker_id: str) -> bool:
+        """放弃租约（worker 退出时），任务立即重新排队，不计入尝试次数"""
+        raise NotImplementedError
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def prune(self, keep_seconds: float) -> int:
+        """删除结束超过 keep_seconds 秒的任务"""
+        raise NotImplementedError
+
+    def get_status(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    SQLite 任务队列
+
+    同一台机器上的 Web 进程和多个 worker 进程共享一个数据库文件；领取、续约和结束都在 IMMEDIATE 事务中完成。
+    SQLite 不适合放在网络文件系统上，多台机器时请通过 JOB_QUEUE_BACKEND 接入共享的队列实现
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        dedupe_key TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        available_at REAL NOT NULL,
+        lease_owner TEXT,
+        lease_expires REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        result TEXT,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (status, available_at);
+    CREATE INDEX IF NOT EXISTS ix_jobs_dedupe ON jobs (dedupe_key, status);
+    """
+
+    COLUMNS = ('id', 'kind', 'payload', 'dedupe_key', 'status', 'attempts', 'max_attempts', 'available_at',
+               'lease_owner', 'lease_expires', 'created_at', 'updated_at', 'result', 'error')
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, func):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(conn)
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job = dict(zip(self.COLUMNS, row))
+        job['payload'] = json.loads(job['payload'])
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def enqueue(self, kind, payload=None, dedupe_key=None, max_attempts=None):
+        now = time.time()
+
+        def insert(conn):
+            if dedupe_key is not None:
+                row = conn.execute('SELECT id FROM jobs WHERE dedupe_key = ? AND status = ? LIMIT 1',
+                                   (dedupe_key, QUEUED)).fetchone()
+                if row:
+                    return row[0], False
+            if config.JOB_MAX_PENDING > 0:
+                pending = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+                if pending >= config.JOB_MAX_PENDING:
+                    raise QueueFull(f"排队任务已达上限 {config.JOB_MAX_PENDING}")
+            cursor = conn.execute(
+                'INSERT INTO jobs (kind, payload, dedupe_key, status, max_attempts, available_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (kind, json.dumps(payload or {}, ensure_ascii=False), dedupe_key, QUEUED,
+                 max_attempts or config.JOB_MAX_ATTEMPTS, now, now, now)
+            )
+            return cursor.lastrowid, True
+
+        return self._transaction(insert)
+
+    def claim(self, worker_id, kinds, lease_seconds):
+        now = time.time()
+        placeholders = ','.join('?' * len(kinds))
+
+        def take(conn):
+            # 租约过期且已用完尝试次数的任务直接标记为失败（worker 在执行中崩溃）
+            conn.execute(
+                f'UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, updated_at = ? '
+                f'WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts AND kind IN ({placeholders})',
+                (FAILED, '租约过期且已达最多尝试次数', now, RUNNING, now, *kinds)
+            )
+            row = conn.execute(
+                f'SELECT id FROM jobs WHERE kind IN ({placeholders}) AND '
+                f'((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?)) '
+                f'ORDER BY available_at, id LIMIT 1',
+                (*kinds, QUEUED, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ? '
+                'WHERE id = ?',
+                (RUNNING, worker_id, now + lease_seconds, now, row[0])
+            )
+            return self._row_to_job(conn.execute(
+                f'SELECT {", ".join(self.COLUMNS)} FROM jobs WHERE id = ?', (row[0],)).fetchone())
+
+        return self._transaction(take)
+
+    def _update_owned(self, job_id, worker_id, assignments: str, params: tuple) -> bool:
+        cursor = self._connect().execute(
+            f'UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?',
+            (*params, time.time(), job_id, RUNNING, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        return self._update_owned(job_id, worker_id, 'lease_expires = ?', (time.time() + lease_seconds,))
+
+    def complete(self, job_id, worker_id, result=None):
+        return self._update_owned(
+            job_id, worker_id, 'status = ?, result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL',
+            (DONE, json.dumps(result or {}, ensure_ascii=False))
+        )
+
+    def fail(self, job_id, worker_id, error, retry_delay=None):
+        def update(conn):
+            row = conn.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?',
+                               (job_id, RUNNING, worker_id)).fetchone()
+            if row is None:
+                return False
+            attempts, max_attempts = row
+            now = time.time()
+            if attempts < max_attempts:
+                delay = retry_delay if retry_delay is not None else config.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+                conn.execute(
+                    'UPDATE jobs SET status = ?, available_at = ?, error = ?, lease_owner = NULL, lease_expires = NULL, '
+                    'updated_at = ? WHERE id = ?',
+                    (QUEUED, now + delay, error, now, job_id)
+                )
+            else:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? '
+                    'WHERE id = ?',
+                    (FAILED, error, now, job_id)
+                )
+            return True
+
+        return self._transaction(update)
+
+    def release(self, job_id, worker_id):
+        return self._update_owned(
+            job_id, worker_id,
+            'status = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires = NULL, available_at = ?',
+            (QUEUED, time.time())
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute(f'SELECT {", ".join(self.COLUMNS)} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def prune(self, keep_seconds):
+        cursor = self._connect().execute('DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                                         (DONE, FAILED, time.time() - keep_seconds))
+        return cursor.rowcount
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            f'SELECT {", ".join(self.COLUMNS)} FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def get_status(self):
+        conn = self._connect()
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        workers = [row[0] for row in conn.execute(
+            'SELECT DISTINCT lease_owner FROM jobs WHERE status = ? AND lease_expires >= ?', (RUNNING, time.time()))]
+        return {
+            'backend': self.name,
+            'counts': {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+            'active_workers': workers
+        }
+
+
+def create_job_queue(backend: Optional[str] = None) -> JobQueue:
+    """
+    按配置创建任务队列
+
+    backend 为 'sqlite' 或 "模块:类名"（自定义实现，无参数构造，需实现 JobQueue 接口）
+    """
+    backend = backend or config.JOB_QUEUE_BACKEND
+    if backend == 'sqlite':
+        return SQLiteJobQueue(config.JOB_QUEUE_DB_PATH)
+    module_name, _, class_name = backend.partition(':')
+    if not class_name:
+        raise ValueError(f"未知的任务队列后端: {backend}")
+    queue_class = getattr(importlib.import_module(module_name), class_name)
+    return queue_class()
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """全局任务队列，首次使用时才创建（需要 data 目录）"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = create_job_queue()
+    return _job_queue
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON 持久化模块
+为各类索引文件提供跨进程加锁的读改写和原子替换
+"""
+
+import copy
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from config import config
+from logger_config import get_logger
+
+logger = get_logger('json_store')
+
+
+def fsync_directory(directory: str) -> None:
+    """刷新目录项，使新建或替换的文件名在断电后仍然存在"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_text_atomic(path: str, text: str, fsync: Optional[str] = None, overwrite: bool = True) -> None:
+    """
+    写临时文件后原子替换，读者不会看到写了一半的文件
+
+    临时文件以 "." 开头、".tmp" 结尾，与目标文件在同一目录
+
+    Args:
+        path: 目标文件
+        text: 文件内容
+        fsync: none=不刷盘, file=替换前刷新文件内容, full=同时刷新目录；默认为 config.FSYNC_POLICY
+        overwrite: 目标已存在时是否覆盖；为 False 时通过硬链接创建，目标已存在则抛出 FileExistsError
+
+    Raises:
+        FileExistsError: overwrite 为 False 且目标已存在
+    """
+    fsync = fsync or config.FSYNC_POLICY
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if fsync != 'none':
+                f.flush()
+                os.fsync(f.fileno())
+        if overwrite:
+            os.replace(tmp_path, path)
+        else:
+            # link 在目标已存在时失败，不会覆盖同一秒内另一次运行保存的文件
+            os.link(tmp_path, path)
+            os.remove(tmp_path)
+        if fsync == 'full':
+            fsync_directory(directory)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data: Any, fsync: Optional[str] = None) -> None:
+    """以 JSON 格式原子写入文件"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, separators=(',', ':')), fsync)
+
+
+class JsonStore:
+    """
+    单个 JSON 文件的存储
+
+    - 写入：flock 加锁后读取最新内容，修改后写临时文件再 os.replace，读者不会看到半个文件
+    - 读取：按文件 mtime 缓存解析结果，文件未变化时不重复解析
+    """
+
+    def __init__(self, path: str, default_factory: Callable[[], Any] = dict):
+        self.path = path
+        self.default_factory = default_factory
+        self._cache: Optional[Tuple[Tuple[int, int], Any]] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Any:
+        """读取文件内容，文件不存在或损坏时返回默认值"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self.default_factory()
+        except (OSError, ValueError) as e:
+            logger.error(f"读取索引文件失败，使用空数据: {self.path}, 错误: {e}")
+            return self.default_factory()
+
+    def load(self) -> Any:
+        """
+        读取数据（只读，调用方不要修改返回值）
+
+        Returns:
+            Any: 解析后的数据
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self.default_factory()
+        version = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            if self._cache is not None and self._cache[0] == version:
+                return self._cache[1]
+            data = self._read()
+            self._cache = (version, data)
+            return data
+
+    @contextmanager
+    def update(self) -> Iterator[Any]:
+        """
+        加锁读改写
+
+        用法:
+            with store.update() as data:
+                data['key'] = value
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._read()
+                yield data
+                write_json_atomic(self.path, data)
+                with self._lock:
+                    self._cache = None
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def snapshot(self) -> Any:
+        """读取数据的可修改副本"""
+        return copy.deepcopy(self.load())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关键词匹配模块
+基于 Aho-Corasick 自动机的多关键词匹配，以及本地重点新闻标红
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import config
+from logger_config import get_logger
+from news_parser import CATEGORY_PATTERN, ITEM_PATTERN, dump_summary, is_structured, load_summary, strip_highlight
+
+logger = get_logger('keyword_matcher')
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配自动机
+
+    构建耗时与关键词总长度成正比，匹配耗时与文本长度加匹配数成正比，
+    与关键词数量无关。英文关键词不区分大小写。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self.patterns: List[str] = []
+
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern.lower():
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        if pattern not in self._output[state]:
+            self._output[state].append(pattern)
+            self.patterns.append(pattern)
+
+    def _build(self) -> None:
+        """按广度优先计算失败指针，并合并输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        遍历文本中的所有匹配
+
+        Yields:
+            Tuple[int, str]: (匹配起始位置, 关键词)
+        """
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for position, char in enumerate(text.lower()):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in output[state]:
+                yield position - len(pattern) + 1, pattern
+
+    def find_all(self, text: str) -> List[str]:
+        """返回文本中出现的关键词（去重，按首次出现顺序）"""
+        found: Dict[str, None] = {}
+        for _, pattern in self.iter_matches(text):
+            found.setdefault(pattern, None)
+        return list(found)
+
+
+def load_watchlist(keywords: Iterable[str], keywords_file: Optional[str] = None) -> List[str]:
+    """
+    合并配置中的关键词和关键词文件（每行一个，# 开头为注释）
+
+    Args:
+        keywords: 配置中的关键词
+        keywords_file: 关键词文件路径
+
+    Returns:
+        List[str]: 关键词列表
+    """
+    watchlist = list(keywords)
+    if keywords_file and os.path.exists(keywords_file):
+        with open(keywords_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    watchlist.append(line)
+    return watchlist
+
+
+class Highlighter:
+    """根据关注列表在本地标记重点新闻，替代由LLM标红"""
+
+    def __init__(self, keywords: Iterable[str], keywords_file: Optional[str] = None):
+        self._keywords = tuple(keywords)
+        self._keywords_file = keywords_file
+        self._matcher: Optional[AhoCorasick] = None
+        self._lock = threading.Lock()
+
+    @property
+    def matcher(self) -> AhoCorasick:
+        """关键词自动机，首次使用时构建"""
+        if self._matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    watchlist = load_watchlist(self._keywords, self._keywords_file)
+                    self._matcher = AhoCorasick(watchlist)
+                    logger.info(f"关注关键词自动机构建完成，共 {len(self._matcher)} 个关键词")
+        return self._matcher
+
+    def match(self, text: str) -> List[str]:
+        """返回条目命中的关注关键词"""
+        return self.matcher.find_all(strip_highlight(text))
+
+    def apply(self, content: str, fmt: Optional[str] = None) -> Tuple[str, int]:
+        """
+        重新标记新闻总结中的重点条目
+
+        移除LLM输出的标红标记，对命中关注关键词的条目统一加上标红标记，
+        保持 index.html 的展示方式不变；结构化总结改为设置条目的 highlight（并清除LLM标记的 spans）
+
+        Returns:
+            Tuple[str, int]: (处理后的总结, 标红条目数)
+        """
+        if is_structured(content, fmt):
+            document = load_summary(content)
+            highlighted = 0
+            for section in document['sections']:
+                for item in section['items']:
+                    item['highlight'] = bool(self.matcher.find_all(item['text']))
+                    item['spans'] = []  # 与 markdown 相同，命中的条目整条标红
+                    highlighted += item['highlight']
+            return dump_summary(document), highlighted
+
+        lines = []
+        highlighted = 0
+        for line in content.splitlines():
+            item_match = ITEM_PATTERN.match(line)
+            if item_match and not CATEGORY_PATTERN.match(line):
+                text = strip_highlight(item_match.group(1))
+                if text:
+                    if self.matcher.find_all(text):
+                        text = f'<font color="red">{text}</font>'
+                        highlighted += 1
+                    line = f"- {text}"
+            lines.append(line)
+
+        result = '\n'.join(lines)
+        if content.endswith('\n'):
+            result += '\n'
+        return result, highlighted
+
+
+# 全局重点新闻标记器实例
+highlighter = Highlighter(config.HIGHLIGHT_KEYWORDS, config.HIGHLIGHT_KEYWORDS_FILE)
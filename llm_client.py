@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM调用模块
+按顺序在多个 OpenAI 兼容服务之间故障转移，可选对冲请求，并记录各服务的延迟和错误统计
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from json_store import JsonStore
+from logger_config import get_logger
+
+logger = get_logger('llm_client')
+
+
+@dataclass
+class Provider:
+    """OpenAI 兼容服务配置"""
+
+    name: str
+    base_url: Optional[str]
+    api_key: Optional[str]
+    model: str
+    timeout: float = 120.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], index: int = 0) -> 'Provider':
+        """从 secrets.py / 环境变量中的字典创建"""
+        return cls(
+            name=data.get('name') or f"provider-{index}",
+            base_url=data.get('base_url'),
+            api_key=data.get('api_key'),
+            model=data['model'],
+            timeout=float(data.get('timeout', config.LLM_DEFAULT_TIMEOUT))
+        )
+
+
+class AllProvidersFailed(Exception):
+    """所有服务均调用失败"""
+
+
+class ProviderStats:
+    """
+    各服务的延迟和错误统计（持久化，跨运行累积）
+
+    文件结构: {服务名: {'latencies', 'successes', 'errors', 'last_error', 'last_error_at'}}
+    """
+
+    def __init__(self, path: str):
+        self.store = JsonStore(path)
+
+    def record_success(self, name: str, latency: float) -> None:
+        with self.store.update() as data:
+            stats = data.setdefault(name, self._empty())
+            stats['successes'] += 1
+            stats['latencies'] = (stats['latencies'] + [round(latency, 3)])[-config.LLM_STATS_WINDOW:]
+
+    def record_error(self, name: str, error: str) -> None:
+        with self.store.update() as data:
+            stats = data.setdefault(name, self._empty())
+            stats['errors'] += 1
+            stats['last_error'] = error[:500]
+            stats['last_error_at'] = datetime.now().isoformat(timespec='seconds')
+
+    def p95(self, name: str) -> Optional[float]:
+        """最近延迟的 p95，样本不足时返回None"""
+        latencies = self.store.load().get(name, {}).get('latencies', [])
+        if len(latencies) < config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    def summary(self) -> Dict[str, Any]:
+        """统计摘要（用于状态接口）"""
+        result = {}
+        for name, stats in self.store.load().items():
+            latencies = sorted(stats['latencies'])
+            total = stats['successes'] + stats['errors']
+            result[name] = {
+                'successes': stats['successes'],
+                'errors': stats['errors'],
+                'error_rate': round(stats['errors'] / total, 3) if total else 0.0,
+                'p50_seconds': latencies[len(latencies) // 2] if latencies else None,
+                'p95_seconds': self.p95(name),
+                'last_error': stats['last_error'],
+                'last_error_at': stats['last_error_at']
+            }
+        return result
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {'latencies': [], 'successes': 0, 'errors': 0, 'last_error': None, 'last_error_at': None}
+
+
+class LLMClient:
+    """按顺序故障转移的 chat.completions 客户端"""
+
+    def __init__(self, providers: List[Provider], stats: ProviderStats, hedge: Optional[bool] = None,
+                 ledger: Any = None):
+        if not providers:
+            raise ValueError("至少需要配置一个LLM服务")
+        self.providers = providers
+        self.stats = stats
+        self.hedge = config.LLM_HEDGE_ENABLED if hedge is None else hedge
+        self.ledger = ledger
+        # 本客户端所有调用的token用量合计（对冲请求都会计入）
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'calls': 0}
+        self._usage_lock = threading.Lock()
+
+    def _call(self, provider: Provider, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """调用单个服务并记录统计"""
+        import openai
+
+        client = openai.OpenAI(
+            api_key=provider.api_key,
+            base_url=provider.base_url,
+            timeout=provider.timeout,
+            max_retries=0  # 重试交给故障转移
+        )
+        start = time.monotonic()
+        try:
+            response = client.chat.completions.create(model=provider.model, messages=messages, **kwargs)
+        except Exception as e:
+            self.stats.record_error(provider.name, str(e))
+            logger.warning(f"LLM服务调用失败: {provider.name}, 错误: {e}")
+            raise
+        latency = time.monotonic() - start
+        self.stats.record_success(provider.name, latency)
+        self._record_usage(response, latency)
+        logger.info(f"LLM服务调用成功: {provider.name}, 耗时 {latency:.2f} 秒")
+        return response
+
+    def _record_usage(self, response: Any, latency: float) -> None:
+        """记录 response.usage，统计失败不影响调用结果"""
+        from token_budget import usage_to_dict
+
+        usage = getattr(response, 'usage', None)
+        try:
+            tokens = self.ledger.record_call(usage, latency) if self.ledger else usage_to_dict(usage)
+        except Exception as e:
+            logger.error(f"记录token用量失败: {e}")
+            tokens = usage_to_dict(usage)
+        with self._usage_lock:
+            for key, value in tokens.items():
+                self.usage[key] += value
+            self.usage['calls'] += 1
+
+    def hedge_delay(self, provider: Provider) -> float:
+        """发起对冲请求前的等待时间：该服务的 p95 延迟，样本不足时使用配置值"""
+        p95 = self.stats.p95(provider.name)
+        return p95 if p95 is not None else config.LLM_HEDGE_DELAY
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[Any, Provider]:
+        """
+        调用 chat.completions
+
+        Args:
+            messages: 对话消息
+            **kwargs: 透传给 chat.completions.create 的参数
+
+        Returns:
+            Tuple[Any, Provider]: (响应, 实际返回结果的服务)
+
+        Raises:
+            AllProvidersFailed: 所有服务均失败
+        """
+        if self.hedge and len(self.providers) > 1:
+            return self._complete_hedged(messages, **kwargs)
+
+        errors = []
+        for provider in self.providers:
+            try:
+                return self._call(provider, messages, **kwargs), provider
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+        raise AllProvidersFailed('; '.join(errors))
+
+    def _complete_hedged(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[Any, Provider]:
+        """
+        对冲模式：当前服务在其 p95 延迟内未返回时，同时向下一个服务发起请求；
+        任一请求失败时立即转移到下一个服务，先成功的结果被采用
+        """
+        # 请求在守护线程中执行：采用结果后不再等待落后的请求，进程也不会因其未结束而无法退出
+        results: queue.Queue = queue.Queue()
+        errors = []
+        next_index = 0
+        pending = 0
+
+        def call(provider: Provider) -> None:
+            try:
+                results.put((provider, self._call(provider, messages, **kwargs), None))
+            except Exception as e:
+                results.put((provider, None, e))
+
+        def launch() -> Provider:
+            nonlocal next_index, pending
+            provider = self.providers[next_index]
+            next_index += 1
+            pending += 1
+            threading.Thread(target=call, args=(provider,), name=f'llm-hedge-{provider.name}', daemon=True).start()
+            return provider
+
+        current = launch()
+        while pending:
+            timeout = self.hedge_delay(current) if next_index < len(self.providers) else None
+            try:
+                provider, response, error = results.get(timeout=timeout)
+            except queue.Empty:
+                logger.info(f"LLM服务 {current.name} 超过 {timeout:.2f} 秒未返回，发起对冲请求")
+                current = launch()
+                continue
+
+            pending -= 1
+            if error is None:
+                return response, provider
+            errors.append(f"{provider.name}: {error}")
+            # 失败后立即转移到下一个服务，不等待其他仍在执行的请求
+            if next_index < len(self.providers):
+                current = launch()
+
+        raise AllProvidersFailed('; '.join(errors))
+
+
+def build_providers(provider_dicts: Optional[List[Dict[str, Any]]],
+                    api_key: Optional[str], base_url: Optional[str], model: Optional[str]) -> List[Provider]:
+    """
+    生成服务列表：优先使用 LLM_PROVIDERS，否则使用单个 OPENAI_* 配置
+
+    Args:
+        provider_dicts: secrets.py 或环境变量中的 LLM_PROVIDERS
+        api_key: OPENAI_API_KEY
+        base_url: OPENAI_BASE_URL
+        model: DEFAULT_MODEL
+    """
+    if provider_dicts:
+        return [Provider.from_dict(data, i) for i, data in enumerate(provider_dicts)]
+    return [Provider(name='default', base_url=base_url, api_key=api_key, model=model,
+                     timeout=config.LLM_DEFAULT_TIMEOUT)]
+
+
+# 全局服务统计实例
+provider_stats = ProviderStats(config.LLM_STATS_PATH)
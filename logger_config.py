@@ -7,6 +7,7 @@
 """
 
 import logging
+import os
 from logging.handlers import TimedRotatingFileHandler
 from typing import Optional
 
@@ -34,6 +35,9 @@ class LoggerManager:
         if logger.handlers:
             return logger
 
+        # 日志目录在首次创建日志器时才建立
+        os.makedirs(config.LOGS_DIR, exist_ok=True)
+
         # 创建格式器
         formatter = logging.Formatter(config.LOG_FORMAT)
 
@@ -43,7 +47,8 @@ class LoggerManager:
             when='midnight',
             interval=1,
             backupCount=config.LOG_BACKUP_COUNT,
-            encoding='utf-8'
+            encoding='utf-8',
+            delay=True  # 首次写入时才打开文件
         )
         file_handler.setFormatter(formatter)
         file_handler.setLevel(logging.INFO)
@@ -54,7 +59,8 @@ class LoggerManager:
             when='midnight',
             interval=1,
             backupCount=config.LOG_BACKUP_COUNT,
-            encoding='utf-8'
+            encoding='utf-8',
+            delay=True  # 首次写入时才打开文件
         )
         error_handler.setFormatter(formatter)
         error_handler.setLevel(logging.ERROR)
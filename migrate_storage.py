@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+存储迁移工具
+在文件和 SQLite 存储后端之间复制新闻总结，可重复执行；
+--fix-formats 将之前保存为 .md 的结构化总结改为 .json
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Optional, Sequence
+
+from config import config
+from logger_config import get_logger
+from news_parser import JSON, is_structured
+from news_storage import FileStorage, NewsStorage, SQLiteStorage
+
+logger = get_logger('migrate_storage')
+
+BACKENDS = ('file', 'sqlite')
+
+
+def open_storage(backend: str, news_dir: Optional[str] = None, db_path: Optional[str] = None) -> NewsStorage:
+    """按名称创建存储后端"""
+    if backend == 'file':
+        return FileStorage(news_dir)
+    return SQLiteStorage(db_path or config.SQLITE_DB_PATH)
+
+
+def migrate(source: NewsStorage, target: NewsStorage, overwrite: bool = False) -> Dict[str, int]:
+    """
+    将 source 中的全部新闻复制到 target
+
+    Args:
+        source: 源存储
+        target: 目标存储
+        overwrite: 目标中已存在的新闻是否覆盖，默认跳过
+
+    Returns:
+        Dict[str, int]: {'copied': 复制数, 'skipped': 跳过数}
+    """
+    copied = skipped = 0
+    for news_path, run_time, content, fmt in source.iter_runs():
+        if not overwrite and target.exists(news_path):
+            skipped += 1
+            continue
+        # 保持原路径，不做同一秒顺延
+        target.save(content, run_time, overwrite=True, fmt=fmt)
+        copied += 1
+        if copied % 500 == 0:
+            print(f"已复制 {copied} 条...", file=sys.stderr)
+    logger.info(f"存储迁移完成: {source.name} -> {target.name}, 复制 {copied} 条, 跳过 {skipped} 条")
+    return {'copied': copied, 'skipped': skipped}
+
+
+def fix_formats(storage: FileStorage) -> int:
+    """
+    文件后端按扩展名记录格式：将保存为 .md 的结构化总结（JSON 对象）改名为 .json
+
+    只在升级时执行一次，之后保存的总结按格式选择扩展名（SQLite 后端在添加 format 列时自动完成）
+
+    Returns:
+        int: 改名的文件数
+    """
+    renamed = 0
+    for news_path, _, content, fmt in storage.iter_runs():
+        if fmt == JSON or not is_structured(content):
+            continue
+        target = storage.file_path(news_path, JSON)
+        if os.path.exists(target):
+            logger.warning(f"{target} 已存在，保留 {news_path} 的 .md 文件")
+            continue
+        os.rename(storage.location(news_path), target)
+        renamed += 1
+    logger.info(f"结构化总结改名完成: {renamed} 个文件")
+    return renamed
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='在文件和SQLite存储之间迁移新闻总结')
+    parser.add_argument('--from', dest='source', choices=BACKENDS, default='file', help='源存储，默认 file')
+    parser.add_argument('--to', dest='target', choices=BACKENDS, default='sqlite', help='目标存储，默认 sqlite')
+    parser.add_argument('--news-dir', help=f'新闻目录，默认 {config.NEWS_DIR}')
+    parser.add_argument('--db', help=f'SQLite 数据库文件，默认 {config.SQLITE_DB_PATH}')
+    parser.add_argument('--overwrite', action='store_true', help='覆盖目标中已存在的新闻')
+    parser.add_argument('--fix-formats', action='store_true',
+                        help='只将文件存储中保存为 .md 的结构化总结改名为 .json（升级后执行一次）')
+    args = parser.parse_args(argv)
+
+    if args.fix_formats:
+        renamed = fix_formats(FileStorage(args.news_dir))
+        print(f"✅ 结构化总结改名完成: {renamed} 个文件")
+        return
+
+    if args.source == args.target:
+        parser.error('源存储和目标存储不能相同')
+
+    source = open_storage(args.source, args.news_dir, args.db)
+    target = open_storage(args.target, args.news_dir, args.db)
+
+    start = time.perf_counter()
+    result = migrate(source, target, overwrite=args.overwrite)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ 迁移完成: {args.source} -> {args.target}")
+    print(f"   复制: {result['copied']} 条")
+    print(f"   跳过: {result['skipped']} 条（目标中已存在）")
+    print(f"   耗时: {elapsed:.2f} 秒")
+    if args.target == 'sqlite':
+        print("   在 config.py 中设置 STORAGE_BACKEND = 'sqlite' 后生效")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,39 @@
 # -*- coding: utf-8 -*-
 
 import requests
-import openai
+import json
 import os
+import sys
 from datetime import datetime
 import time
 
+from config import config
+
 # 导入配置文件
 try:
     from secrets import OPENAI_API_KEY, OPENAI_BASE_URL, DEFAULT_MODEL
 except ImportError:
-    print("错误：找不到 secrets.py 配置文件")
-    print("请复制 secrets.example.py 为 secrets.py 并填入正确的配置信息")
-    exit(1)
+    if not os.environ.get('OPENAI_API_KEY') and not os.environ.get('LLM_PROVIDERS'):
+        print("错误：找不到 secrets.py 配置文件")
+        print("请复制 secrets.example.py 为 secrets.py 并填入正确的配置信息")
+        exit(1)
+    OPENAI_API_KEY, OPENAI_BASE_URL, DEFAULT_MODEL = None, None, None
+
+# 环境变量优先于 secrets.py，便于部署和指向本地测试服务
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', OPENAI_API_KEY)
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', OPENAI_BASE_URL)
+DEFAULT_MODEL = os.environ.get('DEFAULT_MODEL', DEFAULT_MODEL)
+
+# 多个LLM服务（可选），按顺序故障转移，格式见 secrets.example.py
+try:
+    from secrets import LLM_PROVIDERS
+except ImportError:
+    LLM_PROVIDERS = None
+if os.environ.get('LLM_PROVIDERS'):
+    LLM_PROVIDERS = json.loads(os.environ['LLM_PROVIDERS'])
+
+# 新闻来源地址
+NEWS_SOURCE_URL = os.environ.get('NEWS_SOURCE_URL', "https://www.cls.cn/telegraph")
 
 def get_webpage_content(url):
     """获取网页HTML内容"""
@@ -29,99 +50,384 @@ def get_webpage_content(url):
         print(f"获取网页内容失败: {e}")
         return None
 
-def summarize_with_llm(html_content, api_key=None):
-    """使用LLM总结网页内容"""
-    try:
-        # 使用配置文件中的API密钥和base_url
-        client = openai.OpenAI(
-            api_key=OPENAI_API_KEY,
-            base_url=OPENAI_BASE_URL
-        )
+def build_prompt(html_content):
+    """生成总结提示词；本地标红时不再要求LLM标红，节省提示词且结果稳定"""
+    if config.LLM_OUTPUT_FORMAT == 'json':
+        return build_json_prompt(html_content)
+    if config.LOCAL_HIGHLIGHT:
+        highlight_requirement = ""
+        highlight_template = ""
+    else:
+        highlight_requirement = "6. 重点关注“人工智能”，“算力”,“央行”，“国家政策”，“政策会议”，“金融会议”，“海外投行”，这些新闻标红输出\n"
+        highlight_template = "— <font color=\"red\">重点关注的新闻3</font>\n"
 
-        prompt = f"""
+    return f"""
 请分析以下HTML内容，提取并总结其中的电报新闻内容。
 要求：
 1. 只关注新闻内容，忽略导航、广告等无关信息
 3. 用markdown格式输出
 4. 将每条新闻总结为一句话突出重点，最好不要超过20字
 5. 按行业归类输出
-6. 重点关注“人工智能”，“算力”,“央行”，“国家政策”，“政策会议”，“金融会议”，“海外投行”，这些新闻标红输出
-
+{highlight_requirement}
 大致输出模板：
 ## 行业名称
 - 新闻1
 - 新闻2
-— <font color="red">重点关注的新闻3</font>
+{highlight_template}
+HTML内容：
+{html_content}
+"""
+
+def build_json_prompt(html_content):
+    """结构化输出模式的提示词，输出结构见 news_parser.SUMMARY_SCHEMA"""
+    if config.LOCAL_HIGHLIGHT:
+        highlight_requirement = "5. highlight 一律填 false\n"
+    else:
+        highlight_requirement = "5. 涉及“人工智能”，“算力”,“央行”，“国家政策”，“政策会议”，“金融会议”，“海外投行”的新闻 highlight 填 true，其余填 false\n"
+
+    return f"""
+请分析以下HTML内容，提取并总结其中的电报新闻内容。
+要求：
+1. 只关注新闻内容，忽略导航、广告等无关信息
+2. 将每条新闻总结为一句话突出重点，最好不要超过20字，不使用markdown或HTML标记
+3. 按行业归类，category 为行业名称
+4. source_time 为新闻原文的发布时间（HH:MM），没有时填 null
+{highlight_requirement}
+只输出JSON，格式：
+{{"sections": [{{"category": "行业名称", "items": [{{"text": "新闻1", "highlight": false, "source_time": "09:30"}}]}}]}}
 
 HTML内容：
 {html_content}
 """
 
-        response = client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=[
-                {"role": "system", "content": "你是一个专业的新闻总结助手，擅长从网页内容中提取和总结新闻信息。"},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=2000,
-            temperature=0.3
-        )
-
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"LLM总结失败: {e}")
+def response_format():
+    """结构化输出模式下 chat.completions 的 response_format 参数，markdown 模式返回None"""
+    if config.LLM_OUTPUT_FORMAT != 'json':
         return None
+    if config.LLM_JSON_MODE == 'json_object':
+        return {"type": "json_object"}
+    from news_parser import SUMMARY_SCHEMA
+    return {"type": "json_schema", "json_schema": {"name": "news_summary", "strict": True, "schema": SUMMARY_SCHEMA}}
 
-def save_to_file(content):
-    """将内容保存到文件，按日期分类目录，文件名按时间命名"""
+def parse_response(text, log=print):
+    """校验LLM输出：结构化输出模式下返回规范化后的JSON总结，不符合结构时返回None"""
+    if config.LLM_OUTPUT_FORMAT != 'json':
+        return text
+    from news_parser import SummaryFormatError, dump_summary, load_summary
     try:
-        now = datetime.now()
-        date_dir = now.strftime("%Y%m%d")
-        time_filename = now.strftime("%H-%M-%S.md")
+        document = load_summary(text or '')
+    except SummaryFormatError as e:
+        log(f"LLM输出不符合结构: {e}")
+        return None
+    log(f"结构化输出校验通过: {len(document['sections'])} 个分类，{sum(len(s['items']) for s in document['sections'])} 条新闻")
+    return dump_summary(document)
+
+def extract_content(html_content):
+    """提取发送给LLM的正文（PROMPT_STRIP_HTML 关闭时保留原始HTML）"""
+    from token_budget import extract_text
+    return extract_text(html_content) if config.PROMPT_STRIP_HTML else html_content
+
+def summarize_with_llm(html_content, api_key=None):
+    """使用LLM总结网页内容"""
+    return summarize_content(extract_content(html_content), len(html_content))
 
-        # 创建news/日期目录
-        news_date_dir = os.path.join("news", date_dir)
-        if not os.path.exists(news_date_dir):
-            os.makedirs(news_date_dir)
+def summarize_content(content, source_chars=None, log=print, stats=None):
+    """
+    使用LLM总结已提取的正文
 
-        filepath = os.path.join(news_date_dir, time_filename)
+    log 用于输出过程信息（重新总结时并发调用，改为写日志）；
+    传入 stats 字典时写入本次调用的服务、模型、token用量和耗时
+    """
+    try:
+        from llm_client import LLMClient, build_providers, provider_stats
+        from token_budget import fit_prompt, token_ledger
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        started_at = datetime.now()
 
-        print(f"新闻总结已保存到: {filepath}")
-        return filepath
+        # 按预算生成提示词：超出单次或当天剩余预算时截断
+        budget = token_ledger.prompt_budget(started_at)
+        if budget == 0:
+            log("今日token预算已用完，跳过LLM总结")
+            return None
+        fitted = fit_prompt(build_prompt, content, budget)
+        if fitted is None:
+            log(f"剩余预算 {budget} token 不足以容纳网页内容，跳过LLM总结")
+            return None
+        prompt, estimated, truncated = fitted
+        log(f"提示词估算token数: {estimated}（网页 {source_chars or len(content)} 字符，发送 {len(content)} 字符）")
+        if truncated:
+            log(f"内容超出预算 {budget} token，已截断")
+
+        # 按顺序尝试配置的LLM服务
+        providers = build_providers(LLM_PROVIDERS, OPENAI_API_KEY, OPENAI_BASE_URL, DEFAULT_MODEL)
+        client = LLMClient(providers, provider_stats, ledger=token_ledger)
+
+        options = {}
+        output_format = response_format()
+        if output_format:
+            options['response_format'] = output_format
+
+        provider = None
+        start = time.monotonic()
+        try:
+            response, provider = client.complete(
+                messages=[
+                    {"role": "system", "content": "你是一个专业的新闻总结助手，擅长从网页内容中提取和总结新闻信息。"},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=config.LLM_MAX_OUTPUT_TOKENS,
+                temperature=0.3,
+                **options
+            )
+        finally:
+            record = {
+                'run_time': started_at.isoformat(timespec='seconds'),
+                'provider': provider.name if provider else None,
+                'model': provider.model if provider else None,
+                **client.usage,
+                'estimated_prompt_tokens': estimated,
+                'truncated': truncated,
+                'latency_seconds': round(time.monotonic() - start, 3)
+            }
+            token_ledger.record_run(record)
+            if stats is not None:
+                stats.update(record)
+
+        log(f"LLM服务: {provider.name}（{provider.model}）")
+        log(f"token用量: 提示词 {client.usage['prompt_tokens']}, 输出 {client.usage['completion_tokens']}")
+        return parse_response(response.choices[0].message.content, log)
+    except Exception as e:
+        log(f"LLM总结失败: {e}")
+        return None
+
+def save_to_file(content, now=None, fmt='markdown'):
+    """
+    保存总结（默认保存为 news/日期/时间.md，结构化总结为 时间.json，存储后端见 config.STORAGE_BACKEND）
+
+    先写临时文件再原子替换；同一秒已有新闻时顺延1秒，返回实际的新闻路径
+    """
+    try:
+        from news_storage import news_storage
+
+        now = now or datetime.now()
+        news_path = news_storage.save(content, now, fmt=fmt)
+
+        print(f"新闻总结已保存到: {news_storage.location(news_path)}")
+        return news_path
     except Exception as e:
         print(f"保存文件失败: {e}")
         return None
 
-def main():
-    """主函数"""
-    # 目标网址
-    url = "https://www.cls.cn/telegraph"
+def highlight_summary(summary, fmt):
+    """按关注列表在本地标记重点新闻"""
+    if not config.LOCAL_HIGHLIGHT:
+        return summary
+    try:
+        from keyword_matcher import highlighter
+        summary, highlighted = highlighter.apply(summary, fmt)
+        print(f"重点新闻标记完成，标红条目: {highlighted} 条")
+    except Exception as e:
+        print(f"重点新闻标记失败: {e}")
+    return summary
 
-    print("开始获取网页内容...")
-    html_content = get_webpage_content(url)
+def dedup_summary(summary, run_time, key, fmt):
+    """与最近24小时的新闻比较，标记或移除近似重复的条目（登记在本次运行的临时键下）"""
+    try:
+        from news_dedup import dedup_index
+        summary, duplicates = dedup_index.process_summary(summary, run_time, path=key, fmt=fmt)
+        print(f"去重检查完成，重复条目: {duplicates} 条")
+    except Exception as e:
+        # 去重失败不影响保存
+        print(f"去重检查失败: {e}")
+    return summary
+
+def dedup_key(run, run_time):
+    """
+    去重索引中本次运行的临时键
+
+    同一秒的两次运行保存前路径相同，按路径登记会互相覆盖重复标记；
+    先以 "路径#运行ID" 登记，保存确定实际路径后再改为新闻路径
+    """
+    return f"{run_time.strftime('%Y%m%d/%H-%M-%S')}#{run.run_id}"
+
+def assign_news_path(run_time, news_path, key):
+    """将去重索引中的临时键改为实际保存的新闻路径，返回实际运行时间（同一秒已有新闻时会顺延）"""
+    saved_time = datetime.strptime(news_path, '%Y%m%d/%H-%M-%S')
+    if saved_time != run_time.replace(microsecond=0):
+        print(f"同一秒已有新闻，保存路径顺延为: {news_path}")
+    try:
+        from news_dedup import dedup_index
+        dedup_index.rename(key, news_path)
+    except Exception as e:
+        print(f"更新去重索引失败: {e}")
+    return saved_time
+
+def update_digest(summary, run_time, fmt):
+    """将本次总结合并到当天的汇总（本地合并，不调用LLM）"""
+    try:
+        from news_digest import daily_digest
+        added, merged = daily_digest.add_summary(summary, run_time.strftime('%Y%m%d/%H-%M-%S'), run_time, fmt)
+        print(f"每日汇总更新完成，新增 {added} 条，合并重复 {merged} 条")
+        # 补充当天之前合并失败的新闻
+        missing = daily_digest.catch_up(run_time.strftime('%Y%m%d'))
+        if missing:
+            print(f"每日汇总补充合并 {missing} 次运行")
+    except Exception as e:
+        # 下次保存或每日清理时补充合并
+        print(f"每日汇总更新失败: {e}")
+
+def update_stats(summary, news_path, fmt):
+    """将本次总结计入按小时的统计（/news/stats）"""
+    try:
+        from news_stats import news_stats
+        news_stats.add_summary(summary, news_path, fmt)
+        print("新闻统计更新完成")
+    except Exception as e:
+        print(f"新闻统计更新失败: {e}")
+
+def index_entities(summary, news_path, fmt):
+    """识别本次总结中提到的股票，更新实体索引（/news/entity）"""
+    try:
+        from entity_index import entity_index
+        added = entity_index.add_summary(summary, news_path, fmt)
+        print(f"实体索引更新完成，关联 {added} 条")
+    except Exception as e:
+        # 可执行 python3 entity_index.py 补充索引
+        print(f"实体索引更新失败: {e}")
+
+def enqueue_alerts(summary, run_time, fmt):
+    """匹配关键词订阅，写入待投递提醒（投递由Web进程异步完成）"""
+    try:
+        from news_alerts import enqueue_matches
+        count = enqueue_matches(summary, run_time.strftime('%Y%m%d/%H-%M-%S'), fmt)
+        print(f"关键词订阅匹配完成，待投递提醒: {count} 条")
+    except Exception as e:
+        print(f"关键词订阅匹配失败: {e}")
+
+# 流程各阶段：输出保存在本次运行的工作目录中，失败后重试从失败的阶段继续
 
+def save_snapshot(html_content):
+    """保存原始网页快照（内容未变化时不重复保存），返回快照ID，失败或未启用时返回None"""
+    if not config.SNAPSHOT_ENABLED:
+        return None
+    try:
+        from snapshot_store import snapshot_store
+        snapshot_id = snapshot_store.put(html_content)
+        print(f"网页快照: {snapshot_id[:12]}")
+        return snapshot_id
+    except Exception as e:
+        print(f"保存网页快照失败: {e}")
+        return None
+
+def link_snapshot(news_path, snapshot_id):
+    """记录新闻总结对应的网页快照"""
+    try:
+        from snapshot_store import snapshot_store
+        snapshot_store.link(news_path, snapshot_id)
+    except Exception as e:
+        print(f"记录网页快照关联失败: {e}")
+
+def read_page(run):
+    """读取本次运行抓取到的网页（保存在快照存储或运行目录中）"""
+    snapshot_id = run.state.get('snapshot_id')
+    if snapshot_id:
+        from snapshot_store import snapshot_store
+        html_content = snapshot_store.get(snapshot_id)
+        if html_content is not None:
+            return html_content
+    return run.read_text('page.html')
+
+def fetch_stage(run):
+    """抓取网页"""
+    print("开始获取网页内容...")
+    html_content = get_webpage_content(run.source)
     if not html_content:
         print("无法获取网页内容")
-        return
+        return False
+    snapshot_id = save_snapshot(html_content)
+    if snapshot_id:
+        run.update(snapshot_id=snapshot_id)
+    else:
+        run.write_text('page.html', html_content)
+    # 新闻按抓取时间保存：失败的运行可能在一小时内（PIPELINE_RESUME_MAX_AGE）继续，保存时网页已不是当前的内容
+    run.update(fetched_at=datetime.now().isoformat())
+    print("网页内容获取成功")
+    return True
 
-    print("网页内容获取成功，开始LLM总结...")
-    summary = summarize_with_llm(html_content)
+def extract_stage(run):
+    """提取正文"""
+    html_content = read_page(run)
+    run.write_text('content.txt', extract_content(html_content))
+    run.update(html_chars=len(html_content))
+    return True
 
+def summarize_stage(run):
+    """LLM总结"""
+    print("开始LLM总结...")
+    summary = summarize_content(run.read_text('content.txt'), run.state.get('html_chars'))
     if not summary:
         print("LLM总结失败")
-        return
+        return False
+    run.write_text('summary.md', summary)
+    # 总结的格式随运行保存，之后各步骤按该格式解析，不按内容判断
+    run.update(summary_format=config.LLM_OUTPUT_FORMAT)
+    return True
 
-    print("LLM总结完成，保存到文件...")
-    filepath = save_to_file(summary)
+def persist_stage(run):
+    """标红、去重后保存，并更新汇总和提醒；已完成的步骤记录在运行状态中，重试时跳过"""
+    fmt = run.state.get('summary_format', config.LLM_OUTPUT_FORMAT)
+    if 'run_time' not in run.state:
+        run_time = datetime.fromisoformat(run.state['fetched_at']) if 'fetched_at' in run.state else datetime.now()
+        summary = highlight_summary(run.read_text('summary.md'), fmt)
+        summary = dedup_summary(summary, run_time, dedup_key(run, run_time), fmt)
+        run.write_text('final.md', summary)
+        run.update(run_time=run_time.isoformat())
+    run_time = datetime.fromisoformat(run.state['run_time'])
+    summary = run.read_text('final.md')
 
-    if filepath:
-        print("脚本执行完成！")
-        print(f"新闻总结已保存到: {filepath}")
-    else:
-        print("保存文件失败")
+    if 'news_path' not in run.state:
+        print("LLM总结完成，保存到文件...")
+        news_path = save_to_file(summary, run_time, fmt)
+        if not news_path:
+            print("保存文件失败")
+            return False
+        run.update(news_path=news_path)
+        if run.state.get('snapshot_id'):
+            link_snapshot(news_path, run.state['snapshot_id'])
+    news_path = run.state['news_path']
+
+    run_time = assign_news_path(run_time, news_path, dedup_key(run, run_time))
+    update_digest(summary, run_time, fmt)
+    update_stats(summary, news_path, fmt)
+    index_entities(summary, news_path, fmt)
+    enqueue_alerts(summary, run_time, fmt)
+    print("脚本执行完成！")
+    print(f"新闻总结已保存到: {news_path}")
+    return True
+
+STAGES = (
+    ('fetch', fetch_stage),
+    ('extract', extract_stage),
+    ('summarize', summarize_stage),
+    ('persist', persist_stage),
+)
+
+def main():
+    """主函数，返回退出码：0=成功，1=失败，SKIPPED_EXIT_CODE=上次失败的运行尚在退避中，本次未执行"""
+    from news_pipeline import SKIPPED_EXIT_CODE, open_run
+
+    # 目标网址
+    url = NEWS_SOURCE_URL
+
+    # 队列任务通过 NEWS_RUN_ID 指定运行ID，重试时继续同一个运行
+    run, wait = open_run(url, os.environ.get('NEWS_RUN_ID'))
+    if run is None:
+        print(f"上次运行失败，{wait:.0f} 秒后才能重试")
+        return SKIPPED_EXIT_CODE
+    if run.state['attempts']:
+        print(f"继续运行 {run.run_id}（第 {run.state['attempts'] + 1} 次尝试，上次失败: {run.state.get('last_error')}）")
+
+    return 0 if run.execute(STAGES) else 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关键词提醒模块
+管理关键词订阅，新总结保存后一次匹配所有订阅，并通过 webhook 异步投递
+"""
+
+import ipaddress
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from config import config
+from json_store import JsonStore, write_json_atomic
+from keyword_matcher import AhoCorasick
+from logger_config import get_logger
+from news_parser import iter_items
+
+logger = get_logger('news_alerts')
+
+
+def check_webhook_url(url: Any) -> None:
+    """
+    校验 webhook 地址，防止借订阅让服务器请求内网（SSRF）；添加订阅和每次投递前都会检查
+
+    - 只允许 http/https
+    - 配置了 ALERT_ALLOWED_HOSTS 时主机必须在白名单中（或为其子域名）
+    - 主机解析出的所有地址都必须是公网地址（不能是回环、私有、链路本地、组播、保留地址），
+      开启 ALERT_ALLOW_PRIVATE_HOSTS 时不检查（本地接收端、内网部署）
+
+    Raises:
+        ValueError: 地址不允许
+    """
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        raise ValueError("webhook 地址必须以 http:// 或 https:// 开头")
+    try:
+        parsed = urlsplit(url)
+        host = parsed.hostname
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    except ValueError as e:
+        raise ValueError(f"webhook 地址格式不正确: {e}")
+    if not host:
+        raise ValueError("webhook 地址缺少主机名")
+    allowed = config.ALERT_ALLOWED_HOSTS
+    if allowed and not any(host == h or host.endswith('.' + h) for h in allowed):
+        raise ValueError(f"webhook 主机不在白名单中: {host}")
+    if config.ALERT_ALLOW_PRIVATE_HOSTS:
+        return
+
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"无法解析 webhook 主机: {host}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%', 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"webhook 地址不能指向本机或内网: {host}（{address}）")
+
+
+class SubscriptionRegistry:
+    """
+    关键词订阅注册表
+
+    文件结构: {订阅ID: {'id', 'keywords', 'url', 'created'}}
+    """
+
+    def __init__(self, path: str):
+        self.store = JsonStore(path)
+        self._compiled: Optional[Tuple[Any, AhoCorasick, Dict[str, Set[str]]]] = None
+        self._lock = threading.Lock()
+
+    def list(self) -> List[Dict[str, Any]]:
+        """列出所有订阅"""
+        return sorted(self.store.load().values(), key=lambda sub: sub['created'])
+
+    def add(self, keywords: List[str], url: str) -> Dict[str, Any]:
+        """
+        添加订阅
+
+        Args:
+            keywords: 关键词列表
+            url: 接收提醒的 webhook 地址（http/https，必须是公网地址，见 check_webhook_url）
+
+        Returns:
+            Dict[str, Any]: 新建的订阅
+
+        Raises:
+            ValueError: 参数不合法
+        """
+        keywords = [k.strip() for k in keywords if isinstance(k, str) and k.strip()]
+        if not keywords:
+            raise ValueError("关键词不能为空")
+        check_webhook_url(url)
+
+        subscription = {
+            'id': uuid.uuid4().hex[:12],
+            'keywords': sorted(set(keywords)),
+            'url': url,
+            'created': datetime.now().isoformat(timespec='seconds')
+        }
+        with self.store.update() as data:
+            data[subscription['id']] = subscription
+        logger.info(f"添加关键词订阅: {subscription['id']}, 关键词: {subscription['keywords']}")
+        return subscription
+
+    def remove(self, subscription_id: str) -> bool:
+        """删除订阅，返回是否存在"""
+        with self.store.update() as data:
+            removed = data.pop(subscription_id, None) is not None
+        if removed:
+            logger.info(f"删除关键词订阅: {subscription_id}")
+        return removed
+
+    def compiled(self) -> Tuple[AhoCorasick, Dict[str, Set[str]]]:
+        """
+        所有订阅关键词编译成的单个自动机，以及关键词到订阅ID的映射
+
+        注册表文件变化后重新编译
+        """
+        data = self.store.load()
+        with self._lock:
+            # load() 在文件未变化时返回同一对象，以对象身份判断是否需要重新编译
+            if self._compiled is None or self._compiled[0] is not data:
+                owners: Dict[str, Set[str]] = {}
+                for subscription in data.values():
+                    for keyword in subscription['keywords']:
+                        owners.setdefault(keyword, set()).add(subscription['id'])
+                self._compiled = (data, AhoCorasick(owners), owners)
+            return self._compiled[1], self._compiled[2]
+
+    def match(self, content: str, fmt: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        对新闻总结匹配所有订阅，每条新闻只扫描一次
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: {订阅ID: [命中的条目]}
+        """
+        matcher, owners = self.compiled()
+        if not len(matcher):
+            return {}
+
+        matches: Dict[str, List[Dict[str, Any]]] = {}
+        for item in iter_items(content, fmt):
+            hits: Dict[str, List[str]] = {}
+            for keyword in matcher.find_all(item['text']):
+                for subscription_id in owners[keyword]:
+                    hits.setdefault(subscription_id, []).append(keyword)
+            for subscription_id, keywords in hits.items():
+                matches.setdefault(subscription_id, []).append(dict(item, matched=keywords))
+        return matches
+
+
+class AlertOutbox:
+    """
+    持久化的待投递提醒
+
+    每条提醒一个 JSON 文件，投递成功后删除，多次失败后移入 failed 目录
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, 'failed')
+
+    def put(self, message: Dict[str, Any]) -> str:
+        """写入一条待投递提醒，返回文件名"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+        write_json_atomic(os.path.join(self.directory, name), message)
+        return name
+
+    def pending(self) -> List[str]:
+        """按写入顺序列出待投递提醒"""
+        try:
+            return sorted(n for n in os.listdir(self.directory) if n.endswith('.json') and not n.startswith('.'))
+        except FileNotFoundError:
+            return []
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取待投递提醒失败: {name}, 错误: {e}")
+            return None
+
+    def save(self, name: str, message: Dict[str, Any]) -> None:
+        write_json_atomic(os.path.join(self.directory, name), message)
+
+    def remove(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def fail(self, name: str) -> None:
+        """放弃投递，保留在 failed 目录便于排查"""
+        os.makedirs(self.failed_directory, exist_ok=True)
+        os.replace(os.path.join(self.directory, name), os.path.join(self.failed_directory, name))
+
+
+def enqueue_matches(content: str, news_path: str, fmt: Optional[str] = None) -> int:
+    """
+    匹配新保存的总结并写入待投递提醒（由 news.py 在保存后调用，只写本地文件）
+
+    Args:
+        content: 新闻总结
+        news_path: 新闻路径 YYYYMMDD/HH-MM-SS
+        fmt: 总结的格式（MARKDOWN / JSON），None 时按内容判断
+
+    Returns:
+        int: 写入的提醒数
+    """
+    matches = subscription_registry.match(content, fmt)
+    subscriptions = subscription_registry.store.load()
+    created = datetime.now().isoformat(timespec='seconds')
+
+    count = 0
+    for subscription_id, items in matches.items():
+        subscription = subscriptions.get(subscription_id)
+        if subscription is None:
+            continue
+        alert_outbox.put({
+            'subscription_id': subscription_id,
+            'url': subscription['url'],
+            'attempts': 0,
+            'next_attempt_at': 0,
+            'payload': {
+                'subscription_id': subscription_id,
+                'keywords': subscription['keywords'],
+                'path': news_path,
+                'items': items,
+                'created': created
+            }
+        })
+        count += 1
+    if count:
+        logger.info(f"新闻 {news_path} 命中 {count} 个订阅，已写入待投递队列")
+    return count
+
+
+class AlertDispatcher:
+    """
+    提醒投递器
+
+    后台线程扫描待投递目录，放入有界队列，由工作线程 POST 到 webhook。
+    失败按指数退避重试，超过次数后放弃。notify() 只唤醒扫描线程，不会阻塞调用方。
+    """
+
+    def __init__(self, outbox: AlertOutbox):
+        self.outbox = outbox
+        self.queue: 'queue.Queue[str]' = queue.Queue(maxsize=config.ALERT_QUEUE_SIZE)
+        self._in_flight: Set[str] = set()
+        self._in_flight_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.delivered = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """启动扫描线程和投递线程"""
+        if self._threads:
+            logger.warning("提醒投递器已经启动")
+            return
+        self._stopping.clear()
+        self._threads.append(threading.Thread(target=self._scan_loop, name='alert-scanner', daemon=True))
+        for i in range(config.ALERT_WORKERS):
+            self._threads.append(threading.Thread(target=self._worker_loop, name=f'alert-worker-{i}', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"提醒投递器已启动，投递线程数: {config.ALERT_WORKERS}")
+
+    def shutdown(self) -> None:
+        """停止投递，未投递的提醒保留在磁盘上"""
+        if not self._threads:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=config.ALERT_TIMEOUT + 1)
+        self._threads = []
+        logger.info("提醒投递器已关闭")
+
+    def notify(self) -> None:
+        """通知有新的待投递提醒（非阻塞）"""
+        self._wakeup.set()
+
+    def get_status(self) -> Dict[str, Any]:
+        """投递器状态"""
+        return {
+            'running': bool(self._threads),
+            'queued': self.queue.qsize(),
+            'pending': len(self.outbox.pending()),
+            'delivered': self.delivered,
+            'failed': self.failed
+        }
+
+    def _scan_loop(self) -> None:
+        while not self._stopping.is_set():
+            # 先清除事件再扫描，扫描期间到达的通知不会丢失
+            self._wakeup.clear()
+            try:
+                self._enqueue_ready()
+            except Exception as e:
+                logger.error(f"扫描待投递提醒失败: {e}")
+            self._wakeup.wait(config.ALERT_POLL_INTERVAL)
+
+    def _enqueue_ready(self) -> None:
+        now = time.time()
+        for name in self.outbox.pending():
+            with self._in_flight_lock:
+                if name in self._in_flight:
+                    continue
+            message = self.outbox.load(name)
+            if message is None or message.get('next_attempt_at', 0) > now:
+                continue
+            try:
+                self.queue.put_nowait(name)
+            except queue.Full:
+                # 队列已满，剩余的在下次扫描时处理
+                break
+            with self._in_flight_lock:
+                self._in_flight.add(name)
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                name = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._deliver(name)
+            except Exception as e:
+                logger.error(f"投递提醒时发生错误: {name}, 错误: {e}")
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight.discard(name)
+                self.queue.task_done()
+
+    def _deliver(self, name: str) -> None:
+        import requests
+
+        message = self.outbox.load(name)
+        if message is None:
+            return
+
+        try:
+            # 投递前重新检查，域名解析结果可能在订阅后改为内网地址
+            check_webhook_url(message['url'])
+        except ValueError as e:
+            logger.error(f"提醒投递被拒绝，已放弃: {name}, 订阅: {message['subscription_id']}, 原因: {e}")
+            message['last_error'] = str(e)
+            self.outbox.save(name, message)
+            self.outbox.fail(name)
+            self.failed += 1
+            return
+
+        try:
+            # 不跟随重定向，避免被重定向到内网地址
+            response = requests.post(message['url'], json=message['payload'], timeout=config.ALERT_TIMEOUT,
+                                     allow_redirects=False)
+            response.raise_for_status()
+            if response.status_code >= 300:
+                raise RuntimeError(f"webhook 返回重定向 {response.status_code}，不跟随")
+        except Exception as e:
+            message['attempts'] += 1
+            message['last_error'] = str(e)
+            if message['attempts'] >= config.ALERT_MAX_ATTEMPTS:
+                logger.error(f"提醒投递失败，已放弃: {name}, 订阅: {message['subscription_id']}, 错误: {e}")
+                self.outbox.save(name, message)
+                self.outbox.fail(name)
+                self.failed += 1
+            else:
+                delay = config.ALERT_RETRY_BASE_SECONDS * 2 ** (message['attempts'] - 1)
+                message['next_attempt_at'] = time.time() + delay
+                self.outbox.save(name, message)
+                logger.warning(f"提醒投递失败，{delay} 秒后重试: {name}, 错误: {e}")
+            return
+
+        self.outbox.remove(name)
+        self.delivered += 1
+        logger.info(f"提醒投递成功: 订阅 {message['subscription_id']}, 新闻 {message['payload']['path']}")
+
+
+# 全局实例
+subscription_registry = SubscriptionRegistry(config.ALERT_SUBSCRIPTIONS_PATH)
+alert_outbox = AlertOutbox(config.ALERT_OUTBOX_DIR)
+alert_dispatcher = AlertDispatcher(alert_outbox)
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+重新总结工具
+修改提示词或模型后，用保存的网页快照（或运行目录中的网页、重新抓取的网页）重新生成指定日期范围内的新闻总结。
+正文提取在进程池中并行执行，LLM请求限制并发数和每分钟请求数；结果按版本保存在
+news/YYYYMMDD/versions/<版本>/HH-MM-SS.md，原有新闻不变。进度记录在 data/backfill/<版本>/state.json，
+中断后再次运行跳过已完成的条目
+
+用法:
+    python3 news_backfill.py --from 20261001 --to 20261019
+    python3 news_backfill.py --from 20261018 --version prompt-v2 --llm-concurrency 8 --per-minute 60
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import config
+from json_store import JsonStore, write_text_atomic
+from logger_config import get_logger
+from news_storage import DATE_DIR_PATTERN, PATH_FORMAT, TIME_FILE_PATTERN, VERSIONS_DIR, time_file_stem
+
+logger = get_logger('news_backfill')
+
+VERSION_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,40}', re.ASCII)
+
+# 多个重新总结进程共享的LLM请求令牌桶
+RATE_KEY = 'llm|backfill'
+
+# 每个版本保留的运行记录数
+KEEP_RUNS = 20
+
+# 条目进度累积到该条数或秒数后一次写入 state.json（中断时最多重做这些条目）
+STATE_FLUSH_ITEMS = 50
+STATE_FLUSH_SECONDS = 10.0
+
+
+class BudgetExhausted(Exception):
+    """今日token预算已用完"""
+
+
+def version_path(news_path: str, version: str, news_dir: Optional[str] = None) -> str:
+    """新闻路径在指定版本下的文件路径"""
+    date, time_part = news_path.split('/')
+    return os.path.join(news_dir or config.NEWS_DIR, date, VERSIONS_DIR, version, time_part + '.md')
+
+
+def read_version(news_path: str, version: str) -> Optional[str]:
+    """读取重新总结的结果，不存在时返回None"""
+    try:
+        with open(version_path(news_path, version), 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def default_version() -> str:
+    """默认版本号：提示词模板和模型的哈希，修改提示词或模型后自动使用新的版本"""
+    import news
+    from llm_client import build_providers
+
+    providers = build_providers(news.LLM_PROVIDERS, news.OPENAI_API_KEY, news.OPENAI_BASE_URL, news.DEFAULT_MODEL)
+    key = news.build_prompt('') + '\n' + ','.join(str(provider.model) for provider in providers)
+    return 'p' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:10]
+
+
+def _extract(source: Tuple[str, str]) -> Tuple[str, int, float]:
+    """
+    读取输入并提取正文（在子进程中执行）
+
+    Args:
+        source: ('snapshot', 快照ID) / ('file', 网页文件路径) / ('html', 网页内容)
+
+    Returns:
+        Tuple[str, int, float]: (正文, 网页字符数, 耗时秒数)
+    """
+    from token_budget import extract_text
+
+    start = time.perf_counter()
+    kind, value = source
+    if kind == 'snapshot':
+        from snapshot_store import snapshot_store
+        html_content = snapshot_store.get(value)
+        if html_content is None:
+            raise FileNotFoundError(f"快照不存在: {value}")
+    elif kind == 'file':
+        with open(value, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+    else:
+        html_content = value
+    content = extract_text(html_content) if config.PROMPT_STRIP_HTML else html_content
+    return content, len(html_content), time.perf_counter() - start
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 3)
+
+
+class Backfill:
+    """一个版本的重新总结：选取条目、并行提取和总结、记录进度"""
+
+    def __init__(self, version: str, workers: Optional[int] = None, llm_concurrency: Optional[int] = None,
+                 per_minute: Optional[float] = None, force: bool = False, refetch: bool = False,
+                 rate_store: Any = None):
+        if VERSION_PATTERN.fullmatch(version) is None:
+            raise ValueError(f"版本号只能包含字母、数字、'.'、'_'、'-': {version}")
+        self.version = version
+        self.workers = workers or config.BACKFILL_WORKERS or os.cpu_count() or 1
+        self.llm_concurrency = llm_concurrency or config.BACKFILL_LLM_CONCURRENCY
+        self.per_minute = config.BACKFILL_LLM_PER_MINUTE if per_minute is None else per_minute
+        self.force = force
+        self.refetch = refetch
+        self.state = JsonStore(os.path.join(config.BACKFILL_DIR, version, 'state.json'))
+        if rate_store is None and self.per_minute > 0:
+            from rate_limiter import SQLiteRateStore
+            os.makedirs(os.path.dirname(config.RATE_LIMIT_DB_PATH), exist_ok=True)
+            rate_store = SQLiteRateStore(config.RATE_LIMIT_DB_PATH)
+        self.rate_store = rate_store
+        self._stopping = threading.Event()
+        self._stop_reason: Optional[str] = None
+        self._refetched: Optional[str] = None
+        self._pending_records: Dict[str, Dict[str, Any]] = {}
+        self._flushed_at = time.monotonic()
+
+    # 选取条目
+
+    def _run_pages(self) -> Dict[str, str]:
+        """运行目录中保存的网页（未启用快照时）：新闻路径 -> page.html"""
+        from news_pipeline import iter_runs
+
+        pages = {}
+        for run in iter_runs():
+            news_path = run.state.get('news_path')
+            page = os.path.join(run.directory, 'page.html')
+            if news_path and os.path.exists(page):
+                pages[news_path] = page
+        return pages
+
+    @staticmethod
+    def _refetchable(news_path: str) -> bool:
+        """
+        是否可以用重新抓取的网页代替：来源只显示最近的电报，
+        只有 PIPELINE_RESUME_MAX_AGE 秒内的条目与当前网页的内容一致
+        """
+        age = (datetime.now() - datetime.strptime(news_path, PATH_FORMAT)).total_seconds()
+        return 0 <= age <= config.PIPELINE_RESUME_MAX_AGE
+
+    def _refetch_page(self) -> Optional[str]:
+        """重新抓取来源网页（只抓取一次，供所有缺少输入的最近条目使用）"""
+        if self._refetched is None:
+            import news
+            self._refetched = news.get_webpage_content(news.NEWS_SOURCE_URL) or ''
+        return self._refetched or None
+
+    def plan(self, start_date: str, end_date: str) -> Tuple[List[Tuple[str, Tuple[str, str]]], Dict[str, int]]:
+        """
+        选取日期范围内需要重新总结的条目
+
+        Returns:
+            Tuple[list, dict]: ([(新闻路径, 输入)], {'total', 'skipped', 'missing'})
+        """
+        from news_storage import news_storage
+        from snapshot_store import snapshot_store
+
+        paths = sorted(path for path in news_storage.list_paths() if start_date <= path[:8] <= end_date)
+        finished = self.state.load().get('items', {})
+        run_pages = self._run_pages()
+
+        items = []
+        skipped = missing = 0
+        for news_path in paths:
+            record = finished.get(news_path)
+            if (not self.force and record and record['status'] == 'done'
+                    and os.path.exists(version_path(news_path, self.version))):
+                skipped += 1
+                continue
+            snapshot_id = snapshot_store.snapshot_for(news_path)
+            if snapshot_id and snapshot_store.exists(snapshot_id):
+                items.append((news_path, ('snapshot', snapshot_id)))
+            elif news_path in run_pages:
+                items.append((news_path, ('file', run_pages[news_path])))
+            elif self.refetch and self._refetchable(news_path) and self._refetch_page():
+                items.append((news_path, ('html', self._refetched)))
+            else:
+                missing += 1
+        return items, {'total': len(paths), 'skipped': skipped, 'missing': missing}
+
+    # 执行
+
+    def stop(self, reason: str) -> None:
+        """不再提交新的条目，已开始的条目执行完成"""
+        if not self._stopping.is_set():
+            self._stop_reason = reason
+            self._stopping.set()
+
+    def _summarize(self, news_path: str, content: str, html_chars: int) -> Dict[str, Any]:
+        """限速后调用LLM总结并保存结果（在线程池中执行）"""
+        from news import summarize_content
+        from token_budget import token_ledger
+
+        if self.rate_store is not None:
+            self.rate_store.wait(RATE_KEY, self.per_minute / 60.0, config.BACKFILL_LLM_BURST)
+        if self._stopping.is_set():
+            raise BudgetExhausted(self._stop_reason)
+        if token_ledger.prompt_budget() == 0:
+            raise BudgetExhausted("今日token预算已用完")
+
+        messages: List[str] = []
+
+        def log(message: str) -> None:
+            messages.append(message)
+            logger.debug(f"{news_path}: {message}")
+
+        stats: Dict[str, Any] = {}
+        summary = summarize_content(content, html_chars, log=log, stats=stats)
+        if not summary:
+            raise RuntimeError(messages[-1] if messages else "LLM总结失败")
+
+        if config.LOCAL_HIGHLIGHT:
+            from keyword_matcher import highlighter
+            summary, _ = highlighter.apply(summary, config.LLM_OUTPUT_FORMAT)
+        path = version_path(news_path, self.version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_text_atomic(path, summary)
+        return stats
+
+    def _record(self, news_path: str, record: Dict[str, Any]) -> None:
+        """记录条目进度，累积后批量写入，避免每个条目重写整个 state.json"""
+        record['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        self._pending_records[news_path] = record
+        if (len(self._pending_records) >= STATE_FLUSH_ITEMS
+                or time.monotonic() - self._flushed_at >= STATE_FLUSH_SECONDS):
+            self._flush()
+
+    def _flush(self) -> None:
+        """写入累积的条目进度"""
+        self._flushed_at = time.monotonic()
+        if not self._pending_records:
+            return
+        with self.state.update() as state:
+            state.setdefault('items', {}).update(self._pending_records)
+        self._pending_records.clear()
+
+    def run(self, start_date: str, end_date: str) -> Dict[str, Any]:
+        """
+        重新总结日期范围（YYYYMMDD，含两端）内的新闻
+
+        Returns:
+            Dict[str, Any]: 执行结果和吞吐统计
+        """
+        items, counts = self.plan(start_date, end_date)
+        with self.state.update() as state:
+            state.setdefault('version', self.version)
+            state.setdefault('created_at', datetime.now().isoformat(timespec='seconds'))
+            state.setdefault('items', {})
+        logger.info(f"重新总结 {start_date}-{end_date}（版本 {self.version}）: 待处理 {len(items)} 条，"
+                    f"已完成跳过 {counts['skipped']} 条，缺少输入 {counts['missing']} 条")
+
+        queue = deque(items)
+        extracting: Dict[Any, str] = {}
+        summarizing: Dict[Any, Tuple[str, float]] = {}
+        extract_seconds: List[float] = []
+        llm_seconds: List[float] = []
+        tokens = {'prompt_tokens': 0, 'completion_tokens': 0}
+        done = failed = 0
+        interrupted = False
+        started = time.monotonic()
+
+        def report(news_path: str, status: str) -> None:
+            finished = done + failed
+            elapsed = time.monotonic() - started
+            rate = finished / elapsed if elapsed > 0 else 0.0
+            remaining = (len(items) - finished) / rate if rate > 0 else 0.0
+            print(f"[{finished}/{len(items)}] {news_path} {status} | {rate * 60:.1f} 条/分钟 | "
+                  f"预计剩余 {remaining:.0f} 秒", file=sys.stderr)
+
+        extract_pool = ProcessPoolExecutor(max_workers=self.workers)
+        llm_pool = ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix='backfill-llm')
+        try:
+            while queue or extracting or summarizing:
+                # 提取和等待LLM的条目都有上限，正文不会在内存中无限堆积
+                while (queue and not self._stopping.is_set() and len(extracting) < self.workers * 2
+                       and len(extracting) + len(summarizing) < self.workers * 2 + self.llm_concurrency * 2):
+                    news_path, source = queue.popleft()
+                    extracting[extract_pool.submit(_extract, source)] = news_path
+                if self._stopping.is_set():
+                    queue.clear()
+                if not extracting and not summarizing:
+                    break
+
+                finished, _ = wait(list(extracting) + list(summarizing), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future in extracting:
+                        news_path = extracting.pop(future)
+                        try:
+                            content, html_chars, seconds = future.result()
+                        except Exception as e:
+                            failed += 1
+                            self._record(news_path, {'status': 'failed', 'error': f"提取正文失败: {e}"})
+                            report(news_path, f"失败: 提取正文失败: {e}")
+                            continue
+                        extract_seconds.append(seconds)
+                        task = llm_pool.submit(self._summarize, news_path, content, html_chars)
+                        summarizing[task] = (news_path, time.monotonic())
+                        continue
+
+                    news_path, submitted = summarizing.pop(future)
+                    try:
+                        stats = future.result()
+                    except BudgetExhausted as e:
+                        self.stop(str(e))
+                        self._record(news_path, {'status': 'pending', 'error': str(e)})
+                        continue
+                    except Exception as e:
+                        failed += 1
+                        self._record(news_path, {'status': 'failed', 'error': str(e)})
+                        report(news_path, f"失败: {e}")
+                        continue
+                    done += 1
+                    llm_seconds.append(stats.get('latency_seconds', time.monotonic() - submitted))
+                    for key in tokens:
+                        tokens[key] += stats.get(key, 0)
+                    self._record(news_path, {
+                        'status': 'done',
+                        'model': stats.get('model'),
+                        'prompt_tokens': stats.get('prompt_tokens', 0),
+                        'completion_tokens': stats.get('completion_tokens', 0),
+                        'latency_seconds': stats.get('latency_seconds')
+                    })
+                    report(news_path, f"完成（{stats.get('latency_seconds', 0):.1f} 秒）")
+        except KeyboardInterrupt:
+            interrupted = True
+            self.stop('已中断')
+            print("已中断，再次运行相同命令从未完成的条目继续", file=sys.stderr)
+        finally:
+            extract_pool.shutdown(wait=not interrupted, cancel_futures=True)
+            llm_pool.shutdown(wait=not interrupted, cancel_futures=True)
+            self._flush()
+
+        elapsed = time.monotonic() - started
+        remaining = len(items) - done - failed
+        result = {
+            'success': not failed and not remaining,
+            'version': self.version,
+            'from': start_date,
+            'to': end_date,
+            'total': counts['total'],
+            'processed': done,
+            'failed': failed,
+            'remaining': remaining,
+            'skipped': counts['skipped'],
+            'missing': counts['missing'],
+            'stopped': self._stop_reason,
+            'seconds': round(elapsed, 3),
+            'items_per_minute': round(done / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            'extract_seconds_p50': _percentile(extract_seconds, 0.5),
+            'extract_seconds_p95': _percentile(extract_seconds, 0.95),
+            'llm_seconds_p50': _percentile(llm_seconds, 0.5),
+            'llm_seconds_p95': _percentile(llm_seconds, 0.95),
+            **tokens,
+            'tokens_per_second': round(sum(tokens.values()) / elapsed, 1) if elapsed > 0 else 0.0,
+            'workers': self.workers,
+            'llm_concurrency': self.llm_concurrency,
+            'per_minute': self.per_minute,
+        }
+        with self.state.update() as state:
+            state['runs'] = (state.get('runs', []) + [{
+                'started_at': datetime.now().isoformat(timespec='seconds'), **result}])[-KEEP_RUNS:]
+        logger.info(f"重新总结结束: {result}")
+        return result
+
+
+def prune_versions(cutoff_time: datetime, news_dir: Optional[str] = None) -> int:
+    """
+    删除截止时间之前的重新总结结果（与 clean_old_news 一同执行），并删除清空后的目录
+
+    Returns:
+        int: 删除的文件数
+    """
+    news_dir = news_dir or config.NEWS_DIR
+    cutoff_date = cutoff_time.strftime('%Y%m%d')
+    removed = 0
+    try:
+        date_dirs = [d for d in os.listdir(news_dir) if DATE_DIR_PATTERN.match(d) and d <= cutoff_date]
+    except FileNotFoundError:
+        return 0
+
+    for date_dir in date_dirs:
+        versions_dir = os.path.join(news_dir, date_dir, VERSIONS_DIR)
+        if not os.path.isdir(versions_dir):
+            continue
+        for version in os.listdir(versions_dir):
+            version_dir = os.path.join(versions_dir, version)
+            for filename in os.listdir(version_dir):
+                if not TIME_FILE_PATTERN.match(filename):
+                    continue
+                try:
+                    file_time = datetime.strptime(f"{date_dir}/{time_file_stem(filename)}", PATH_FORMAT)
+                except ValueError:
+                    continue
+                if file_time < cutoff_time:
+                    os.remove(os.path.join(version_dir, filename))
+                    removed += 1
+            for path in (version_dir, versions_dir, os.path.join(news_dir, date_dir)):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    break
+
+    # 进度记录中的过期条目
+    try:
+        versions = os.listdir(config.BACKFILL_DIR)
+    except FileNotFoundError:
+        versions = []
+    for version in versions:
+        store = JsonStore(os.path.join(config.BACKFILL_DIR, version, 'state.json'))
+        with store.update() as state:
+            items = state.get('items', {})
+            cutoff_path = cutoff_time.strftime(PATH_FORMAT)
+            for news_path in [path for path in items if path < cutoff_path]:
+                del items[news_path]
+    return removed
+
+
+def _parse_date(value: str) -> str:
+    datetime.strptime(value, '%Y%m%d')
+    return value
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='用保存的网页重新总结指定日期范围内的新闻')
+    parser.add_argument('--from', dest='start', type=_parse_date, required=True, help='开始日期 YYYYMMDD')
+    parser.add_argument('--to', dest='end', type=_parse_date, help='结束日期 YYYYMMDD（含），默认今天')
+    parser.add_argument('--version', help='结果版本号，默认按提示词和模型生成')
+    parser.add_argument('--workers', type=int, help='提取正文的进程数，默认 CPU 核数')
+    parser.add_argument('--llm-concurrency', type=int,
+                        help=f'同时进行的LLM请求数，默认 {config.BACKFILL_LLM_CONCURRENCY}')
+    parser.add_argument('--per-minute', type=float,
+                        help=f'每分钟最多发起的LLM请求数，默认 {config.BACKFILL_LLM_PER_MINUTE}，0表示不限制')
+    parser.add_argument('--force', action='store_true', help='重新处理已完成的条目')
+    parser.add_argument('--refetch', action='store_true',
+                        help='没有保存网页的最近条目（PIPELINE_RESUME_MAX_AGE 秒内）重新抓取来源网页')
+    args = parser.parse_args(argv)
+
+    config.ensure_dirs()
+    end = args.end or datetime.now().strftime('%Y%m%d')
+    version = args.version or default_version()
+    try:
+        backfill = Backfill(version, args.workers, args.llm_concurrency, args.per_minute, args.force, args.refetch)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    result = backfill.run(args.start, end)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"结果保存在: {os.path.join(config.NEWS_DIR, 'YYYYMMDD', VERSIONS_DIR, version)}/", file=sys.stderr)
+    sys.exit(0 if result['success'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,121 +7,134 @@
 """
 
 import os
-import re
 from datetime import datetime, timedelta
+from typing import Optional
+
+from config import config
 from logger_config import get_logger
+from news_storage import FileStorage, news_storage
 
 logger = get_logger('news_cleaner')
 
 
-def clean_old_news(hours_threshold=24):
+def _prune_indexes(cutoff_time: datetime) -> None:
+    """清理与新闻文件一同过期的索引数据，失败只记录日志"""
+    try:
+        from news_dedup import dedup_index
+        dedup_index.prune(cutoff_time)
+    except Exception as e:
+        logger.error(f"清理去重索引失败: {e}")
+
+    try:
+        from news_digest import daily_digest
+        daily_digest.prune(cutoff_time)
+        # 补充合并保存时汇总更新失败的新闻，读接口不再写入
+        daily_digest.catch_up()
+    except Exception as e:
+        logger.error(f"清理每日汇总失败: {e}")
+
+    try:
+        from news_stats import news_stats
+        news_stats.prune(cutoff_time)
+        # 补充计入保存时统计更新失败的新闻
+        news_stats.catch_up()
+    except Exception as e:
+        logger.error(f"清理新闻统计失败: {e}")
+
+    try:
+        from entity_index import entity_index
+        entity_index.prune(cutoff_time)
+        # 补充索引保存时索引更新失败的新闻
+        entity_index.catch_up()
+    except Exception as e:
+        logger.error(f"清理实体索引失败: {e}")
+
+    try:
+        from snapshot_store import snapshot_store
+        snapshot_store.prune(cutoff_time)
+    except Exception as e:
+        logger.error(f"清理网页快照失败: {e}")
+
+    try:
+        from news_backfill import prune_versions
+        removed = prune_versions(cutoff_time)
+        logger.info(f"清理重新总结结果 {removed} 个")
+    except Exception as e:
+        logger.error(f"清理重新总结结果失败: {e}")
+
+    try:
+        from news_pipeline import prune_runs
+        removed = prune_runs(datetime.now() - timedelta(hours=config.PIPELINE_KEEP_HOURS))
+        logger.info(f"清理抓取流程检查点 {removed} 个")
+    except Exception as e:
+        logger.error(f"清理抓取流程检查点失败: {e}")
+
+    # 接口限流（RATE_LIMIT_STORE = 'sqlite'）和重新总结的出站限速共用这个数据库
+    if os.path.exists(config.RATE_LIMIT_DB_PATH):
+        try:
+            from rate_limiter import SQLiteRateStore
+            removed = SQLiteRateStore(config.RATE_LIMIT_DB_PATH).prune()
+            logger.info(f"清理闲置的限流令牌桶 {removed} 个")
+        except Exception as e:
+            logger.error(f"清理限流令牌桶失败: {e}")
+
+    if config.FETCH_MODE == 'queue':
+        try:
+            from job_queue import get_job_queue
+            removed = get_job_queue().prune(config.JOB_KEEP_HOURS * 3600)
+            logger.info(f"清理已结束的队列任务 {removed} 个")
+        except Exception as e:
+            logger.error(f"清理队列任务失败: {e}")
+
+
+def clean_old_news(hours_threshold=24, news_dir: Optional[str] = None, prune_indexes: bool = True):
     """
-    清理超过指定小时数的新闻文件
+    清理超过指定小时数的新闻
 
     Args:
-        hours_threshold (int): 超过多少小时的文件将被删除，默认24小时
+        hours_threshold (int): 超过多少小时的新闻将被删除，默认24小时
+        news_dir (Optional[str]): 只清理该目录下的新闻文件，默认使用配置的存储后端
+        prune_indexes (bool): 是否同时清理去重等索引数据
 
     Returns:
         dict: 清理结果统计
     """
     logger.info(f"开始清理超过 {hours_threshold} 小时的新闻文件")
 
-    news_dir = "news"
-    if not os.path.exists(news_dir):
-        logger.warning(f"新闻目录不存在: {news_dir}")
-        return {
-            'success': False,
-            'error': '新闻目录不存在',
-            'deleted_files': 0,
-            'deleted_dirs': 0
-        }
+    storage = FileStorage(news_dir) if news_dir else news_storage
 
     # 计算截止时间
     cutoff_time = datetime.now() - timedelta(hours=hours_threshold)
     logger.info(f"删除截止时间: {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
-    deleted_files = 0
-    deleted_dirs = 0
-
     try:
-        # 遍历日期目录
-        for date_dir in os.listdir(news_dir):
-            date_path = os.path.join(news_dir, date_dir)
-
-            # 检查是否是目录且符合日期格式 YYYYMMDD
-            if not os.path.isdir(date_path) or not re.match(r'^\d{8}$', date_dir):
-                continue
-
-            logger.debug(f"检查日期目录: {date_dir}")
-
-            # 遍历该日期目录下的文件
-            files_in_dir = []
-            try:
-                files_in_dir = os.listdir(date_path)
-            except OSError as e:
-                logger.error(f"无法读取目录 {date_path}: {e}")
-                continue
-
-            for filename in files_in_dir:
-                if not filename.endswith('.md'):
-                    continue
-
-                file_path = os.path.join(date_path, filename)
-
-                # 解析文件时间 HH-MM-SS.md
-                time_match = re.match(r'^(\d{2})-(\d{2})-(\d{2})\.md$', filename)
-                if not time_match:
-                    logger.warning(f"文件名格式不正确，跳过: {filename}")
-                    continue
-
-                hour, minute, second = time_match.groups()
-
-                try:
-                    # 构造完整的文件时间
-                    file_datetime = datetime.strptime(
-                        f"{date_dir} {hour}:{minute}:{second}",
-                        "%Y%m%d %H:%M:%S"
-                    )
-
-                    # 检查是否超过阈值时间
-                    if file_datetime < cutoff_time:
-                        logger.info(f"删除过期文件: {file_path}")
-                        os.remove(file_path)
-                        deleted_files += 1
-                    else:
-                        logger.debug(f"文件未过期，保留: {file_path}")
-
-                except ValueError as e:
-                    logger.error(f"解析文件时间失败 {filename}: {e}")
-                    continue
-
-            # 检查目录是否为空，如果为空则删除
-            try:
-                remaining_files = [f for f in os.listdir(date_path) if f.endswith('.md')]
-                if not remaining_files:
-                    logger.info(f"删除空目录: {date_path}")
-                    os.rmdir(date_path)
-                    deleted_dirs += 1
-                else:
-                    logger.debug(f"目录非空，保留: {date_path} (剩余 {len(remaining_files)} 个文件)")
-            except OSError as e:
-                logger.error(f"删除目录失败 {date_path}: {e}")
-
+        result = storage.delete_before(cutoff_time)
+    except FileNotFoundError as e:
+        logger.warning(str(e))
+        return {
+            'success': False,
+            'error': '新闻目录不存在',
+            'deleted_files': 0,
+            'deleted_dirs': 0
+        }
     except Exception as e:
         logger.error(f"清理过程中发生错误: {e}")
         return {
             'success': False,
             'error': str(e),
-            'deleted_files': deleted_files,
-            'deleted_dirs': deleted_dirs
+            'deleted_files': 0,
+            'deleted_dirs': 0
         }
 
-    logger.info(f"清理完成: 删除了 {deleted_files} 个文件, {deleted_dirs} 个目录")
+    if prune_indexes:
+        _prune_indexes(cutoff_time)
+
+    logger.info(f"清理完成: 删除了 {result['deleted_files']} 个文件, {result['deleted_dirs']} 个目录")
 
     return {
         'success': True,
-        'deleted_files': deleted_files,
-        'deleted_dirs': deleted_dirs,
+        'deleted_files': result['deleted_files'],
+        'deleted_dirs': result['deleted_dirs'],
         'cutoff_time': cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
     }
 
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+新闻去重模块
+使用 SimHash 指纹和分段查找表识别跨批次的近似重复新闻
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Set, Tuple
+
+from config import config
+from logger_config import get_logger
+from news_parser import iter_items, filter_items
+
+logger = get_logger('news_dedup')
+
+FINGERPRINT_BITS = 64
+# 分段数需大于最大汉明距离：距离不超过 BANDS-1 的两个指纹至少有一段完全相同
+BANDS = 8
+BAND_BITS = FINGERPRINT_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# 归一化时去掉的字符：空白和常见中英文标点
+NORMALIZE_PATTERN = re.compile(r'[\s\W_]+', re.UNICODE)
+
+DEDUP_MODES = ('off', 'mark', 'drop')
+
+
+def normalize(text: str) -> str:
+    """归一化文本：去掉空白和标点，英文转小写"""
+    return NORMALIZE_PATTERN.sub('', text).lower()
+
+
+def _features(text: str) -> List[str]:
+    """
+    以单个字符为特征
+
+    新闻条目通常不超过20字，LLM改写时多为增删虚词、调换语序，
+    字符特征比二元组对这类改写更稳定
+    """
+    return list(text)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text: str) -> int:
+    """
+    计算文本的 64 位 SimHash 指纹
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        int: 指纹
+    """
+    weights = [0] * FINGERPRINT_BITS
+    for feature in _features(normalize(text)):
+        h = _feature_hash(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+def _bands(fingerprint: int) -> List[int]:
+    return [(fingerprint >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+
+def band_columns() -> str:
+    """指纹表中各段的列定义"""
+    return ', '.join(f'b{i} INTEGER NOT NULL' for i in range(BANDS))
+
+
+def band_indexes(table: str, prefix: str = '') -> List[str]:
+    """为每一段建立索引，查询时只比较至少一段相同的候选"""
+    return [f'CREATE INDEX IF NOT EXISTS {table}_b{i} ON {table} ({prefix}b{i})' for i in range(BANDS)]
+
+
+def band_condition(fingerprint: int) -> Tuple[str, List[int]]:
+    """至少一段相同的查询条件及参数"""
+    return '(' + ' OR '.join(f'b{i} = ?' for i in range(BANDS)) + ')', _bands(fingerprint)
+
+
+class DedupIndex:
+    """
+    持久化的去重索引，保存在 data/dedup_index.db（SQLite，WAL模式）
+
+    表结构:
+        entries: 窗口内所有条目的指纹 (fp, path, time, b0..b7)，每一段一个索引
+        runs: 每个新闻文件的条目数和重复条目序号 (path, items, duplicates)
+
+    查重只比较至少一段相同的候选指纹，保存一次新闻只插入本次的条目，耗时与窗口内的条目总数无关
+    """
+
+    SCHEMA = [
+        f'CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, fp TEXT NOT NULL, path TEXT NOT NULL, '
+        f'time TEXT NOT NULL, {band_columns()})',
+        'CREATE INDEX IF NOT EXISTS entries_time ON entries (time)',
+        'CREATE INDEX IF NOT EXISTS entries_path ON entries (path)',
+        'CREATE TABLE IF NOT EXISTS runs (path TEXT PRIMARY KEY, items INTEGER NOT NULL, duplicates TEXT NOT NULL)',
+    ] + band_indexes('entries')
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def process_summary(self, content: str, run_time: datetime, mode: Optional[str] = None,
+                        path: Optional[str] = None, fmt: Optional[str] = None) -> Tuple[str, int]:
+        """
+        检查新总结中与最近窗口内重复的条目，并登记到索引
+
+        Args:
+            content: 新闻总结
+            run_time: 本次运行时间，决定新闻文件路径
+            mode: 'mark' 只登记重复条目，'drop' 直接从总结中移除，'off' 不处理
+            path: 登记使用的键，默认为 run_time 对应的新闻路径；保存路径确定后用 rename 改为实际路径
+            fmt: 总结的格式（MARKDOWN / JSON），None 时按内容判断
+
+        Returns:
+            Tuple[str, int]: (处理后的总结, 重复条目数)
+        """
+        mode = mode or config.DEDUP_MODE
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"不支持的去重模式: {mode}")
+        if mode == 'off':
+            return content, 0
+
+        path = path or run_time.strftime('%Y%m%d/%H-%M-%S')
+        time_str = run_time.isoformat(timespec='seconds')
+        since = (run_time - timedelta(hours=config.DEDUP_WINDOW_HOURS)).isoformat(timespec='seconds')
+
+        with self._transaction() as conn:
+            duplicates: List[int] = []
+            total = 0
+            for ordinal, item in enumerate(iter_items(content, fmt)):
+                total += 1
+                fingerprint = simhash(item['text'])
+                if self._find(conn, fingerprint, since):
+                    duplicates.append(ordinal)
+                # 重复条目也登记，使措辞逐渐变化的新闻仍能被识别
+                conn.execute(f'INSERT INTO entries (fp, path, time, {", ".join(f"b{i}" for i in range(BANDS))}) '
+                             f'VALUES (?, ?, ?, {", ".join("?" * BANDS)})',
+                             [f"{fingerprint:016x}", path, time_str] + _bands(fingerprint))
+
+            if mode == 'drop':
+                content = filter_items(content, set(duplicates), fmt)
+                run = (total - len(duplicates), [])
+            else:
+                run = (total, duplicates)
+            conn.execute('INSERT OR REPLACE INTO runs (path, items, duplicates) VALUES (?, ?, ?)',
+                         (path, run[0], json.dumps(run[1])))
+
+        logger.info(f"去重检查完成: {path}, 共 {total} 条, 重复 {len(duplicates)} 条, 模式: {mode}")
+        return content, len(duplicates)
+
+    @staticmethod
+    def _find(conn: sqlite3.Connection, fingerprint: int, since: str) -> bool:
+        """窗口内是否有近似重复的指纹（只比较至少一段相同的候选）"""
+        condition, params = band_condition(fingerprint)
+        rows = conn.execute(f'SELECT fp FROM entries WHERE {condition} AND time >= ?', params + [since])
+        return any(hamming_distance(int(fp, 16), fingerprint) <= config.DEDUP_MAX_DISTANCE for fp, in rows)
+
+    def _run(self, path: str) -> Optional[Tuple[int, List[int]]]:
+        row = self._connect().execute('SELECT items, duplicates FROM runs WHERE path = ?', (path,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def get_duplicates(self, path: str) -> Set[int]:
+        """获取新闻文件中被标记为重复的条目序号"""
+        run = self._run(path)
+        return set(run[1]) if run else set()
+
+    def is_fully_duplicate(self, path: str) -> bool:
+        """新闻文件是否全部由重复条目组成"""
+        run = self._run(path)
+        return bool(run) and run[0] > 0 and len(run[1]) >= run[0]
+
+    def rename(self, old_path: str, new_path: str) -> None:
+        """将登记时使用的键改为实际保存的新闻路径（已改过时不做修改）"""
+        with self._transaction() as conn:
+            conn.execute('UPDATE entries SET path = ? WHERE path = ?', (new_path, old_path))
+            conn.execute('UPDATE runs SET path = ? WHERE path = ?', (new_path, old_path))
+
+    def prune(self, cutoff_time: datetime) -> int:
+        """
+        移除截止时间之前的指纹和文件记录（与 clean_old_news 一同执行）
+
+        Returns:
+            int: 移除的指纹数
+        """
+        cutoff = cutoff_time.isoformat(timespec='seconds')
+        cutoff_path = cutoff_time.strftime('%Y%m%d/%H-%M-%S')
+        with self._transaction() as conn:
+            removed = conn.execute('DELETE FROM entries WHERE time < ?', (cutoff,)).rowcount
+            conn.execute('DELETE FROM runs WHERE path < ?', (cutoff_path,))
+        logger.info(f"去重索引清理完成，移除 {removed} 个指纹")
+        return removed
+
+
+def filter_duplicates(content: str, path: str, fmt: Optional[str] = None) -> str:
+    """去除新闻文件中已标记为重复的条目（dedupe=true 视图）"""
+    duplicates = dedup_index.get_duplicates(path)
+    return filter_items(content, duplicates, fmt) if duplicates else content
+
+
+# 全局去重索引实例
+dedup_index = DedupIndex(config.DEDUP_INDEX_PATH)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+每日汇总模块
+将一天内各次运行的新闻总结本地合并为去重、按分类分组的汇总，不再调用LLM
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import config
+from logger_config import get_logger
+from news_dedup import BANDS, band_columns, band_condition, band_indexes, hamming_distance, simhash
+from news_parser import iter_items
+from news_storage import NewsStorage, news_storage
+
+logger = get_logger('news_digest')
+
+DATE_PATTERN = re.compile(r'^\d{8}$')
+
+
+class DailyDigest:
+    """
+    按天的增量汇总，保存在 data/digests.db（SQLite，WAL模式）
+
+    表结构:
+        items: 按首次出现顺序的条目 (date, position, category, text, highlighted, fp, path, time, last_seen, count, b0..b7)，
+               每一段按 (date, 段) 建索引
+        sources: 已合并的新闻路径 (date, path)
+        versions: 每天的 generation，每次合并后加1，用于响应缓存
+
+    合并新的总结时只计算新条目的指纹，并只比较当天至少一段相同的候选；只插入或更新受影响的条目，
+    耗时与当天已有的条目数无关
+    """
+
+    SCHEMA = [
+        f'CREATE TABLE IF NOT EXISTS items (date TEXT NOT NULL, position INTEGER NOT NULL, category TEXT NOT NULL, '
+        f'text TEXT NOT NULL, highlighted INTEGER NOT NULL, fp TEXT NOT NULL, path TEXT NOT NULL, time TEXT NOT NULL, '
+        f'last_seen TEXT NOT NULL, count INTEGER NOT NULL, {band_columns()}, PRIMARY KEY (date, position))',
+        'CREATE TABLE IF NOT EXISTS sources (date TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (date, path))',
+        'CREATE TABLE IF NOT EXISTS versions (date TEXT PRIMARY KEY, generation INTEGER NOT NULL)',
+    ] + band_indexes('items', prefix='date, ')
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def add_summary(self, content: str, news_path: str, run_time: Optional[datetime] = None,
+                    fmt: Optional[str] = None) -> Tuple[int, int]:
+        """
+        将一次运行的总结合并到当天汇总（同一路径重复合并时忽略）
+
+        Args:
+            content: 新闻总结
+            news_path: 新闻路径 YYYYMMDD/HH-MM-SS
+            run_time: 运行时间，默认从路径解析
+            fmt: 总结的格式（MARKDOWN / JSON），None 时按内容判断
+
+        Returns:
+            Tuple[int, int]: (新增条目数, 合并的重复条目数)
+        """
+        date = news_path.split('/', 1)[0]
+        run_time = run_time or datetime.strptime(news_path, '%Y%m%d/%H-%M-%S')
+        time_str = run_time.isoformat(timespec='seconds')
+
+        with self._transaction() as conn:
+            if conn.execute('SELECT 1 FROM sources WHERE date = ? AND path = ?', (date, news_path)).fetchone():
+                return 0, 0
+            added, merged = self._merge(conn, date, content, news_path, time_str, fmt)
+            conn.execute('INSERT INTO sources (date, path) VALUES (?, ?)', (date, news_path))
+            conn.execute('INSERT INTO versions (date, generation) VALUES (?, 1) '
+                         'ON CONFLICT(date) DO UPDATE SET generation = generation + 1', (date,))
+
+        logger.info(f"每日汇总已更新: {date}, 来源 {news_path}, 新增 {added} 条, 合并重复 {merged} 条")
+        return added, merged
+
+    @staticmethod
+    def _merge(conn: sqlite3.Connection, date: str, content: str, news_path: str, time_str: str,
+               fmt: Optional[str]) -> Tuple[int, int]:
+        position = conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM items WHERE date = ?', (date,)).fetchone()[0]
+        added = merged = 0
+
+        for item in iter_items(content, fmt):
+            fingerprint = simhash(item['text'])
+            condition, params = band_condition(fingerprint)
+            candidates = conn.execute(
+                f'SELECT position, fp FROM items WHERE date = ? AND {condition} ORDER BY position', [date] + params
+            )
+            existing = next((p for p, fp in candidates
+                             if hamming_distance(int(fp, 16), fingerprint) <= config.DEDUP_MAX_DISTANCE), None)
+            if existing is not None:
+                conn.execute('UPDATE items SET count = count + 1, last_seen = ?, highlighted = MAX(highlighted, ?) '
+                             'WHERE date = ? AND position = ?',
+                             (news_path, int(item['highlighted']), date, existing))
+                merged += 1
+                continue
+
+            conn.execute(
+                f'INSERT INTO items (date, position, category, text, highlighted, fp, path, time, last_seen, count, '
+                f'{", ".join(f"b{i}" for i in range(BANDS))}) VALUES ({", ".join("?" * (10 + BANDS))})',
+                [date, position, item['category'], item['text'], int(item['highlighted']), f"{fingerprint:016x}",
+                 news_path, time_str, news_path, 1] + params
+            )
+            position += 1
+            added += 1
+        return added, merged
+
+    def catch_up(self, date: Optional[str] = None, storage: Optional[NewsStorage] = None) -> int:
+        """
+        合并尚未进入汇总的新闻（汇总更新失败或功能上线前保存的新闻），由抓取脚本和清理任务调用
+
+        Args:
+            date: 只处理某一天，默认处理全部日期
+
+        Returns:
+            int: 补充合并的新闻数
+        """
+        storage = storage or news_storage
+        conn = self._connect()
+        if date:
+            rows = conn.execute('SELECT path FROM sources WHERE date = ?', (date,))
+        else:
+            rows = conn.execute('SELECT path FROM sources')
+        sources = {row[0] for row in rows}
+        missing = sorted(p for p in storage.list_paths(date) if p not in sources)
+        for news_path in missing:
+            summary = storage.read_summary(news_path)
+            if summary is None:
+                continue
+            content, fmt = summary
+            self.add_summary(content, news_path, fmt=fmt)
+        return len(missing)
+
+    def get(self, date: str) -> Dict[str, Any]:
+        """读取当天汇总（只读）"""
+        conn = self._connect()
+        sources = [row[0] for row in conn.execute('SELECT path FROM sources WHERE date = ? ORDER BY path', (date,))]
+        items = [
+            {'category': row[0], 'text': row[1], 'highlighted': bool(row[2]), 'fp': row[3], 'path': row[4],
+             'time': row[5], 'last_seen': row[6], 'count': row[7]}
+            for row in conn.execute('SELECT category, text, highlighted, fp, path, time, last_seen, count '
+                                    'FROM items WHERE date = ? ORDER BY position', (date,))
+        ]
+        return {'sources': sources, 'items': items}
+
+    def version(self, date: str) -> Optional[Tuple[int, int]]:
+        """汇总版本（每次合并后递增），用于响应缓存；当天没有汇总时返回None"""
+        row = self._connect().execute('SELECT generation FROM versions WHERE date = ?', (date,)).fetchone()
+        return (row[0], 0) if row else None
+
+    def prune(self, cutoff_time: datetime) -> int:
+        """
+        删除截止日期之前的汇总（与 clean_old_news 一同执行）
+
+        Returns:
+            int: 删除的天数
+        """
+        cutoff_date = cutoff_time.strftime('%Y%m%d')
+        with self._transaction() as conn:
+            removed = conn.execute('DELETE FROM versions WHERE date < ?', (cutoff_date,)).rowcount
+            conn.execute('DELETE FROM items WHERE date < ?', (cutoff_date,))
+            conn.execute('DELETE FROM sources WHERE date < ?', (cutoff_date,))
+        if removed:
+            logger.info(f"每日汇总清理完成，删除 {removed} 天")
+        return removed
+
+
+def render_markdown(data: Dict[str, Any], date: str) -> str:
+    """
+    按现有的 "## 分类" / "- 条目" 格式输出汇总
+
+    分类按首次出现顺序排列，重点条目保持 <font color="red"> 标记
+    """
+    categories: Dict[str, List[str]] = {}
+    for item in data['items']:
+        text = f'<font color="red">{item["text"]}</font>' if item['highlighted'] else item['text']
+        categories.setdefault(item['category'], []).append(f"- {text}")
+
+    title = datetime.strptime(date, '%Y%m%d').strftime('%Y-%m-%d')
+    lines = [f"# {title} 新闻汇总", ""]
+    for category, items in categories.items():
+        lines.append(f"## {category}")
+        lines.extend(items)
+        lines.append("")
+    return '\n'.join(lines)
+
+
+# 全局每日汇总实例
+daily_digest = DailyDigest(config.DIGEST_DB_PATH)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+新闻导出模块
+将新闻总结逐条导出为 NDJSON，供下游分析任务使用
+"""
+
+import argparse
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Any
+
+from logger_config import get_logger
+from keyword_matcher import highlighter
+from news_dedup import dedup_index
+from news_parser import iter_items
+from news_storage import news_storage
+
+logger = get_logger('news_exporter')
+
+# 支持的时间参数格式
+TIME_ARG_FORMATS = (
+    '%Y%m%d',
+    '%Y%m%d%H%M%S',
+    '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+)
+
+
+def parse_time_arg(value: Optional[str], end_of_day: bool = False) -> Optional[datetime]:
+    """
+    解析时间范围参数
+
+    Args:
+        value: 时间字符串，支持 YYYYMMDD / YYYYMMDDHHMMSS / ISO 格式
+        end_of_day: 仅给出日期时是否取当天最后一秒（用于范围上界）
+
+    Returns:
+        Optional[datetime]: 解析后的时间，未提供时返回None
+
+    Raises:
+        ValueError: 时间格式不正确
+    """
+    if not value:
+        return None
+    for fmt in TIME_ARG_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if end_of_day and fmt in ('%Y%m%d', '%Y-%m-%d'):
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed
+    raise ValueError(f"无法解析的时间格式: {value}")
+
+
+def iter_news_records(start: Optional[datetime] = None,
+                      end: Optional[datetime] = None,
+                      categories: Optional[Sequence[str]] = None,
+                      dedupe: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    逐条生成新闻记录，每次只读取一个文件
+
+    Args:
+        start: 起始时间（包含）
+        end: 结束时间（包含）
+        categories: 只导出这些分类，为空时导出全部
+        dedupe: 是否跳过已标记为重复的条目
+
+    Yields:
+        Dict[str, Any]: 新闻记录
+    """
+    category_filter = set(categories) if categories else None
+
+    for news_path, run_time, content, fmt in news_storage.iter_runs(start, end):
+        duplicates = dedup_index.get_duplicates(news_path) if dedupe else ()
+        for ordinal, item in enumerate(iter_items(content, fmt)):
+            if ordinal in duplicates:
+                continue
+            if category_filter is not None and item['category'] not in category_filter:
+                continue
+            yield {
+                'date': run_time.strftime('%Y-%m-%d'),
+                'run_time': run_time.isoformat(),
+                'path': news_path,
+                'category': item['category'],
+                'highlighted': item['highlighted'],
+                'keywords': highlighter.match(item['text']),
+                'text': item['text']
+            }
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """将记录编码为 NDJSON 行"""
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """流式 gzip 压缩，内存占用与数据总量无关"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def split_categories(values: Iterable[str]) -> list:
+    """解析分类参数，支持重复参数和逗号分隔"""
+    categories = []
+    for value in values:
+        categories.extend(part.strip() for part in value.split(',') if part.strip())
+    return categories
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='将新闻总结导出为 NDJSON')
+    parser.add_argument('--from', dest='start', help='起始时间，如 20250927 或 2025-09-27T08:00:00')
+    parser.add_argument('--to', dest='end', help='结束时间，仅给出日期时包含当天全部新闻')
+    parser.add_argument('--category', action='append', default=[], help='只导出指定分类，可重复或逗号分隔')
+    parser.add_argument('--dedupe', action='store_true', help='跳过已标记为重复的条目')
+    parser.add_argument('--gzip', action='store_true', help='使用 gzip 压缩输出')
+    parser.add_argument('-o', '--output', help='输出文件，默认为标准输出')
+    args = parser.parse_args(argv)
+
+    try:
+        start = parse_time_arg(args.start)
+        end = parse_time_arg(args.end, end_of_day=True)
+    except ValueError as e:
+        parser.error(str(e))
+
+    chunks = iter_ndjson(iter_news_records(start, end, split_categories(args.category), args.dedupe))
+    if args.gzip:
+        chunks = iter_gzip(chunks)
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,28 +6,109 @@
 负责执行新闻抓取脚本
 """
 
+import os
 import subprocess
-from typing import Tuple, Optional
+import threading
+import time
+from collections import deque
+from typing import IO, Dict, Tuple, Optional
 
 from config import config
 from logger_config import get_logger
+from news_pipeline import RUN_ID_PREFIX, SKIPPED_EXIT_CODE, STAGE_PREFIX, PipelineRun
 
 logger = get_logger('news_fetcher')
 
+# 检查超时和卡住的间隔（秒）
+WATCH_INTERVAL = 1.0
+
+
+class ScriptOutput:
+    """
+    抓取脚本的输出记录
+
+    stdout/stderr 由读取线程逐行写入：转发到日志，内存中只保留最近的若干行，
+    脚本输出运行ID后完整输出追加到该运行目录下的 output.log
+    """
+
+    def __init__(self, max_lines: int):
+        self.lines: deque = deque(maxlen=max_lines)
+        self.line_count = 0
+        self.run_id: Optional[str] = None
+        self.stage: Optional[str] = None
+        self.stage_started = time.monotonic()
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+
+    def append(self, stream: str, line: str) -> None:
+        line = line.rstrip('\n')
+        with self._lock:
+            self.line_count += 1
+            self.lines.append((stream, line))
+            if line.startswith(STAGE_PREFIX):
+                self.stage = line[len(STAGE_PREFIX):].strip()
+                self.stage_started = time.monotonic()
+            elif line.startswith(RUN_ID_PREFIX) and self.run_id is None:
+                self.run_id = line[len(RUN_ID_PREFIX):].strip()
+                self._open_record()
+            if self._file is not None:
+                self._write(stream, line)
+        # 子进程的日志也输出到 stderr，按普通输出记录
+        logger.info(f"[脚本 {stream}] {line}")
+
+    def _open_record(self) -> None:
+        """打开运行目录下的输出记录，补写之前保留的输出"""
+        directory = os.path.join(config.PIPELINE_RUNS_DIR, self.run_id)
+        try:
+            self._file = open(os.path.join(directory, 'output.log'), 'a', encoding='utf-8')
+            self._file.write(f"===== {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n")
+            for stream, line in self.lines:
+                self._write(stream, line)
+        except OSError as e:
+            logger.warning(f"无法写入运行输出记录 {directory}: {e}")
+            self._file = None
+
+    def _write(self, stream: str, line: str) -> None:
+        self._file.write(f"[stderr] {line}\n" if stream == 'stderr' else f"{line}\n")
+        self._file.flush()
+
+    def text(self, stream: str) -> str:
+        """保留的某个流的输出"""
+        with self._lock:
+            return '\n'.join(line for name, line in self.lines if name == stream)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
 
 class NewsFetcher:
     """新闻抓取器"""
 
     def __init__(self):
         self.script_path = config.NEWS_SCRIPT_PATH
+        self.work_dir = config.BASE_DIR
         self.timeout = config.NEWS_SCRIPT_TIMEOUT
+        self.stage_budgets = dict(config.NEWS_SCRIPT_STAGE_BUDGETS)
+        self.startup_budget = config.NEWS_SCRIPT_STARTUP_BUDGET
+        self.output_lines = config.NEWS_SCRIPT_OUTPUT_LINES
 
-    def run_news_script(self) -> Tuple[bool, Optional[str], Optional[str]]:
+    def run_news_script(self, env: Optional[Dict[str, str]] = None) -> Tuple[Optional[bool], Optional[str], Optional[str]]:
         """
         执行新闻抓取脚本
 
+        输出逐行转发到日志和运行记录；超过总超时，或某个阶段超过其时间预算（卡住）时终止脚本，
+        并把该运行记为失败，下次从卡住的阶段继续。阶段按脚本输出的阶段标记计时，
+        其他输出（如LLM切换服务的日志）不算进展
+
+        Args:
+            env: 额外的环境变量（如 NEWS_SOURCE_URL），与当前进程的环境变量合并
+
         Returns:
-            Tuple[bool, Optional[str], Optional[str]]: (成功状态, 输出, 错误信息)
+            Tuple[Optional[bool], Optional[str], Optional[str]]: (成功状态, 输出, 错误信息)；
+                上次失败的运行尚在退避中、本次未执行时成功状态为None，错误信息为跳过原因
         """
         try:
             logger.info("开始执行新闻抓取任务...")
@@ -36,40 +117,118 @@ class NewsFetcher:
             if not self._check_script_exists():
                 return False, None, f"新闻脚本不存在: {self.script_path}"
 
-            # 执行脚本
-            result = subprocess.run(
+            # 执行脚本，关闭子进程的输出缓冲以便逐行读取
+            process = subprocess.Popen(
                 ['python3', self.script_path],
-                cwd=config.BASE_DIR,
-                capture_output=True,
+                cwd=self.work_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=self.timeout
+                encoding='utf-8',
+                errors='replace',
+                env={**os.environ, **(env or {}), 'PYTHONUNBUFFERED': '1'}
             )
-
-            if result.returncode == 0:
-                logger.info("新闻抓取任务执行成功")
-                if result.stdout:
-                    logger.info(f"脚本输出: {result.stdout.strip()}")
-                return True, result.stdout, None
-            else:
-                error_msg = f"新闻抓取任务执行失败，返回码: {result.returncode}"
-                if result.stderr:
-                    error_msg += f", 错误信息: {result.stderr.strip()}"
+            output = ScriptOutput(self.output_lines)
+            readers = [
+                threading.Thread(target=self._read_stream, args=(process.stdout, 'stdout', output), daemon=True),
+                threading.Thread(target=self._read_stream, args=(process.stderr, 'stderr', output), daemon=True)
+            ]
+            for reader in readers:
+                reader.start()
+            try:
+                killed = self._watch(process, output)
+                for reader in readers:
+                    reader.join(timeout=5)
+            finally:
+                output.close()
+
+            stdout = output.text('stdout')
+            if killed:
+                error_msg = f"新闻抓取任务{killed}，已终止"
                 logger.error(error_msg)
-                return False, result.stdout, error_msg
-
-        except subprocess.TimeoutExpired:
-            error_msg = f"新闻抓取任务执行超时({self.timeout}秒)"
+                self._interrupt_run(output, error_msg)
+                return False, stdout, error_msg
+            if process.returncode == 0:
+                logger.info(f"新闻抓取任务执行成功，输出 {output.line_count} 行")
+                return True, stdout, None
+            if process.returncode == SKIPPED_EXIT_CODE:
+                reason = stdout.strip().splitlines()[-1] if stdout.strip() else '上次失败的运行尚在退避中'
+                logger.info(f"新闻抓取任务未执行: {reason}")
+                return None, stdout, reason
+            error_msg = f"新闻抓取任务执行失败，返回码: {process.returncode}"
+            stderr = output.text('stderr')
+            if stderr:
+                error_msg += f", 错误信息: {stderr.strip()}"
             logger.error(error_msg)
-            return False, None, error_msg
+            return False, stdout, error_msg
 
         except Exception as e:
             error_msg = f"执行新闻抓取任务时发生错误: {str(e)}"
             logger.error(error_msg)
             return False, None, error_msg
 
+    @staticmethod
+    def _read_stream(stream: IO[str], name: str, output: ScriptOutput) -> None:
+        """逐行读取子进程输出，直到子进程关闭该流"""
+        try:
+            for line in stream:
+                output.append(name, line)
+        except Exception as e:
+            logger.warning(f"读取脚本 {name} 失败: {e}")
+        finally:
+            stream.close()
+
+    def _watch(self, process: subprocess.Popen, output: ScriptOutput) -> Optional[str]:
+        """
+        等待脚本结束，超时或卡住时终止
+
+        Returns:
+            Optional[str]: 终止原因，正常结束时为None
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                process.wait(timeout=WATCH_INTERVAL)
+                return None
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            if now >= deadline:
+                reason = f"执行超时({self.timeout}秒)"
+            elif self._stalled(output, now):
+                budget = self._stage_budget(output.stage)
+                reason = f"在 {output.stage or '启动'} 阶段卡住（超过{budget}秒未完成）"
+            else:
+                continue
+            process.kill()
+            process.wait()
+            return reason
+
+    def _stage_budget(self, stage: Optional[str]) -> int:
+        """阶段的时间预算（秒），0表示不限；未配置的阶段只按总超时"""
+        if stage is None:
+            return self.startup_budget
+        return self.stage_budgets.get(stage, 0)
+
+    def _stalled(self, output: ScriptOutput, now: float) -> bool:
+        """当前阶段是否超过时间预算"""
+        budget = self._stage_budget(output.stage)
+        return bool(budget) and now - output.stage_started >= budget
+
+    @staticmethod
+    def _interrupt_run(output: ScriptOutput, error: str) -> None:
+        """被终止的运行仍为执行中状态，记为失败以便按退避时间从该阶段重试"""
+        if not output.run_id or not output.stage:
+            return
+        try:
+            run = PipelineRun.load(os.path.join(config.PIPELINE_RUNS_DIR, output.run_id))
+            if run is not None:
+                run.interrupt(output.stage, error)
+        except Exception as e:
+            logger.warning(f"记录运行 {output.run_id} 失败状态时出错: {e}")
+
     def _check_script_exists(self) -> bool:
         """检查脚本文件是否存在"""
-        import os
         exists = os.path.exists(self.script_path)
         if not exists:
             logger.error(f"新闻脚本不存在: {self.script_path}")
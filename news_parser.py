@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+新闻总结解析模块
+解析 summarize_with_llm 输出的 markdown 结构（## 行业 / - 新闻），
+以及结构化输出模式（LLM_OUTPUT_FORMAT = 'json'）保存的 JSON 总结
+"""
+
+import json
+import re
+from typing import Any, Container, Dict, Iterator, List, Optional, Tuple
+
+# 分类标题：## 行业名称
+CATEGORY_PATTERN = re.compile(r'^##\s+(.+?)\s*$')
+# 新闻条目：- 新闻 / — 新闻 / * 新闻（模板中重点新闻使用的是破折号）
+ITEM_PATTERN = re.compile(r'^\s*[-—*]\s+(.+?)\s*$')
+# 标红标记
+HIGHLIGHT_PATTERN = re.compile(r'<font color="red">(.+?)</font>')
+
+# 未归类条目使用的分类名
+DEFAULT_CATEGORY = '未分类'
+
+# 总结的保存格式：保存时记录（文件扩展名 / SQLite 的 format 列），读取时按记录的格式解析
+MARKDOWN = 'markdown'
+JSON = 'json'
+SUMMARY_FORMATS = (MARKDOWN, JSON)
+
+# 新闻原文时间：HH:MM 或 HH:MM:SS
+SOURCE_TIME_PATTERN = re.compile(r'^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$')
+
+# 结构化总结的 JSON Schema（用于 response_format）；保存的文件中每个条目另有 spans: 标红片段在 text 中的位置
+SUMMARY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'sections': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'category': {'type': 'string'},
+                    'items': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'text': {'type': 'string'},
+                                'highlight': {'type': 'boolean'},
+                                'source_time': {'type': ['string', 'null']},
+                            },
+                            'required': ['text', 'highlight', 'source_time'],
+                            'additionalProperties': False,
+                        },
+                    },
+                },
+                'required': ['category', 'items'],
+                'additionalProperties': False,
+            },
+        },
+    },
+    'required': ['sections'],
+    'additionalProperties': False,
+}
+
+
+class SummaryFormatError(ValueError):
+    """结构化总结不符合 SUMMARY_SCHEMA"""
+
+
+def is_structured(content: str, fmt: Optional[str] = None) -> bool:
+    """
+    是否为结构化（JSON）总结
+
+    已知格式（存储记录的格式、LLM_OUTPUT_FORMAT）时按格式判断；
+    未传入格式时按内容判断，只用于格式未记录的旧数据
+    """
+    if fmt is not None:
+        return fmt == JSON
+    return content.lstrip().startswith('{')
+
+
+def validate_summary(data: Any) -> Dict[str, Any]:
+    """
+    校验并规范化结构化总结
+
+    只检查 SUMMARY_SCHEMA 中的字段类型，不依赖 jsonschema；条目文本中的标红标记转换为 highlight 和 spans，
+    空条目和空分类被丢弃，格式不正确的 source_time 置为 None
+
+    Returns:
+        Dict[str, Any]: {'sections': [{'category', 'items': [{'text', 'highlight', 'spans', 'source_time'}]}]}
+
+    Raises:
+        SummaryFormatError: 结构不正确
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('sections'), list):
+        raise SummaryFormatError("缺少 sections 数组")
+    sections = []
+    for i, section in enumerate(data['sections']):
+        if not isinstance(section, dict) or not isinstance(section.get('items'), list):
+            raise SummaryFormatError(f"sections[{i}] 缺少 items 数组")
+        category = section.get('category')
+        if not isinstance(category, str):
+            raise SummaryFormatError(f"sections[{i}].category 不是字符串")
+        items = []
+        for j, item in enumerate(section['items']):
+            if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+                raise SummaryFormatError(f"sections[{i}].items[{j}].text 不是字符串")
+            text, spans = split_highlight(item['text'])
+            if not text:
+                continue
+            if not spans:
+                spans = _valid_spans(item.get('spans'), len(text))
+            source_time = item.get('source_time')
+            if not isinstance(source_time, str) or SOURCE_TIME_PATTERN.match(source_time.strip()) is None:
+                source_time = None
+            items.append({
+                'text': text,
+                'highlight': item.get('highlight') is True or bool(spans),
+                'spans': spans,
+                'source_time': source_time.strip() if source_time else None,
+            })
+        if items:
+            sections.append({'category': category.strip().lstrip('#').strip() or DEFAULT_CATEGORY, 'items': items})
+    return {'sections': sections}
+
+
+def _valid_spans(spans: Any, length: int) -> List[List[int]]:
+    """保存的 spans 中按顺序、不重叠且在文本范围内的部分"""
+    if not isinstance(spans, list):
+        return []
+    valid: List[List[int]] = []
+    end = 0
+    for span in spans:
+        if (isinstance(span, list) and len(span) == 2 and all(type(x) is int for x in span)
+                and end <= span[0] < span[1] <= length):
+            valid.append(span)
+            end = span[1]
+    return valid
+
+
+def load_summary(content: str) -> Dict[str, Any]:
+    """解析并校验结构化总结"""
+    try:
+        data = json.loads(content)
+    except ValueError as e:
+        raise SummaryFormatError(f"不是有效的JSON: {e}")
+    return validate_summary(data)
+
+
+def dump_summary(document: Dict[str, Any]) -> str:
+    """结构化总结的保存格式"""
+    return json.dumps(document, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def render_markdown(document: Dict[str, Any]) -> str:
+    """将结构化总结渲染为 markdown（兼容按 markdown 展示的客户端）"""
+    blocks = []
+    for section in document['sections']:
+        lines = [f"## {section['category']}"]
+        for item in section['items']:
+            lines.append(f"- {render_highlight(item)}")
+        blocks.append('\n'.join(lines))
+    return '\n\n'.join(blocks) + '\n' if blocks else ''
+
+
+def render_highlight(item: Dict[str, Any]) -> str:
+    """条目文本加上标红标记：有 spans 时只标红这些片段，否则 highlight 时整条标红"""
+    text, spans = item['text'], item.get('spans')
+    if not spans:
+        return f'<font color="red">{text}</font>' if item['highlight'] else text
+    parts = []
+    end = 0
+    for start, stop in spans:
+        parts.append(text[end:start])
+        parts.append(f'<font color="red">{text[start:stop]}</font>')
+        end = stop
+    parts.append(text[end:])
+    return ''.join(parts)
+
+
+def to_document(content: str, fmt: Optional[str] = None) -> Dict[str, Any]:
+    """任意格式的总结转换为结构化总结（markdown 总结没有 source_time，标红片段转换为 spans）"""
+    if is_structured(content, fmt):
+        return load_summary(content)
+    sections: List[Dict[str, Any]] = []
+    index: Dict[str, Dict[str, Any]] = {}
+    for category, raw_text in _iter_raw_items(content):
+        text, spans = split_highlight(raw_text)
+        section = index.get(category)
+        if section is None:
+            section = {'category': category, 'items': []}
+            index[category] = section
+            sections.append(section)
+        section['items'].append({'text': text, 'highlight': bool(spans), 'spans': spans, 'source_time': None})
+    return {'sections': sections}
+
+
+def to_markdown(content: str, fmt: Optional[str] = None) -> str:
+    """任意格式的总结转换为 markdown"""
+    return render_markdown(load_summary(content)) if is_structured(content, fmt) else content
+
+
+def strip_highlight(text: str) -> str:
+    """移除标红标记，返回纯文本"""
+    return HIGHLIGHT_PATTERN.sub(r'\1', text).strip()
+
+
+def split_highlight(text: str) -> Tuple[str, List[List[int]]]:
+    """
+    移除标红标记，同时记录标红片段的位置
+
+    Returns:
+        Tuple[str, List[List[int]]]: (纯文本（与 strip_highlight 相同）, [[开始, 结束], ...] 按字符计的位置)
+    """
+    parts: List[str] = []
+    spans: List[List[int]] = []
+    length = 0
+    end = 0
+    for match in HIGHLIGHT_PATTERN.finditer(text):
+        parts.append(text[end:match.start()])
+        length += match.start() - end
+        fragment = match.group(1)
+        spans.append([length, length + len(fragment)])
+        parts.append(fragment)
+        length += len(fragment)
+        end = match.end()
+    parts.append(text[end:])
+    joined = ''.join(parts)
+    stripped = joined.strip()
+    offset = len(joined) - len(joined.lstrip())
+    clipped = []
+    for start, stop in spans:
+        start, stop = max(start - offset, 0), min(stop - offset, len(stripped))
+        if start < stop:
+            clipped.append([start, stop])
+    return stripped, clipped
+
+
+def _iter_raw_items(content: str) -> Iterator[Tuple[str, str]]:
+    """逐条解析 markdown 总结，返回 (分类, 带标红标记的条目文本)，跳过空条目"""
+    category = DEFAULT_CATEGORY
+    for line in content.splitlines():
+        category_match = CATEGORY_PATTERN.match(line)
+        if category_match:
+            category = category_match.group(1)
+            continue
+
+        item_match = ITEM_PATTERN.match(line)
+        if item_match and strip_highlight(item_match.group(1)):
+            yield category, item_match.group(1)
+
+
+def iter_items(content: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐条解析新闻条目
+
+    Args:
+        content: markdown 格式或结构化的新闻总结
+        fmt: 总结的格式（MARKDOWN / JSON），None 时按内容判断
+
+    Yields:
+        Dict[str, Any]: {'category': 分类, 'text': 纯文本, 'highlighted': 是否标红}
+    """
+    if is_structured(content, fmt):
+        for section in load_summary(content)['sections']:
+            for item in section['items']:
+                yield {'category': section['category'], 'text': item['text'], 'highlighted': item['highlight']}
+        return
+
+    for category, raw_text in _iter_raw_items(content):
+        yield {
+            'category': category,
+            'text': strip_highlight(raw_text),
+            'highlighted': HIGHLIGHT_PATTERN.search(raw_text) is not None
+        }
+
+
+def parse_summary(content: str, fmt: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    将新闻总结解析为按分类分组的结构
+
+    Args:
+        content: markdown 格式或结构化的新闻总结
+        fmt: 总结的格式，None 时按内容判断
+
+    Returns:
+        List[Dict[str, Any]]: [{'category': 分类, 'items': [{'text', 'highlighted'}]}]
+    """
+    sections: List[Dict[str, Any]] = []
+    index: Dict[str, Dict[str, Any]] = {}
+    for item in iter_items(content, fmt):
+        section = index.get(item['category'])
+        if section is None:
+            section = {'category': item['category'], 'items': []}
+            index[item['category']] = section
+            sections.append(section)
+        section['items'].append({'text': item['text'], 'highlighted': item['highlighted']})
+    return sections
+
+
+def filter_items(content: str, skip: Container[int], fmt: Optional[str] = None) -> str:
+    """
+    移除指定序号的新闻条目，序号与 iter_items 的输出顺序一致
+
+    条目全部被移除的分类标题也一并移除
+
+    Args:
+        content: markdown 格式或结构化的新闻总结
+        skip: 要移除的条目序号
+        fmt: 总结的格式，None 时按内容判断
+
+    Returns:
+        str: 过滤后的总结，格式与输入相同
+    """
+    if is_structured(content, fmt):
+        document = load_summary(content)
+        ordinal = 0
+        sections = []
+        for section in document['sections']:
+            items = []
+            for item in section['items']:
+                if ordinal not in skip:
+                    items.append(item)
+                ordinal += 1
+            if items:
+                sections.append({'category': section['category'], 'items': items})
+        return dump_summary({'sections': sections})
+
+    output: List[str] = []
+    section: List[str] = []
+    section_has_items = True  # 第一个分类之前的内容原样保留
+    ordinal = 0
+
+    def flush():
+        if section_has_items:
+            output.extend(section)
+
+    for line in content.splitlines():
+        if CATEGORY_PATTERN.match(line):
+            flush()
+            section, section_has_items = [line], False
+            continue
+
+        item_match = ITEM_PATTERN.match(line)
+        if item_match and strip_highlight(item_match.group(1)):
+            if ordinal in skip:
+                ordinal += 1
+                continue
+            ordinal += 1
+            section_has_items = True
+        section.append(line)
+    flush()
+
+    result = '\n'.join(output)
+    return result + '\n' if content.endswith('\n') else result
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抓取流程检查点模块
+一次运行分为 fetch → extract → summarize → persist 四个阶段，每个阶段的输出保存在 data/runs/<运行ID>/ 下；
+某个阶段失败后，下次重试从该阶段继续，已完成的阶段（如抓取到的网页）不再重复执行
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from json_store import write_json_atomic, write_text_atomic
+from logger_config import get_logger
+
+logger = get_logger('news_pipeline')
+
+STAGES = ('fetch', 'extract', 'summarize', 'persist')
+
+# 运行状态
+RUNNING = 'running'
+FAILED = 'failed'  # 可以继续
+DONE = 'done'
+ABANDONED = 'abandoned'  # 超过尝试次数或已过时，不再继续
+
+# 执行时输出的进度行，抓取器（news_fetcher）据此关联运行记录并判断是否卡住
+RUN_ID_PREFIX = '运行ID: '
+STAGE_PREFIX = '开始阶段: '
+
+# 上次失败的运行尚在退避中、本次未执行时抓取脚本的退出码（区别于成功0和失败1）
+SKIPPED_EXIT_CODE = 3
+
+
+class PipelineRun:
+    """一次运行的工作目录和状态（state.json）"""
+
+    def __init__(self, directory: str, state: Dict[str, Any]):
+        self.directory = directory
+        self.state = state
+
+    @property
+    def run_id(self) -> str:
+        return self.state['run_id']
+
+    @property
+    def source(self) -> str:
+        return self.state['source']
+
+    @classmethod
+    def create(cls, source: str, run_id: Optional[str] = None, runs_dir: Optional[str] = None) -> 'PipelineRun':
+        runs_dir = runs_dir or config.PIPELINE_RUNS_DIR
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        directory = os.path.join(runs_dir, run_id)
+        os.makedirs(directory, exist_ok=True)
+        run = cls(directory, {
+            'run_id': run_id,
+            'source': source,
+            'status': RUNNING,
+            'created_at': time.time(),
+            'attempts': 0,
+            'stages': {},
+        })
+        run.save()
+        return run
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['PipelineRun']:
+        try:
+            with open(os.path.join(directory, 'state.json'), 'r', encoding='utf-8') as f:
+                return cls(directory, json.load(f))
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"无法读取运行状态 {directory}: {e}")
+            return None
+
+    def save(self) -> None:
+        write_json_atomic(os.path.join(self.directory, 'state.json'), self.state, fsync='none')
+
+    # 阶段输出
+
+    def write_text(self, name: str, text: str) -> None:
+        write_text_atomic(os.path.join(self.directory, name), text, fsync='none')
+
+    def read_text(self, name: str) -> str:
+        with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def update(self, **values: Any) -> None:
+        """保存阶段中间结果（如已保存的新闻路径），重试时据此跳过已完成的步骤"""
+        self.state.update(values)
+        self.save()
+
+    def done(self, stage: str) -> bool:
+        return stage in self.state['stages']
+
+    @property
+    def crashed(self) -> bool:
+        """状态为执行中但已超过脚本超时时间（进程被终止）"""
+        return (self.state['status'] == RUNNING
+                and time.time() - self.state.get('started_at', 0) > config.NEWS_SCRIPT_TIMEOUT)
+
+    @property
+    def resumable(self) -> bool:
+        return self.state['status'] == FAILED or self.crashed
+
+    def next_attempt_at(self) -> float:
+        return self.state.get('next_attempt_at', 0)
+
+    def execute(self, stages: Iterable[Tuple[str, Callable[['PipelineRun'], bool]]]) -> bool:
+        """
+        依次执行未完成的阶段
+
+        Args:
+            stages: (阶段名, 阶段函数)，阶段函数返回是否成功
+
+        Returns:
+            bool: 全部阶段是否完成
+        """
+        self.state['attempts'] += 1
+        self.state['status'] = RUNNING
+        self.state['started_at'] = time.time()
+        self.save()
+        print(f"{RUN_ID_PREFIX}{self.run_id}", flush=True)
+        for name, func in stages:
+            if self.done(name):
+                print(f"跳过已完成的阶段: {name}")
+                continue
+            print(f"{STAGE_PREFIX}{name}", flush=True)
+            start = time.monotonic()
+            try:
+                ok = func(self)
+                error = None if ok else f"{name} 阶段失败"
+            except Exception as e:
+                ok, error = False, f"{name} 阶段发生错误: {e}"
+            if not ok:
+                self._fail(name, error)
+                return False
+            self.state['stages'][name] = {'finished_at': time.time(), 'seconds': round(time.monotonic() - start, 3)}
+            self.save()
+        self.state['status'] = DONE
+        self.save()
+        return True
+
+    def _fail(self, stage: str, error: str) -> None:
+        attempts = self.state['attempts']
+        self.state['last_error'] = error
+        self.state['failed_stage'] = stage
+        if attempts >= config.PIPELINE_MAX_ATTEMPTS:
+            self.state['status'] = ABANDONED
+            logger.error(f"运行 {self.run_id} 已尝试 {attempts} 次，不再重试: {error}")
+        else:
+            delay = config.PIPELINE_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            self.state['status'] = FAILED
+            self.state['next_attempt_at'] = time.time() + delay
+            logger.warning(f"运行 {self.run_id} 在 {stage} 阶段失败，{delay} 秒后可从该阶段重试: {error}")
+        self.save()
+
+    def interrupt(self, stage: str, error: str) -> None:
+        """执行进程被终止（超时或卡住）后记录失败，下次从该阶段继续"""
+        if self.state['status'] == RUNNING:
+            self._fail(stage, error)
+
+    def abandon(self, reason: str) -> None:
+        self.state['status'] = ABANDONED
+        self.state['last_error'] = reason
+        self.save()
+
+
+def iter_runs(runs_dir: Optional[str] = None) -> List[PipelineRun]:
+    """全部运行，按创建时间从新到旧"""
+    runs_dir = runs_dir or config.PIPELINE_RUNS_DIR
+    try:
+        names = os.listdir(runs_dir)
+    except FileNotFoundError:
+        return []
+    runs = [run for run in (PipelineRun.load(os.path.join(runs_dir, name)) for name in names) if run]
+    return sorted(runs, key=lambda run: run.state.get('created_at', 0), reverse=True)
+
+
+def open_run(source: str, run_id: Optional[str] = None,
+             runs_dir: Optional[str] = None) -> Tuple[Optional[PipelineRun], Optional[float]]:
+    """
+    打开本次要执行的运行
+
+    - 指定 run_id（如队列任务重试）时继续该运行，退避由调用方负责
+    - 否则继续同一来源最近一次失败且未过时的运行；其退避时间未到时返回 (None, 剩余秒数)，本次不执行
+    - 没有可继续的运行时新建
+
+    Returns:
+        Tuple[Optional[PipelineRun], Optional[float]]: (运行, 需要等待的秒数)
+    """
+    runs_dir = runs_dir or config.PIPELINE_RUNS_DIR
+    if run_id:
+        run = PipelineRun.load(os.path.join(runs_dir, run_id))
+        if run is not None and run.state['status'] != DONE:
+            return run, None
+        return PipelineRun.create(source, run_id if run is None else None, runs_dir), None
+
+    now = time.time()
+    for run in iter_runs(runs_dir):
+        if run.source != source or not run.resumable:
+            continue
+        if now - run.state['created_at'] > config.PIPELINE_RESUME_MAX_AGE:
+            run.abandon('内容已过时，不再继续')
+            continue
+        wait = run.next_attempt_at() - now
+        if wait > 0:
+            return None, wait
+        return run, None
+    return PipelineRun.create(source, runs_dir=runs_dir), None
+
+
+def prune_runs(cutoff_time: datetime, runs_dir: Optional[str] = None) -> int:
+    """删除创建时间早于 cutoff_time 的运行目录（正在执行的除外）"""
+    runs_dir = runs_dir or config.PIPELINE_RUNS_DIR
+    cutoff = cutoff_time.timestamp()
+    removed = 0
+    for run in iter_runs(runs_dir):
+        if run.state.get('created_at', 0) >= cutoff or (run.state['status'] == RUNNING and not run.crashed):
+            continue
+        shutil.rmtree(run.directory, ignore_errors=True)
+        removed += 1
+    return removed
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+新闻统计模块
+保存新闻时按小时累加各分类、各重点关键词的条目数，清理新闻时扣减；
+查询耗时只与时间桶数量有关，不需要读取和解析新闻文件
+
+用法:
+    python3 news_stats.py --rebuild        # 按现有新闻重建统计
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import config
+from logger_config import get_logger
+from news_parser import iter_items
+from news_storage import NewsStorage, PATH_FORMAT, news_storage
+
+logger = get_logger('news_stats')
+
+BUCKETS = ('hour', 'day')
+HOUR_FORMAT = '%Y%m%d%H'
+COUNTERS = ('items', 'highlighted')
+
+
+def hour_key(news_path: str) -> str:
+    """新闻路径所在的小时桶 YYYYMMDDHH"""
+    return news_path[:8] + news_path[9:11]
+
+
+def count_summary(content: str, fmt: Optional[str] = None) -> Dict[str, Any]:
+    """
+    统计一次总结的条目
+
+    Returns:
+        Dict[str, Any]: {'items', 'highlighted', 'categories': {分类: 条数}, 'keywords': {关键词: 重点条目数}}
+    """
+    from keyword_matcher import highlighter
+
+    counts: Dict[str, Any] = {'items': 0, 'highlighted': 0, 'categories': {}, 'keywords': {}}
+    for item in iter_items(content, fmt):
+        counts['items'] += 1
+        counts['categories'][item['category']] = counts['categories'].get(item['category'], 0) + 1
+        if item['highlighted']:
+            counts['highlighted'] += 1
+            for keyword in highlighter.match(item['text']):
+                counts['keywords'][keyword] = counts['keywords'].get(keyword, 0) + 1
+    return counts
+
+
+def _merge(target: Dict[str, Any], counts: Dict[str, Any], sign: int) -> None:
+    for key in COUNTERS:
+        target[key] = target.get(key, 0) + sign * counts[key]
+    for field in ('categories', 'keywords'):
+        values = target.setdefault(field, {})
+        for name, count in counts[field].items():
+            value = values.get(name, 0) + sign * count
+            if value > 0:
+                values[name] = value
+            else:
+                values.pop(name, None)
+
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {'runs': 0, 'items': 0, 'highlighted': 0, 'categories': {}, 'keywords': {}}
+
+
+def _row_bucket(row: Sequence[Any]) -> Dict[str, Any]:
+    """hours 表的 (runs, items, highlighted, categories, keywords) -> 小时桶"""
+    return {'runs': row[0], 'items': row[1], 'highlighted': row[2],
+            'categories': json.loads(row[3]), 'keywords': json.loads(row[4])}
+
+
+class NewsStats:
+    """
+    按小时预先汇总的统计，保存在 data/news_stats.db（SQLite，WAL模式）
+
+    表结构:
+        hours: 每小时一行 (key=YYYYMMDDHH, runs, items, highlighted, categories, keywords)，分类和关键词计数为JSON
+        sources: 每个已计入的新闻一行 (path, counts)，重复添加时忽略，清理时按此扣减
+        meta: generation 在每次写入后加1，用于响应缓存
+
+    查询只按主键范围读取时间范围内的小时行，与新闻文件数无关；保存一次新闻只改写一个小时行
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS hours (key TEXT PRIMARY KEY, runs INTEGER NOT NULL, items INTEGER NOT NULL, '
+        'highlighted INTEGER NOT NULL, categories TEXT NOT NULL, keywords TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, counts TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """写事务，提交前更新 generation"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                         "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def add_summary(self, content: str, news_path: str, fmt: Optional[str] = None) -> bool:
+        """
+        将一次运行的总结计入统计（同一路径重复添加时忽略）
+
+        Returns:
+            bool: 是否新计入
+        """
+        counts = count_summary(content, fmt)
+        with self._transaction() as conn:
+            if not self._add(conn, news_path, counts):
+                return False
+        logger.info(f"新闻统计已更新: {news_path}, 条目 {counts['items']}, 重点 {counts['highlighted']}")
+        return True
+
+    @staticmethod
+    def _read_hour(conn: sqlite3.Connection, key: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute('SELECT runs, items, highlighted, categories, keywords FROM hours WHERE key = ?',
+                           (key,)).fetchone()
+        return _row_bucket(row) if row else None
+
+    @staticmethod
+    def _write_hour(conn: sqlite3.Connection, key: str, bucket: Dict[str, Any]) -> None:
+        if bucket['runs'] <= 0:
+            conn.execute('DELETE FROM hours WHERE key = ?', (key,))
+            return
+        conn.execute(
+            'INSERT OR REPLACE INTO hours (key, runs, items, highlighted, categories, keywords) VALUES (?, ?, ?, ?, ?, ?)',
+            (key, bucket['runs'], bucket['items'], bucket['highlighted'],
+             json.dumps(bucket['categories'], ensure_ascii=False), json.dumps(bucket['keywords'], ensure_ascii=False))
+        )
+
+    def _add(self, conn: sqlite3.Connection, news_path: str, counts: Dict[str, Any]) -> bool:
+        if conn.execute('SELECT 1 FROM sources WHERE path = ?', (news_path,)).fetchone():
+            return False
+        key = hour_key(news_path)
+        bucket = self._read_hour(conn, key) or _empty_bucket()
+        bucket['runs'] += 1
+        _merge(bucket, counts, 1)
+        self._write_hour(conn, key, bucket)
+        conn.execute('INSERT INTO sources (path, counts) VALUES (?, ?)', (news_path, json.dumps(counts, ensure_ascii=False)))
+        return True
+
+    def catch_up(self, storage: Optional[NewsStorage] = None) -> int:
+        """
+        计入尚未统计的新闻（统计更新失败或功能上线前保存的新闻），由清理任务调用
+
+        Returns:
+            int: 补充计入的新闻数
+        """
+        storage = storage or news_storage
+        sources = {row[0] for row in self._connect().execute('SELECT path FROM sources')}
+        pending = []
+        for news_path in sorted(p for p in storage.list_paths() if p not in sources):
+            summary = storage.read_summary(news_path)
+            if summary is not None:
+                pending.append((news_path, count_summary(*summary)))
+        if not pending:
+            return 0
+        # 一个事务内写入
+        with self._transaction() as conn:
+            added = sum(self._add(conn, news_path, counts) for news_path, counts in pending)
+        logger.info(f"新闻统计补充计入 {added} 次运行")
+        return added
+
+    def prune(self, cutoff_time: datetime) -> int:
+        """
+        扣减截止时间之前的新闻（与 clean_old_news 一同执行），计数归零的小时行一并删除
+
+        Returns:
+            int: 扣减的新闻数
+        """
+        cutoff_path = cutoff_time.strftime(PATH_FORMAT)
+        with self._transaction() as conn:
+            expired = conn.execute('SELECT path, counts FROM sources WHERE path < ?', (cutoff_path,)).fetchall()
+            buckets: Dict[str, Dict[str, Any]] = {}
+            for news_path, counts in expired:
+                key = hour_key(news_path)
+                if key not in buckets:
+                    buckets[key] = self._read_hour(conn, key)
+                bucket = buckets[key]
+                if bucket is None:
+                    continue
+                bucket['runs'] -= 1
+                _merge(bucket, json.loads(counts), -1)
+            for key, bucket in buckets.items():
+                if bucket is not None:
+                    self._write_hour(conn, key, bucket)
+            conn.execute('DELETE FROM sources WHERE path < ?', (cutoff_path,))
+        if expired:
+            logger.info(f"新闻统计清理完成，扣减 {len(expired)} 次运行")
+        return len(expired)
+
+    def clear(self) -> None:
+        """清空统计（重建前调用）"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM hours')
+            conn.execute('DELETE FROM sources')
+
+    def hour_range(self) -> Optional[Tuple[str, str]]:
+        """已有统计的最早和最晚小时键"""
+        row = self._connect().execute('SELECT MIN(key), MAX(key) FROM hours').fetchone()
+        return (row[0], row[1]) if row and row[0] else None
+
+    def query(self, start: datetime, end: datetime, bucket: str = 'hour') -> Dict[str, Any]:
+        """
+        按小时或按天汇总 [start, end] 内的统计，没有新闻的时间桶计数为0
+
+        Returns:
+            Dict[str, Any]: {'buckets': [{'time', 'runs', 'items', 'highlighted', 'categories', 'keywords'}],
+                             'totals': {...}}
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket 只能是 {' / '.join(BUCKETS)}")
+        rows = self._connect().execute(
+            'SELECT key, runs, items, highlighted, categories, keywords FROM hours WHERE key >= ? AND key <= ?',
+            (start.strftime(HOUR_FORMAT), end.strftime(HOUR_FORMAT))
+        ).fetchall()
+        hours = {row[0]: _row_bucket(row[1:]) for row in rows}
+        buckets: List[Dict[str, Any]] = []
+        totals = _empty_bucket()
+        for label, keys in self._bucket_keys(start, end, bucket):
+            result = _empty_bucket()
+            result['time'] = label
+            for key in keys:
+                counts = hours.get(key)
+                if counts is not None:
+                    result['runs'] += counts['runs']
+                    _merge(result, counts, 1)
+            totals['runs'] += result['runs']
+            _merge(totals, result, 1)
+            buckets.append(result)
+        return {'buckets': buckets, 'totals': totals}
+
+    @staticmethod
+    def _bucket_keys(start: datetime, end: datetime, bucket: str) -> Iterator[Tuple[str, List[str]]]:
+        """(时间桶标签, 包含的小时键)"""
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        while hour <= end:
+            if bucket == 'hour':
+                yield hour.strftime('%Y-%m-%dT%H:00'), [hour.strftime(HOUR_FORMAT)]
+                hour += timedelta(hours=1)
+                continue
+            day_end = hour.replace(hour=23)
+            keys = []
+            while hour <= min(day_end, end):
+                keys.append(hour.strftime(HOUR_FORMAT))
+                hour += timedelta(hours=1)
+            yield day_end.strftime('%Y-%m-%d'), keys
+            hour = day_end + timedelta(hours=1)
+
+    def version(self) -> Optional[Tuple[int, int]]:
+        """统计版本（每次写入后递增），用于响应缓存"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return (row[0], 0) if row else None
+
+
+# 全局统计实例
+news_stats = NewsStats(config.NEWS_STATS_PATH)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='新闻统计维护')
+    parser.add_argument('--rebuild', action='store_true', help='清空后按现有新闻重建统计')
+    args = parser.parse_args(argv)
+
+    config.ensure_dirs()
+    if args.rebuild:
+        news_stats.clear()
+    added = news_stats.catch_up()
+    print(f"✅ 统计完成，计入 {added} 次运行")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+新闻存储模块
+统一新闻总结的保存、读取、列举和过期清理，支持文件和 SQLite 两种后端
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import config
+from json_store import write_text_atomic
+from logger_config import get_logger
+from news_parser import JSON, MARKDOWN, SUMMARY_FORMATS, iter_items
+
+logger = get_logger('news_storage')
+
+DATE_DIR_PATTERN = re.compile(r'^\d{8}$')
+TIME_FILE_PATTERN = re.compile(r'^(\d{2})-(\d{2})-(\d{2})\.(?:md|json)$')
+# 写入中的临时文件，如 .18-02-58.md.abc123.tmp，列表和读取时忽略
+TEMP_FILE_PATTERN = re.compile(r'^\..+\.tmp$')
+
+# 合法的新闻路径（ASCII 数字）
+NEWS_PATH_PATTERN = re.compile(config.ALLOWED_PATH_PATTERN, re.ASCII)
+
+# 新闻路径 YYYYMMDD/HH-MM-SS 与运行时间的转换格式
+PATH_FORMAT = '%Y%m%d/%H-%M-%S'
+
+# 文件后端按扩展名记录总结的格式：HH-MM-SS.md 为 markdown，HH-MM-SS.json 为结构化总结
+FORMAT_EXTENSIONS = {MARKDOWN: '.md', JSON: '.json'}
+
+# 日期目录下保存重新总结结果的子目录（news_backfill.py）：YYYYMMDD/versions/<版本>/HH-MM-SS.md
+VERSIONS_DIR = 'versions'
+
+
+def news_path_of(run_time: datetime) -> str:
+    """运行时间对应的新闻路径"""
+    return run_time.strftime(PATH_FORMAT)
+
+
+def time_file_stem(filename: str) -> str:
+    """新闻文件名去掉扩展名，如 18-02-58.json -> 18-02-58"""
+    return os.path.splitext(filename)[0]
+
+
+class NewsStorage:
+    """
+    新闻存储接口
+
+    新闻以路径 YYYYMMDD/HH-MM-SS 标识，每次运行一条，写入后不再修改；
+    保存时记录总结的格式（MARKDOWN / JSON），读取时一并返回，不按内容判断
+    """
+
+    name = 'base'
+
+    def save(self, content: str, run_time: datetime, overwrite: bool = False, fmt: str = MARKDOWN) -> str:
+        """
+        保存一次运行的总结
+
+        同一秒已有新闻时（手动执行与定时任务同时完成），依次顺延1秒，不覆盖已有新闻
+
+        Args:
+            content: 新闻总结
+            run_time: 运行时间
+            overwrite: 是否覆盖同一路径的已有新闻（迁移时使用）
+            fmt: 总结的格式（MARKDOWN / JSON）
+
+        Returns:
+            str: 实际保存的新闻路径 YYYYMMDD/HH-MM-SS
+        """
+        if fmt not in SUMMARY_FORMATS:
+            raise ValueError(f"不支持的总结格式: {fmt}")
+        for attempt in range(config.SAVE_COLLISION_RETRIES + 1):
+            news_path = news_path_of(run_time + timedelta(seconds=attempt))
+            try:
+                self._write(news_path, content, overwrite, fmt)
+            except FileExistsError:
+                logger.warning(f"新闻路径已存在，顺延1秒: {news_path}")
+                continue
+            return news_path
+        raise FileExistsError(f"连续 {config.SAVE_COLLISION_RETRIES + 1} 秒的新闻路径均已存在: {news_path_of(run_time)}")
+
+    def _write(self, news_path: str, content: str, overwrite: bool, fmt: str) -> None:
+        """写入一条新闻，overwrite 为 False 且路径已存在时抛出 FileExistsError"""
+        raise NotImplementedError
+
+    def location(self, news_path: str) -> str:
+        """新闻的实际保存位置（用于输出）"""
+        return news_path
+
+    def read(self, news_path: str) -> Optional[str]:
+        """读取总结，不存在时返回None"""
+        summary = self.read_summary(news_path)
+        return summary[0] if summary else None
+
+    def read_summary(self, news_path: str) -> Optional[Tuple[str, str]]:
+        """读取总结及其格式 (内容, MARKDOWN / JSON)，不存在时返回None"""
+        raise NotImplementedError
+
+    def version(self, news_path: str) -> Optional[Tuple[Any, ...]]:
+        """总结的版本标识（用于响应缓存），不存在时返回None"""
+        raise NotImplementedError
+
+    def list_paths(self, date: Optional[str] = None) -> List[str]:
+        """列出新闻路径（最新的在前），可只列出某一天"""
+        raise NotImplementedError
+
+    def iter_runs(self, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Iterator[Tuple[str, datetime, str, str]]:
+        """
+        按时间顺序遍历总结，每次只读取一条
+
+        Yields:
+            Tuple[str, datetime, str, str]: (新闻路径, 运行时间, 总结内容, 格式)
+        """
+        raise NotImplementedError
+
+    def delete_before(self, cutoff_time: datetime) -> Dict[str, int]:
+        """
+        删除截止时间之前的总结
+
+        Returns:
+            Dict[str, int]: {'deleted_files': 删除的总结数, 'deleted_dirs': 删除的日期目录数}
+        """
+        raise NotImplementedError
+
+    def exists(self, news_path: str) -> bool:
+        return self.version(news_path) is not None
+
+
+class FileStorage(NewsStorage):
+    """文件后端：news/YYYYMMDD/HH-MM-SS.md（markdown）或 HH-MM-SS.json（结构化总结）"""
+
+    name = 'file'
+
+    def __init__(self, news_dir: Optional[str] = None):
+        self._news_dir = news_dir
+
+    @property
+    def news_dir(self) -> str:
+        # 未指定时跟随 config.NEWS_DIR（基准测试会临时替换）
+        return self._news_dir or config.NEWS_DIR
+
+    def file_path(self, news_path: str, fmt: str = MARKDOWN) -> Optional[str]:
+        """新闻路径按指定格式保存时的文件路径，路径不合法时返回None"""
+        # 路径只能是 YYYYMMDD/HH-MM-SS，不会跳出新闻目录
+        if NEWS_PATH_PATTERN.fullmatch(news_path) is None:
+            return None
+        return os.path.join(self.news_dir, news_path + FORMAT_EXTENSIONS[fmt])
+
+    def _write(self, news_path: str, content: str, overwrite: bool, fmt: str) -> None:
+        file_path = self.file_path(news_path, fmt)
+        others = [self.file_path(news_path, other) for other in SUMMARY_FORMATS if other != fmt]
+        if not overwrite and any(os.path.exists(other) for other in others):
+            # 同一路径已有其他格式的新闻
+            raise FileExistsError(news_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # 先写临时文件再原子替换/链接，列表和读取接口不会看到写了一半的文件
+        write_text_atomic(file_path, content, overwrite=overwrite)
+        if overwrite:
+            for other in others:
+                try:
+                    os.remove(other)
+                except FileNotFoundError:
+                    pass
+
+    def location(self, news_path: str) -> str:
+        for fmt in SUMMARY_FORMATS:
+            file_path = self.file_path(news_path, fmt)
+            if file_path and os.path.exists(file_path):
+                return file_path
+        return os.path.join(self.news_dir, news_path + FORMAT_EXTENSIONS[MARKDOWN])
+
+    def read_summary(self, news_path: str) -> Optional[Tuple[str, str]]:
+        if NEWS_PATH_PATTERN.fullmatch(news_path) is None:
+            return None
+        for fmt in SUMMARY_FORMATS:
+            try:
+                with open(self.file_path(news_path, fmt), 'r', encoding='utf-8') as f:
+                    return f.read(), fmt
+            except (FileNotFoundError, IsADirectoryError):
+                continue
+        return None
+
+    def version(self, news_path: str) -> Optional[Tuple[Any, ...]]:
+        if NEWS_PATH_PATTERN.fullmatch(news_path) is None:
+            return None
+        for fmt in SUMMARY_FORMATS:
+            try:
+                st = os.stat(self.file_path(news_path, fmt))
+            except FileNotFoundError:
+                continue
+            # 新闻文件写入后不再修改，按 mtime 和大小判断缓存是否有效
+            return st.st_mtime_ns, st.st_size, fmt
+        return None
+
+    def _date_dirs(self) -> List[str]:
+        try:
+            return sorted(d for d in os.listdir(self.news_dir) if DATE_DIR_PATTERN.match(d))
+        except FileNotFoundError:
+            logger.warning(f"新闻目录不存在: {self.news_dir}")
+            return []
+
+    def _time_files(self, date_dir: str) -> List[str]:
+        date_path = os.path.join(self.news_dir, date_dir)
+        try:
+            return sorted(f for f in os.listdir(date_path) if TIME_FILE_PATTERN.match(f))
+        except NotADirectoryError:
+            return []
+        except OSError as e:
+            logger.error(f"无法读取目录 {date_path}: {e}")
+            return []
+
+    def list_paths(self, date: Optional[str] = None) -> List[str]:
+        date_dirs = [date] if date else self._date_dirs()
+        return sorted({f"{d}/{time_file_stem(f)}" for d in date_dirs for f in self._time_files(d)}, reverse=True)
+
+    def iter_runs(self, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Iterator[Tuple[str, datetime, str, str]]:
+        start_date = start.strftime('%Y%m%d') if start else None
+        end_date = end.strftime('%Y%m%d') if end else None
+
+        for date_dir in self._date_dirs():
+            # 先按日期目录过滤，避免进入范围外的目录
+            if (start_date and date_dir < start_date) or (end_date and date_dir > end_date):
+                continue
+            for filename in self._time_files(date_dir):
+                news_path = f"{date_dir}/{time_file_stem(filename)}"
+                try:
+                    run_time = datetime.strptime(news_path, PATH_FORMAT)
+                except ValueError:
+                    continue
+                if (start and run_time < start) or (end and run_time > end):
+                    continue
+                summary = self.read_summary(news_path)
+                if summary is None:
+                    # 文件可能在遍历期间被清理任务删除
+                    continue
+                yield (news_path, run_time) + summary
+
+    @staticmethod
+    def _remove_stale_temp_files(date_path: str, cutoff_time: datetime) -> None:
+        """删除截止时间之前未完成写入的临时文件"""
+        cutoff = cutoff_time.timestamp()
+        try:
+            filenames = [f for f in os.listdir(date_path) if TEMP_FILE_PATTERN.match(f)]
+        except OSError:
+            return
+        for filename in filenames:
+            file_path = os.path.join(date_path, filename)
+            try:
+                if os.stat(file_path).st_mtime < cutoff:
+                    logger.info(f"删除遗留的临时文件: {file_path}")
+                    os.remove(file_path)
+            except OSError as e:
+                logger.error(f"删除临时文件失败 {file_path}: {e}")
+
+    def delete_before(self, cutoff_time: datetime) -> Dict[str, int]:
+        if not os.path.exists(self.news_dir):
+            raise FileNotFoundError(f"新闻目录不存在: {self.news_dir}")
+
+        deleted_files = 0
+        deleted_dirs = 0
+        for date_dir in self._date_dirs():
+            date_path = os.path.join(self.news_dir, date_dir)
+            if not os.path.isdir(date_path):
+                continue
+            logger.debug(f"检查日期目录: {date_dir}")
+
+            for filename in self._time_files(date_dir):
+                file_path = os.path.join(date_path, filename)
+                try:
+                    file_datetime = datetime.strptime(f"{date_dir}/{time_file_stem(filename)}", PATH_FORMAT)
+                except ValueError as e:
+                    logger.error(f"解析文件时间失败 {filename}: {e}")
+                    continue
+                if file_datetime < cutoff_time:
+                    logger.info(f"删除过期文件: {file_path}")
+                    os.remove(file_path)
+                    deleted_files += 1
+                else:
+                    logger.debug(f"文件未过期，保留: {file_path}")
+
+            # 崩溃时遗留的临时文件
+            self._remove_stale_temp_files(date_path, cutoff_time)
+
+            # 目录中没有新闻文件时删除（重新总结的版本由 news_backfill.prune_versions 清理后再删除目录）
+            try:
+                remaining_files = [f for f in os.listdir(date_path)
+                                   if TIME_FILE_PATTERN.match(f) or f == VERSIONS_DIR]
+                if not remaining_files:
+                    logger.info(f"删除空目录: {date_path}")
+                    os.rmdir(date_path)
+                    deleted_dirs += 1
+                else:
+                    logger.debug(f"目录非空，保留: {date_path} (剩余 {len(remaining_files)} 个文件)")
+            except OSError as e:
+                logger.error(f"删除目录失败 {date_path}: {e}")
+
+        return {'deleted_files': deleted_files, 'deleted_dirs': deleted_dirs}
+
+
+class SQLiteStorage(NewsStorage):
+    """
+    SQLite 后端（WAL 模式，抓取进程写入时Web进程可以同时读取）
+
+    runs 保存每次运行的原始总结及其格式（format: markdown / json），categories / items 保存解析后的条目，
+    按运行时间和分类建立索引
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        run_time TEXT NOT NULL,
+        content TEXT NOT NULL,
+        saved_at TEXT NOT NULL,
+        format TEXT NOT NULL DEFAULT 'markdown'
+    );
+    CREATE INDEX IF NOT EXISTS idx_runs_run_time ON runs(run_time);
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS items (
+        id INTEGER PRIMARY KEY,
+        run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+        ordinal INTEGER NOT NULL,
+        category_id INTEGER NOT NULL REFERENCES categories(id),
+        text TEXT NOT NULL,
+        highlighted INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (run_id, ordinal)
+    );
+    CREATE INDEX IF NOT EXISTS idx_items_category ON items(category_id, run_id);
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接，首次连接时建表"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL 模式下 NORMAL 已保证崩溃后数据库一致，full 策略下每次提交都刷盘
+        conn.execute('PRAGMA synchronous=' + ('FULL' if config.FSYNC_POLICY == 'full' else 'NORMAL'))
+        conn.execute('PRAGMA foreign_keys=ON')
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(self.SCHEMA)
+                self._add_format_column(conn)
+                self._schema_ready = True
+        self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _add_format_column(conn: sqlite3.Connection) -> None:
+        """旧数据库没有 format 列：补充该列，之前保存的结构化总结（JSON 对象）标记为 json"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(runs)')}
+        if 'format' in columns:
+            return
+        with conn:
+            conn.execute("ALTER TABLE runs ADD COLUMN format TEXT NOT NULL DEFAULT 'markdown'")
+            updated = conn.execute("UPDATE runs SET format = 'json' WHERE ltrim(content) LIKE '{%'").rowcount
+        logger.info(f"SQLite存储已添加 format 列，结构化总结 {updated} 条")
+
+    def _category_id(self, conn: sqlite3.Connection, name: str, cache: Dict[str, int]) -> int:
+        category_id = cache.get(name)
+        if category_id is None:
+            conn.execute('INSERT OR IGNORE INTO categories(name) VALUES (?)', (name,))
+            category_id = conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()[0]
+            cache[name] = category_id
+        return category_id
+
+    def _write(self, news_path: str, content: str, overwrite: bool, fmt: str) -> None:
+        run_time = datetime.strptime(news_path, PATH_FORMAT)
+        conn = self._connect()
+        with conn:
+            if overwrite:
+                conn.execute('DELETE FROM runs WHERE path = ?', (news_path,))
+            try:
+                run_id = conn.execute(
+                    'INSERT INTO runs(path, run_time, content, saved_at, format) VALUES (?, ?, ?, ?, ?)',
+                    (news_path, run_time.isoformat(timespec='seconds'), content,
+                     datetime.now().isoformat(timespec='seconds'), fmt)
+                ).lastrowid
+            except sqlite3.IntegrityError:
+                # path 唯一，另一次运行已保存同一秒的新闻
+                raise FileExistsError(news_path)
+            categories: Dict[str, int] = {}
+            conn.executemany(
+                'INSERT INTO items(run_id, ordinal, category_id, text, highlighted) VALUES (?, ?, ?, ?, ?)',
+                [(run_id, ordinal, self._category_id(conn, item['category'], categories), item['text'],
+                  int(item['highlighted']))
+                 for ordinal, item in enumerate(iter_items(content, fmt))]
+            )
+
+    def location(self, news_path: str) -> str:
+        return f"{self.db_path}#{news_path}"
+
+    def read_summary(self, news_path: str) -> Optional[Tuple[str, str]]:
+        row = self._connect().execute('SELECT content, format FROM runs WHERE path = ?', (news_path,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def version(self, news_path: str) -> Optional[Tuple[Any, ...]]:
+        # 行写入后不再修改，重新保存会得到新的 id
+        row = self._connect().execute('SELECT id FROM runs WHERE path = ?', (news_path,)).fetchone()
+        return (row[0],) if row else None
+
+    def list_paths(self, date: Optional[str] = None) -> List[str]:
+        conn = self._connect()
+        if date:
+            # 路径以 "YYYYMMDD/" 开头，按路径范围查询可以使用唯一索引（'0' 紧跟在 '/' 之后）
+            rows = conn.execute(
+                'SELECT path FROM runs WHERE path > ? AND path < ? ORDER BY path DESC',
+                (f"{date}/", f"{date}0")
+            )
+        else:
+            rows = conn.execute('SELECT path FROM runs ORDER BY run_time DESC')
+        return [row[0] for row in rows]
+
+    def iter_runs(self, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Iterator[Tuple[str, datetime, str, str]]:
+        query = 'SELECT path, run_time, content, format FROM runs'
+        conditions, params = [], []
+        if start:
+            conditions.append('run_time >= ?')
+            params.append(start.isoformat(timespec='seconds'))
+        if end:
+            conditions.append('run_time <= ?')
+            params.append(end.isoformat(timespec='seconds'))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY run_time'
+
+        # 游标逐行读取，不一次载入全部内容
+        for news_path, run_time, content, fmt in self._connect().execute(query, params):
+            yield news_path, datetime.fromisoformat(run_time), content, fmt
+
+    def delete_before(self, cutoff_time: datetime) -> Dict[str, int]:
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute(
+                'DELETE FROM runs WHERE run_time < ?', (cutoff_time.isoformat(timespec='seconds'),)
+            ).rowcount
+            conn.execute('DELETE FROM categories WHERE id NOT IN (SELECT DISTINCT category_id FROM items)')
+        if deleted:
+            logger.info(f"删除过期记录: {deleted} 条")
+        return {'deleted_files': deleted, 'deleted_dirs': 0}
+
+
+def create_storage(backend: Optional[str] = None) -> NewsStorage:
+    """
+    按配置创建存储后端
+
+    Args:
+        backend: 'file' 或 'sqlite'，默认为 config.STORAGE_BACKEND
+
+    Raises:
+        ValueError: 不支持的后端
+    """
+    backend = backend or config.STORAGE_BACKEND
+    if backend == 'file':
+        return FileStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(config.SQLITE_DB_PATH)
+    raise ValueError(f"不支持的存储后端: {backend}")
+
+
+# 全局存储实例
+news_storage = create_storage()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+新闻目录监视模块
+监视 news 目录的新增和删除，增量维护内存中的新闻列表，/news/list 不再每次遍历目录
+"""
+
+import bisect
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+from config import config
+from logger_config import get_logger
+from news_storage import DATE_DIR_PATTERN, TIME_FILE_PATTERN, FileStorage, NewsStorage, news_storage, time_file_stem
+
+logger = get_logger('news_watcher')
+
+
+class NewsWatcher:
+    """
+    新闻列表的内存副本
+
+    优先使用 watchdog（Linux 上基于 inotify）接收文件事件；未安装时每秒比较各日期目录的 mtime，
+    只重新读取发生变化的目录。两种方式都会定期全量核对一次，防止丢失事件。
+    """
+
+    def __init__(self, storage: NewsStorage):
+        self.storage = storage
+        self.version = 0
+        self.mode: Optional[str] = None
+        self._paths: List[str] = []  # 升序
+        self._snapshot: List[str] = []  # 降序，直接用于响应
+        self._dir_mtimes: Dict[str, int] = {}
+        self._root_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def news_dir(self) -> str:
+        return self.storage.news_dir
+
+    def start(self) -> None:
+        """全量扫描一次并开始监视"""
+        if self._thread is not None:
+            logger.warning("新闻目录监视已经启动")
+            return
+        if not isinstance(self.storage, FileStorage):
+            logger.info(f"存储后端为 {self.storage.name}，列表直接查询数据库，不启动目录监视")
+            return
+
+        self._stopping.clear()
+        self.resync()
+        self.mode = 'inotify' if self._start_observer() else 'polling'
+        interval = config.NEWS_WATCHER_RESYNC_INTERVAL if self.mode == 'inotify' else config.NEWS_WATCHER_POLL_INTERVAL
+        self._thread = threading.Thread(target=self._poll_loop, args=(interval,), name='news-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"新闻目录监视已启动: {self.news_dir}, 模式: {self.mode}, 当前 {len(self._paths)} 个文件")
+
+    def shutdown(self) -> None:
+        """停止监视"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        self._thread.join(timeout=5)
+        self._thread = None
+        logger.info("新闻目录监视已关闭")
+
+    def paths(self) -> List[str]:
+        """新闻路径列表（最新的在前，只读）"""
+        return self._snapshot
+
+    # 列表维护
+
+    def _publish(self) -> None:
+        """生成降序快照（调用方持有锁）"""
+        self._snapshot = self._paths[::-1]
+        self.version += 1
+
+    def _add(self, news_path: str) -> bool:
+        index = bisect.bisect_left(self._paths, news_path)
+        if index < len(self._paths) and self._paths[index] == news_path:
+            return False
+        self._paths.insert(index, news_path)
+        return True
+
+    def _remove(self, news_path: str) -> bool:
+        index = bisect.bisect_left(self._paths, news_path)
+        if index < len(self._paths) and self._paths[index] == news_path:
+            del self._paths[index]
+            return True
+        return False
+
+    def _news_path_of(self, file_path: str) -> Optional[str]:
+        """事件中的文件路径转换为新闻路径，非新闻文件（如临时文件）返回None"""
+        relative = os.path.relpath(file_path, self.news_dir)
+        parts = relative.split(os.sep)
+        if len(parts) == 2 and DATE_DIR_PATTERN.match(parts[0]) and TIME_FILE_PATTERN.match(parts[1]):
+            return f"{parts[0]}/{time_file_stem(parts[1])}"
+        return None
+
+    def file_created(self, file_path: str) -> None:
+        news_path = self._news_path_of(file_path)
+        if news_path is None:
+            return
+        with self._lock:
+            if self._add(news_path):
+                self._publish()
+
+    def file_deleted(self, file_path: str) -> None:
+        news_path = self._news_path_of(file_path)
+        if news_path is not None:
+            with self._lock:
+                if self._remove(news_path):
+                    self._publish()
+            return
+
+        # 整个日期目录被删除
+        date_dir = os.path.relpath(file_path, self.news_dir)
+        if DATE_DIR_PATTERN.match(date_dir):
+            self._replace_date(date_dir, set())
+
+    def _replace_date(self, date_dir: str, names: Set[str]) -> None:
+        """用目录的实际内容替换列表中该日期的条目"""
+        prefix = date_dir + '/'
+        with self._lock:
+            start = bisect.bisect_left(self._paths, prefix)
+            end = bisect.bisect_left(self._paths, date_dir + '0')
+            current = self._paths[start:end]
+            actual = sorted({prefix + time_file_stem(name) for name in names})
+            if current != actual:
+                self._paths[start:end] = actual
+                self._publish()
+
+    def resync(self) -> None:
+        """全量核对（启动时及定期执行）"""
+        paths = sorted(self.storage.list_paths())
+        with self._lock:
+            self._dir_mtimes = {}
+            self._root_mtime = None
+            if paths != self._paths:
+                self._paths = paths
+                self._publish()
+        self._poll_once()
+
+    def _poll_once(self) -> None:
+        """比较根目录和各日期目录的 mtime，只重新读取发生变化的目录"""
+        try:
+            root_mtime = os.stat(self.news_dir).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                if self._paths:
+                    self._paths = []
+                    self._publish()
+            self._dir_mtimes = {}
+            return
+
+        if root_mtime != self._root_mtime:
+            date_dirs = {d for d in os.listdir(self.news_dir) if DATE_DIR_PATTERN.match(d)}
+            for removed in set(self._dir_mtimes) - date_dirs:
+                self._dir_mtimes.pop(removed, None)
+                self._replace_date(removed, set())
+            for added in date_dirs - set(self._dir_mtimes):
+                self._dir_mtimes[added] = -1
+            self._root_mtime = root_mtime
+
+        for date_dir, known_mtime in list(self._dir_mtimes.items()):
+            date_path = os.path.join(self.news_dir, date_dir)
+            try:
+                mtime = os.stat(date_path).st_mtime_ns
+                if mtime == known_mtime:
+                    continue
+                names = {f for f in os.listdir(date_path) if TIME_FILE_PATTERN.match(f)}
+            except (FileNotFoundError, NotADirectoryError):
+                self._dir_mtimes.pop(date_dir, None)
+                self._replace_date(date_dir, set())
+                continue
+            self._dir_mtimes[date_dir] = mtime
+            self._replace_date(date_dir, names)
+
+    def _poll_loop(self, interval: float) -> None:
+        while not self._stopping.wait(interval):
+            try:
+                self._poll_once()
+            except Exception as e:
+                logger.error(f"检查新闻目录失败: {e}")
+
+    def _start_observer(self) -> bool:
+        """启动 watchdog 监视，未安装或启动失败时返回False"""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.info("未安装 watchdog，使用 mtime 轮询监视新闻目录")
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.file_created(event.src_path)
+
+            def on_deleted(self, event):
+                watcher.file_deleted(event.src_path)
+
+            def on_moved(self, event):
+                # 原子保存时临时文件被重命名为新闻文件
+                watcher.file_deleted(event.src_path)
+                if not event.is_directory:
+                    watcher.file_created(event.dest_path)
+
+        try:
+            os.makedirs(self.news_dir, exist_ok=True)
+            observer = Observer()
+            observer.schedule(Handler(), self.news_dir, recursive=True)
+            observer.start()
+        except Exception as e:
+            logger.warning(f"启动 watchdog 失败，改用 mtime 轮询: {e}")
+            return False
+        self._observer = observer
+        return True
+
+    def get_status(self) -> Dict[str, object]:
+        return {'running': self.running, 'mode': self.mode, 'files': len(self._snapshot), 'version': self.version}
+
+
+# 全局新闻目录监视实例
+news_watcher = NewsWatcher(news_storage)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抓取任务执行进程
+从任务队列领取抓取任务并执行，与Web进程分离；可在同一台或多台机器上启动多个实例
+
+用法:
+    python3 news_worker.py                  # 持续运行
+    python3 news_worker.py --once           # 处理完当前可执行的任务后退出
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from config import config
+from job_queue import JobQueue, get_job_queue
+from logger_config import get_logger
+
+logger = get_logger('news_worker')
+
+
+def run_news_job(job: Dict[str, Any]) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+    """
+    执行抓取任务
+
+    payload 中的 source 通过 NEWS_SOURCE_URL 传给抓取脚本；运行ID固定为 job-<任务ID>，
+    任务重试时抓取脚本从上次失败的阶段继续
+    """
+    from news_fetcher import news_fetcher
+
+    env = {'NEWS_RUN_ID': f"job-{job['id']}"}
+    source = job['payload'].get('source')
+    if source:
+        env['NEWS_SOURCE_URL'] = source
+    success, output, error = news_fetcher.run_news_script(env)
+    # 指定运行ID时抓取脚本不会因退避而跳过，success 只会是 True/False
+    return bool(success), {'output': (output or '')[-2000:]}, error
+
+
+# 任务类型 -> 处理函数，返回 (是否成功, 结果, 错误信息)
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Tuple[bool, Dict[str, Any], Optional[str]]]] = {
+    'news': run_news_job,
+}
+
+
+class NewsWorker:
+    """任务执行器：领取任务、执行期间定期续约、结束后提交结果"""
+
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None, kinds: Sequence[str] = ('news',),
+                 lease_seconds: Optional[float] = None, poll_interval: Optional[float] = None):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.kinds = tuple(kinds)
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.poll_interval = poll_interval if poll_interval is not None else config.WORKER_POLL_INTERVAL
+        self.processed = 0
+        self.failed = 0
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        """当前任务完成后退出"""
+        self._stopping.set()
+
+    def run(self, once: bool = False) -> None:
+        """
+        主循环
+
+        Args:
+            once: 没有可执行的任务时立即退出，而不是继续等待
+        """
+        logger.info(f"worker {self.worker_id} 启动，任务类型: {', '.join(self.kinds)}，租约 {self.lease_seconds} 秒")
+        while not self._stopping.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, self.kinds, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"领取任务失败: {e}")
+                job = None
+            if job is None:
+                if once:
+                    break
+                self._stopping.wait(self.poll_interval)
+                continue
+            self.process(job)
+        logger.info(f"worker {self.worker_id} 退出，完成 {self.processed} 个任务，失败 {self.failed} 次")
+
+    def process(self, job: Dict[str, Any]) -> bool:
+        """执行一个已领取的任务"""
+        logger.info(f"开始执行任务 #{job['id']} ({job['kind']})，第 {job['attempts']}/{job['max_attempts']} 次尝试")
+        lease_lost = threading.Event()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(job['id'], done, lease_lost),
+                                     name=f"heartbeat-{job['id']}", daemon=True)
+        heartbeat.start()
+        try:
+            handler = HANDLERS.get(job['kind'])
+            if handler is None:
+                success, result, error = False, {}, f"未知的任务类型: {job['kind']}"
+            else:
+                success, result, error = handler(job)
+        except Exception as e:
+            success, result, error = False, {}, f"任务执行时发生错误: {e}"
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if lease_lost.is_set():
+            logger.warning(f"任务 #{job['id']} 的租约已被其他 worker 接管，放弃提交结果")
+            return False
+        try:
+            if success:
+                self.queue.complete(job['id'], self.worker_id, result)
+                self.processed += 1
+                logger.info(f"任务 #{job['id']} 执行成功")
+            else:
+                self.queue.fail(job['id'], self.worker_id, error or '未知错误')
+                self.failed += 1
+                logger.error(f"任务 #{job['id']} 执行失败: {error}")
+        except Exception as e:
+            logger.error(f"提交任务 #{job['id']} 结果失败: {e}")
+        return success
+
+    def _heartbeat_loop(self, job_id: int, done: threading.Event, lease_lost: threading.Event) -> None:
+        """每 1/3 租约时长续约一次"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                    lease_lost.set()
+                    return
+            except Exception as e:
+                logger.error(f"任务 #{job_id} 续约失败: {e}")
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """主函数，用于命令行执行"""
+    parser = argparse.ArgumentParser(description='从任务队列领取并执行新闻抓取任务')
+    parser.add_argument('--worker-id', help='worker 标识，默认 主机名-进程号')
+    parser.add_argument('--kinds', default='news', help='处理的任务类型，逗号分隔，默认 news')
+    parser.add_argument('--lease', type=float, help=f'租约时长（秒），默认 {config.JOB_LEASE_SECONDS}')
+    parser.add_argument('--poll', type=float, help=f'没有任务时的轮询间隔（秒），默认 {config.WORKER_POLL_INTERVAL}')
+    parser.add_argument('--once', action='store_true', help='处理完当前可执行的任务后退出')
+    args = parser.parse_args(argv)
+
+    config.ensure_dirs()
+    worker = NewsWorker(get_job_queue(), args.worker_id, args.kinds.split(','), args.lease, args.poll)
+
+    def signal_handler(signum, frame):
+        logger.info(f"收到信号 {signum}，当前任务完成后退出")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    worker.run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()
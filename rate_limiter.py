@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求限流模块
+按客户端和接口的令牌桶限制请求频率，并限制耗时任务的并发数，超出时快速返回429/503
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from config import config
+from logger_config import get_logger
+
+logger = get_logger('rate_limiter')
+
+
+class RateStore:
+    """令牌桶存储接口"""
+
+    name = 'base'
+
+    def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        从令牌桶中取出 cost 个令牌
+
+        Args:
+            key: 令牌桶标识
+            rate: 每秒补充的令牌数
+            burst: 令牌桶容量
+            cost: 本次消耗的令牌数
+
+        Returns:
+            Tuple[bool, float]: (是否允许, 被拒绝时距离可用还需等待的秒数)
+        """
+        raise NotImplementedError
+
+    def refund(self, key: str, rate: float, burst: int, cost: float = 1.0) -> None:
+        """退还 take 取出的令牌（后续检查未通过、请求没有实际执行时），不超过令牌桶容量"""
+        raise NotImplementedError
+
+    def wait(self, key: str, rate: float, burst: int, cost: float = 1.0,
+             timeout: Optional[float] = None) -> bool:
+        """
+        阻塞等待直到取得令牌（用于后台批量任务的出站请求限速）
+
+        Returns:
+            bool: 是否在超时前取得令牌
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            allowed, retry_after = self.take(key, rate, burst, cost)
+            if allowed:
+                return True
+            if deadline is not None and time.monotonic() + retry_after > deadline:
+                return False
+            time.sleep(min(retry_after, 5.0))
+
+    @staticmethod
+    def _refill(tokens: float, updated: float, now: float, rate: float, burst: int) -> float:
+        return min(float(burst), tokens + max(0.0, now - updated) * rate)
+
+    @staticmethod
+    def _retry_after(tokens: float, rate: float, cost: float) -> float:
+        return (cost - tokens) / rate if rate > 0 else math.inf
+
+
+class MemoryRateStore(RateStore):
+    """进程内令牌桶，桶数量有上限，最久未使用的先淘汰"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens = self._refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else self._retry_after(tokens, rate, cost)
+
+    def refund(self, key: str, rate: float, burst: int, cost: float = 1.0) -> None:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets[key] = (min(float(burst), self._refill(*bucket, now, rate, burst) + cost), now)
+
+
+class SQLiteRateStore(RateStore):
+    """
+    SQLite 令牌桶，多个 worker 进程共享同一份计数
+
+    每次取令牌在一个 IMMEDIATE 事务中完成读-改-写；使用墙上时钟，各进程的时间基准一致
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # 计数丢失只会短暂放宽限流
+            conn.execute(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = self._refill(row[0], row[1], now, rate, burst) if row else float(burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0.0 if allowed else self._retry_after(tokens, rate, cost)
+
+    def refund(self, key: str, rate: float, burst: int, cost: float = 1.0) -> None:
+        now = time.time()
+        self._connect().execute(
+            'UPDATE buckets SET tokens = MIN(?, tokens + MAX(0, ? - updated) * ? + ?), updated = ? WHERE key = ?',
+            (float(burst), now, rate, cost, now, key)
+        )
+
+    def prune(self, max_idle: float = 3600) -> int:
+        """删除长时间未使用的令牌桶（此时桶已补满，删除不影响限流）"""
+        conn = self._connect()
+        return conn.execute('DELETE FROM buckets WHERE updated < ?', (time.time() - max_idle,)).rowcount
+
+
+class ResourceBusy(Exception):
+    """并发数已满"""
+
+    def __init__(self, name: str, limit: int):
+        super().__init__(f"{name} 已有 {limit} 个任务在执行或排队")
+        self.name = name
+        self.limit = limit
+
+
+class ConcurrencyLimiter:
+    """
+    并发上限
+
+    非阻塞获取：已满时立即抛出 ResourceBusy，而不是排队等待占用请求线程。
+    acquire 和 release 可以在不同线程中调用（入队时获取，后台任务结束时释放）
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                raise ResourceBusy(self.name, self.limit)
+            self.active += 1
+
+    def reserve(self) -> None:
+        """不检查上限直接占用名额（恢复重启前已排队的任务）"""
+        with self._lock:
+            self.active += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def get_status(self) -> dict:
+        return {'active': self.active, 'limit': self.limit, 'rejected': self.rejected}
+
+
+def create_rate_store(backend: Optional[str] = None) -> RateStore:
+    """按配置创建令牌桶存储"""
+    backend = backend or config.RATE_LIMIT_STORE
+    if backend == 'sqlite':
+        return SQLiteRateStore(config.RATE_LIMIT_DB_PATH)
+    if backend != 'memory':
+        logger.warning(f"未知的限流存储 {backend}，使用进程内存储")
+    return MemoryRateStore()
+
+
+class RateLimiter:
+    """接口限流器"""
+
+    def __init__(self, store: Optional[RateStore] = None):
+        self._store = store
+        self.rejected = 0
+        self.errors = 0
+
+    @property
+    def store(self) -> RateStore:
+        """首次使用时才创建（sqlite 存储需要 data 目录）"""
+        if self._store is None:
+            self._store = create_rate_store()
+        return self._store
+
+    def check(self, endpoint: str, client: Optional[str], per_minute: float, burst: int) -> Tuple[bool, float]:
+        """
+        检查单个客户端和接口整体两个令牌桶
+
+        先取客户端的令牌，单个客户端的超频请求不消耗接口整体的额度；接口整体已满时退还客户端的令牌。
+        接口整体的令牌桶容量和速率是单个客户端的 RATE_LIMIT_GLOBAL_FACTOR 倍，防止换IP的爬虫绕过限制
+
+        Returns:
+            Tuple[bool, float]: (是否允许, 建议的重试等待秒数)
+        """
+        if not config.RATE_LIMIT_ENABLED or per_minute <= 0:
+            return True, 0.0
+        rate = per_minute / 60.0
+        factor = config.RATE_LIMIT_GLOBAL_FACTOR
+        client_key = f"{endpoint}|{client or '-'}"
+        try:
+            allowed, retry_after = self.store.take(client_key, rate, burst)
+            if allowed and factor > 0:
+                allowed, retry_after = self.store.take(f"{endpoint}|*", rate * factor, burst * factor)
+                if not allowed:
+                    # 接口整体已满时请求不会执行，退还客户端的令牌，不因别人的流量扣减自己的额度
+                    self.store.refund(client_key, rate, burst)
+        except Exception as e:
+            # 限流存储故障时放行，避免限流器本身造成服务不可用
+            self.errors += 1
+            logger.error(f"限流检查失败，本次放行: {e}")
+            return True, 0.0
+        if not allowed:
+            self.rejected += 1
+        return allowed, retry_after
+
+    def limit(self, endpoint: str, per_minute: float, burst: int, client_of: Callable[[], Optional[str]]):
+        """
+        视图装饰器：超出频率时返回429和 Retry-After 头
+
+        Args:
+            endpoint: 接口名称
+            per_minute: 每个客户端每分钟允许的请求数
+            burst: 允许的突发请求数
+            client_of: 返回当前客户端标识的函数
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                client = client_of()
+                allowed, retry_after = self.check(endpoint, client, per_minute, burst)
+                if not allowed:
+                    from security_utils import security_validator
+                    security_validator.log_throttle.warning(logger, client, f"请求过于频繁: {endpoint}")
+                    return too_many_requests(retry_after)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def get_status(self) -> dict:
+        return {
+            'enabled': config.RATE_LIMIT_ENABLED,
+            'store': self._store.name if self._store else config.RATE_LIMIT_STORE,
+            'rejected': self.rejected,
+            'errors': self.errors
+        }
+
+
+def _retry_header(retry_after: float) -> str:
+    return str(max(1, math.ceil(min(retry_after, 3600))))
+
+
+def too_many_requests(retry_after: float):
+    """429 响应（不经过错误处理器，避免额外开销）"""
+    from flask import jsonify
+    response = jsonify({'success': False, 'error': '请求过于频繁，请稍后再试'})
+    response.status_code = 429
+    response.headers['Retry-After'] = _retry_header(retry_after)
+    return response
+
+
+def service_busy(error: ResourceBusy, retry_after: float = 30):
+    """503 响应：任务并发数已满"""
+    from flask import jsonify
+    response = jsonify({'success': False, 'error': f"服务繁忙: {error}"})
+    response.status_code = 503
+    response.headers['Retry-After'] = _retry_header(retry_after)
+    return response
+
+
+# 全局接口限流器实例
+rate_limiter = RateLimiter()
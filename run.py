@@ -13,6 +13,8 @@ from contextlib import contextmanager
 from config import config
 from logger_config import get_logger
 from scheduler_manager import scheduler_manager
+from news_alerts import alert_dispatcher
+from news_watcher import news_watcher
 from app import create_app
 
 logger = get_logger('main')
@@ -24,6 +26,8 @@ def graceful_shutdown():
     def signal_handler(signum, frame):
         logger.info(f"收到信号 {signum}，正在优雅关闭...")
         scheduler_manager.shutdown()
+        alert_dispatcher.shutdown()
+        news_watcher.shutdown()
         sys.exit(0)
 
     # 注册信号处理器
@@ -34,6 +38,8 @@ def graceful_shutdown():
         yield
     finally:
         scheduler_manager.shutdown()
+        alert_dispatcher.shutdown()
+        news_watcher.shutdown()
 
 
 def print_startup_banner():
@@ -82,9 +88,15 @@ def main():
             # 初始化调度器
             initialize_scheduler()
 
+            # 启动关键词提醒投递
+            alert_dispatcher.start()
+
             # 创建Flask应用
             app = create_app()
 
+            # 监视新闻目录，/news/list 直接使用内存中的列表
+            news_watcher.start()
+
             # 打印启动信息
             print_startup_banner()
 
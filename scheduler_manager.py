@@ -6,31 +6,75 @@
 负责定时任务的管理和执行
 """
 
-from datetime import datetime
-from typing import List, Dict, Any
-
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
 
 from config import config
 from logger_config import get_logger
-from news_fetcher import news_fetcher
+from rate_limiter import ConcurrencyLimiter, ResourceBusy
 
 logger = get_logger('scheduler')
 
+# 周期任务ID：重启时错过的执行按类型合并为一次补跑
+NEWS_JOB_IDS = ('hourly_news_fetch', 'night_news_fetch')
+CLEANUP_JOB_IDS = ('daily_news_cleanup',)
+# 手动任务ID前缀（补跑任务也按手动任务处理，占用并发名额）
+MANUAL_NEWS_PREFIXES = ('manual_run_', 'catchup_run_')
+MANUAL_CLEANUP_PREFIXES = ('manual_cleanup_', 'catchup_cleanup_')
+
+
+class SchedulerNotRunning(Exception):
+    """调度器未运行，手动任务无法执行"""
+
+    def __init__(self):
+        super().__init__("调度器未运行，无法执行手动任务")
+
 
 class SchedulerManager:
     """调度器管理器"""
 
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
+        self._scheduler = None
         self._is_started = False
+        # 抓取和清理任务的并发上限：手动任务在入队时占用名额，定时任务在执行时占用
+        self.news_slots = ConcurrencyLimiter('新闻抓取', config.NEWS_TASK_MAX_CONCURRENT)
+        self.cleanup_slots = ConcurrencyLimiter('新闻清理', config.CLEANUP_TASK_MAX_CONCURRENT)
+        self.last_cleanup: Optional[Dict[str, Any]] = None
+        self.last_catchup: Optional[Dict[str, Any]] = None
+        self._jobstore = None
+        self._news_failures = 0
+
+    @property
+    def scheduler(self):
+        """APScheduler 调度器，首次使用时才创建（避免导入时加载 apscheduler）"""
+        if self._scheduler is None:
+            from apscheduler.schedulers.background import BackgroundScheduler
+
+            jobstores = {}
+            if config.SCHEDULER_JOBSTORE == 'sqlite':
+                from scheduler_store import SQLiteJobStore
+                os.makedirs(os.path.dirname(config.SCHEDULER_DB_PATH), exist_ok=True)
+                self._jobstore = SQLiteJobStore(config.SCHEDULER_DB_PATH)
+                jobstores['default'] = self._jobstore
+            self._scheduler = BackgroundScheduler(
+                jobstores=jobstores,
+                job_defaults={
+                    'coalesce': config.SCHEDULER_COALESCE,
+                    'misfire_grace_time': config.SCHEDULER_MISFIRE_GRACE_TIME,
+                    'max_instances': 1
+                }
+            )
+        return self._scheduler
 
     def start(self) -> None:
         """启动调度器"""
         try:
             if not self._is_started:
-                self.scheduler.start()
+                scheduler = self.scheduler
+                if self._jobstore is not None:
+                    self._recover_jobs()
+                scheduler.start()
                 self._is_started = True
                 logger.info("定时调度器启动成功")
             else:
@@ -54,10 +98,12 @@ class SchedulerManager:
 
     def add_hourly_news_job(self) -> None:
         """添加智能新闻抓取任务"""
+        from apscheduler.triggers.cron import CronTrigger
+
         try:
             # 白天时间段每小时执行一次
             self.scheduler.add_job(
-                func=self._run_news_task,
+                func=run_scheduled_news_job,
                 trigger=CronTrigger(hour=config.DAY_HOURS, minute=config.CRON_MINUTE),
                 id='hourly_news_fetch',
                 name='白天新闻抓取任务（每小时）',
@@ -66,7 +112,7 @@ class SchedulerManager:
 
             # 夜间时间段每3小时执行一次
             self.scheduler.add_job(
-                func=self._run_news_task,
+                func=run_scheduled_news_job,
                 trigger=CronTrigger(hour=config.NIGHT_HOURS, minute=config.CRON_MINUTE),
                 id='night_news_fetch',
                 name='夜间新闻抓取任务（每3小时）',
@@ -80,9 +126,11 @@ class SchedulerManager:
 
     def add_daily_cleanup_job(self):
         """添加每日新闻清理任务"""
+        from apscheduler.triggers.cron import CronTrigger
+
         try:
             self.scheduler.add_job(
-                func=self._run_cleanup_script,
+                func=run_scheduled_cleanup_job,
                 trigger=CronTrigger(hour=2, minute=0),  # 每天凌晨2点执行
                 id='daily_news_cleanup',
                 name='每日新闻清理任务',
@@ -95,6 +143,7 @@ class SchedulerManager:
 
     def _run_cleanup_script(self):
         """执行新闻清理脚本"""
+        started_at = datetime.now().isoformat()
         try:
             logger.info("开始执行新闻清理任务")
             from news_cleaner import clean_old_news
@@ -105,28 +154,152 @@ class SchedulerManager:
                 logger.error(f"新闻清理失败：{result['error']}")
         except Exception as e:
             logger.error(f"执行新闻清理脚本失败: {e}")
+            result = {'success': False, 'error': str(e)}
+        self.last_cleanup = {'started_at': started_at, 'finished_at': datetime.now().isoformat(), **result}
 
-    def add_manual_job(self) -> str:
+    def _run_scheduled_news_task(self) -> None:
+        """定时抓取：已有抓取任务在执行或排队时跳过本次"""
+        self._run_with_slot(self.news_slots, self._run_news_task)
+
+    def _run_scheduled_cleanup(self) -> None:
+        """定时清理：已有清理任务在执行或排队时跳过本次"""
+        self._run_with_slot(self.cleanup_slots, self._run_cleanup_script)
+
+    @staticmethod
+    def _run_with_slot(slots: ConcurrencyLimiter, func: Callable[[], None]) -> None:
+        try:
+            slots.acquire()
+        except ResourceBusy as e:
+            logger.warning(f"跳过定时任务: {e}")
+            return
+        try:
+            func()
+        finally:
+            slots.release()
+
+    def _add_manual(self, prefix: str, slots: ConcurrencyLimiter, func: Callable[[], None],
+                    require_running: bool = True) -> str:
         """
-        添加手动执行任务
+        占用一个并发名额后把任务交给后台调度器，名额已满时抛出 ResourceBusy
+
+        调度器未运行时任务不会执行，名额也不会释放，因此先检查调度器状态，未运行时抛出 SchedulerNotRunning
+
+        Args:
+            prefix: 任务ID前缀
+            slots: 并发名额
+            func: 模块级任务函数（持久化存储只能保存函数引用），执行结束后释放名额
+            require_running: 是否要求调度器运行中；启动前补跑的任务在调度器启动后执行，不检查
 
         Returns:
             str: 任务ID
         """
+        if require_running and not self.is_running():
+            raise SchedulerNotRunning()
+        slots.acquire()
         try:
-            job_id = f'manual_run_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+            job_id = f'{prefix}{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}'
             self.scheduler.add_job(
-                func=self._run_news_task,
+                func=func,
                 trigger='date',
                 run_date=datetime.now(),
-                id=job_id
+                id=job_id,
+                misfire_grace_time=None  # 重启后仍然执行
             )
+        except Exception:
+            slots.release()
+            raise
+        return job_id
+
+    def _recover_jobs(self) -> None:
+        """
+        启动前处理持久化存储中的任务
+
+        - 排队中的手动任务保留，并重新占用并发名额
+        - 周期任务错过的执行按 SCHEDULER_CATCHUP 处理：'once' 时每类任务只补跑一次（已有排队的手动任务时不再补跑），
+          'skip' 时直接跳过；随后周期任务按当前时间重新计算下次执行时间
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            pending = [job_id for job_id, _ in self._jobstore.pending()]
+            missed = dict(self._jobstore.pop_missed(list(NEWS_JOB_IDS + CLEANUP_JOB_IDS), now))
+        except Exception as e:
+            logger.error(f"读取持久化的调度任务失败: {e}")
+            return
+
+        grace = config.SCHEDULER_MISFIRE_GRACE_TIME
+        catchup = {}
+        for kind, job_ids, prefixes, slots, func in (
+                ('news', NEWS_JOB_IDS, MANUAL_NEWS_PREFIXES, self.news_slots, run_manual_news_job),
+                ('cleanup', CLEANUP_JOB_IDS, MANUAL_CLEANUP_PREFIXES, self.cleanup_slots, run_manual_cleanup_job)):
+            queued = [job_id for job_id in pending if job_id.startswith(prefixes)]
+            for _ in queued:
+                slots.reserve()
+            missed_times = [missed[job_id] for job_id in job_ids if job_id in missed]
+            if not missed_times:
+                continue
+            latest = max(missed_times)
+            if queued:
+                logger.info(f"错过的{slots.name}任务与排队中的手动任务合并: {queued}")
+                catchup[kind] = queued[0]
+            elif config.SCHEDULER_CATCHUP != 'once':
+                logger.info(f"跳过错过的{slots.name}任务（最近一次应在 {latest.isoformat()} 执行）")
+            elif grace is not None and now - latest > timedelta(seconds=grace):
+                logger.info(f"错过的{slots.name}任务已超过 {grace} 秒，不再补跑")
+            else:
+                catchup[kind] = self._add_manual(prefixes[1], slots, func, require_running=False)
+                logger.info(f"补跑错过的{slots.name}任务（最近一次应在 {latest.isoformat()} 执行）: {catchup[kind]}")
+
+        self.last_catchup = {
+            'checked_at': now.isoformat(),
+            'missed': {job_id: run_time.isoformat() for job_id, run_time in missed.items()},
+            'queued_manual_jobs': [job_id for job_id in pending if job_id.startswith(MANUAL_NEWS_PREFIXES + MANUAL_CLEANUP_PREFIXES)],
+            'catchup_jobs': catchup
+        }
+
+    def add_manual_job(self) -> str:
+        """
+        添加手动执行任务
+
+        Returns:
+            str: 任务ID
+
+        Raises:
+            ResourceBusy: 已有抓取任务在执行或排队
+            SchedulerNotRunning: 调度器未运行
+        """
+        try:
+            if config.FETCH_MODE == 'queue':
+                return self._enqueue_manual_news()
+            job_id = self._add_manual(MANUAL_NEWS_PREFIXES[0], self.news_slots, run_manual_news_job)
             logger.info(f"手动执行任务已添加到队列，任务ID: {job_id}")
             return job_id
+        except (ResourceBusy, SchedulerNotRunning):
+            raise
         except Exception as e:
             logger.error(f"添加手动执行任务时发生错误: {e}")
             raise
 
+    def add_manual_cleanup_job(self) -> str:
+        """
+        添加手动清理任务（在后台执行，请求立即返回）
+
+        Returns:
+            str: 任务ID
+
+        Raises:
+            ResourceBusy: 已有清理任务在执行或排队
+            SchedulerNotRunning: 调度器未运行
+        """
+        try:
+            job_id = self._add_manual(MANUAL_CLEANUP_PREFIXES[0], self.cleanup_slots, run_manual_cleanup_job)
+            logger.info(f"手动清理任务已添加到队列，任务ID: {job_id}")
+            return job_id
+        except (ResourceBusy, SchedulerNotRunning):
+            raise
+        except Exception as e:
+            logger.error(f"添加手动清理任务时发生错误: {e}")
+            raise
+
     def get_jobs_info(self) -> List[Dict[str, Any]]:
         """
         获取所有任务信息
@@ -134,6 +307,9 @@ class SchedulerManager:
         Returns:
             List[Dict[str, Any]]: 任务信息列表
         """
+        if self._scheduler is None:
+            return []
+
         try:
             jobs = []
             for job in self.scheduler.get_jobs():
@@ -161,7 +337,11 @@ class SchedulerManager:
             status = {
                 'scheduler_running': self.is_running(),
                 'jobs_count': len(jobs),
-                'jobs': jobs
+                'jobs': jobs,
+                'task_slots': {'news': self.news_slots.get_status(), 'cleanup': self.cleanup_slots.get_status()},
+                'last_cleanup': self.last_cleanup,
+                'jobstore': config.SCHEDULER_JOBSTORE,
+                'last_catchup': self.last_catchup
             }
             logger.info(f"调度器状态: 运行中={status['scheduler_running']}, 任务数={status['jobs_count']}")
             return status
@@ -176,19 +356,129 @@ class SchedulerManager:
 
     def is_running(self) -> bool:
         """检查调度器是否运行中"""
-        return self._is_started and self.scheduler.running
+        return self._is_started and self._scheduler is not None and self._scheduler.running
+
+    def enqueue_news(self, reason: str) -> List[int]:
+        """
+        把抓取任务写入任务队列（queue 模式），每个新闻来源一个任务
+
+        同一来源已有排队中的任务时不重复写入
+
+        Returns:
+            List[int]: 队列任务ID
+
+        Raises:
+            QueueFull: 排队任务数已达上限
+        """
+        from job_queue import get_job_queue
+
+        queue = get_job_queue()
+        job_ids = []
+        for source in config.NEWS_SOURCES or (None,):
+            job_id, created = queue.enqueue('news', {'source': source, 'reason': reason},
+                                            dedupe_key=f"news:{source or 'default'}")
+            job_ids.append(job_id)
+            if created:
+                logger.info(f"抓取任务已写入队列: #{job_id} 来源={source or '默认'} 原因={reason}")
+            else:
+                logger.info(f"来源 {source or '默认'} 已有排队中的抓取任务 #{job_id}")
+        return job_ids
+
+    def _enqueue_manual_news(self) -> str:
+        from job_queue import QueueFull
+
+        try:
+            job_ids = self.enqueue_news('manual')
+        except QueueFull:
+            raise ResourceBusy('任务队列', config.JOB_MAX_PENDING)
+        return ','.join(f'job_{job_id}' for job_id in job_ids)
 
     def _run_news_task(self) -> None:
-        """执行新闻抓取任务"""
+        """执行新闻抓取任务（queue 模式下只写入任务队列）"""
+        from news_fetcher import news_fetcher
+
+        if config.FETCH_MODE == 'queue':
+            try:
+                self.enqueue_news('scheduled')
+            except Exception as e:
+                logger.error(f"写入抓取任务失败: {e}")
+            return
+
         try:
             success, output, error = news_fetcher.run_news_script()
-            if success:
+            if success is None:
+                # 退避中未执行：不算成功也不算失败，上次失败时已安排重试
+                logger.info(f"定时新闻抓取任务跳过: {error}")
+            elif success:
                 logger.info("定时新闻抓取任务执行成功")
+                self._news_failures = 0
+                self._notify_alerts()
             else:
                 logger.error(f"定时新闻抓取任务执行失败: {error}")
+                self._schedule_retry()
         except Exception as e:
             logger.error(f"执行新闻抓取任务时发生未预期错误: {e}")
 
+    def _schedule_retry(self) -> None:
+        """
+        抓取失败后按退避时间安排重试；抓取脚本会从上次失败的阶段继续（见 news_pipeline）
+
+        连续失败 PIPELINE_MAX_ATTEMPTS 次后不再安排，等待下一次定时任务
+        """
+        self._news_failures += 1
+        if self._news_failures >= config.PIPELINE_MAX_ATTEMPTS:
+            logger.error(f"抓取已连续失败 {self._news_failures} 次，不再重试，等待下一次定时任务")
+            self._news_failures = 0
+            return
+        # 比抓取脚本记录的退避时间多等1秒，保证重试时可以继续上次的运行
+        delay = config.PIPELINE_RETRY_BASE_SECONDS * 2 ** (self._news_failures - 1) + 1
+        try:
+            run_date = datetime.now() + timedelta(seconds=delay)
+            self.scheduler.add_job(
+                func=run_scheduled_news_job,
+                trigger='date',
+                run_date=run_date,
+                id=f'retry_run_{run_date.strftime("%Y%m%d_%H%M%S_%f")}',
+                misfire_grace_time=None
+            )
+            logger.info(f"抓取失败，{delay} 秒后重试（第 {self._news_failures + 1} 次尝试）")
+        except Exception as e:
+            logger.error(f"安排抓取重试失败: {e}")
+
+    def _notify_alerts(self) -> None:
+        """唤醒提醒投递器（只设置事件，不等待投递）"""
+        try:
+            from news_alerts import alert_dispatcher
+            alert_dispatcher.notify()
+        except Exception as e:
+            logger.error(f"通知提醒投递器失败: {e}")
+
 
 # 全局调度器管理器实例
-scheduler_manager = SchedulerManager()
\ No newline at end of file
+scheduler_manager = SchedulerManager()
+
+
+# 任务函数（模块级函数，持久化存储按 "模块:函数名" 保存引用）
+
+def run_scheduled_news_job() -> None:
+    scheduler_manager._run_scheduled_news_task()
+
+
+def run_scheduled_cleanup_job() -> None:
+    scheduler_manager._run_scheduled_cleanup()
+
+
+def run_manual_news_job() -> None:
+    """手动或补跑的抓取任务，入队时已占用名额"""
+    try:
+        scheduler_manager._run_news_task()
+    finally:
+        scheduler_manager.news_slots.release()
+
+
+def run_manual_cleanup_job() -> None:
+    """手动或补跑的清理任务，入队时已占用名额"""
+    try:
+        scheduler_manager._run_cleanup_script()
+    finally:
+        scheduler_manager.cleanup_slots.release()
\ No newline at end of file
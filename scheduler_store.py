@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+调度任务持久化模块
+APScheduler 的 SQLite 任务存储（不依赖 SQLAlchemy），重启后保留定时任务的下次执行时间和排队中的手动任务
+"""
+
+import pickle
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from config import config
+from logger_config import get_logger
+
+logger = get_logger('scheduler')
+
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    SQLite 任务存储
+
+    表结构与 APScheduler 自带的 SQLAlchemyJobStore 相同：id、next_run_time（UTC时间戳）、pickle 后的任务状态
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS apscheduler_jobs (
+        id TEXT PRIMARY KEY,
+        next_run_time REAL,
+        job_state BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_apscheduler_jobs_next_run_time ON apscheduler_jobs (next_run_time);
+    """
+
+    def __init__(self, db_path: str, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.db_path = db_path
+        self.pickle_protocol = pickle_protocol
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        self._connect()
+
+    def lookup_job(self, job_id):
+        row = self._connect().execute('SELECT job_state FROM apscheduler_jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs('WHERE next_run_time <= ?', (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = self._connect().execute(
+            'SELECT next_run_time FROM apscheduler_jobs WHERE next_run_time IS NOT NULL '
+            'ORDER BY next_run_time LIMIT 1'
+        ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            self._connect().execute(
+                'INSERT INTO apscheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)',
+                (job.id, datetime_to_utc_timestamp(job.next_run_time), self._dump(job))
+            )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        cursor = self._connect().execute(
+            'UPDATE apscheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?',
+            (datetime_to_utc_timestamp(job.next_run_time), self._dump(job), job.id)
+        )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        cursor = self._connect().execute('DELETE FROM apscheduler_jobs WHERE id = ?', (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        self._connect().execute('DELETE FROM apscheduler_jobs')
+
+    def shutdown(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # 启动前检查（不需要调度器，不反序列化任务）
+
+    def pending(self) -> List[Tuple[str, Optional[datetime]]]:
+        """已保存的全部任务ID及下次执行时间（UTC）"""
+        rows = self._connect().execute('SELECT id, next_run_time FROM apscheduler_jobs ORDER BY next_run_time')
+        return [(job_id, utc_timestamp_to_datetime(ts) if ts is not None else None) for job_id, ts in rows]
+
+    def pop_missed(self, job_ids: List[str], now: datetime) -> List[Tuple[str, datetime]]:
+        """
+        取出并删除下次执行时间已过的指定任务
+
+        用于周期任务：错过的执行由调用方合并为一次补跑，随后重新添加任务时从当前时间开始计算
+        """
+        conn = self._connect()
+        timestamp = datetime_to_utc_timestamp(now)
+        placeholders = ','.join('?' * len(job_ids))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f'SELECT id, next_run_time FROM apscheduler_jobs WHERE id IN ({placeholders}) AND next_run_time <= ?',
+                (*job_ids, timestamp)
+            ).fetchall()
+            conn.executemany('DELETE FROM apscheduler_jobs WHERE id = ?', [(row[0],) for row in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [(job_id, utc_timestamp_to_datetime(ts)) for job_id, ts in rows]
+
+    def _dump(self, job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = '', params: tuple = ()):
+        conn = self._connect()
+        jobs = []
+        failed_job_ids = []
+        for job_id, job_state in conn.execute(
+                f'SELECT id, job_state FROM apscheduler_jobs {where} ORDER BY next_run_time', params).fetchall():
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                logger.exception(f"无法恢复调度任务 {job_id}，已删除")
+                failed_job_ids.append(job_id)
+        if failed_job_ids:
+            conn.executemany('DELETE FROM apscheduler_jobs WHERE id = ?', [(job_id,) for job_id in failed_job_ids])
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (path={self.db_path})>"
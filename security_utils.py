@@ -8,120 +8,169 @@
 
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Tuple
 
-from werkzeug.security import safe_join
 from config import config
 from logger_config import get_logger
 
 logger = get_logger('security')
 
 
-class SecurityValidator:
-    """安全验证器"""
+class LogThrottle:
+    """
+    按客户端限制告警日志频率
 
-    def __init__(self):
-        self.news_dir = config.NEWS_DIR
-        self.allowed_pattern = config.ALLOWED_PATH_PATTERN
-        self.dangerous_chars = config.DANGEROUS_CHARS
+    每个客户端在 interval 秒内最多记录 burst 条，超出的只计数，
+    下一个周期的第一条日志附带被忽略的条数，扫描器无法用请求刷满日志
+    """
 
-    def is_safe_path(self, path: str) -> bool:
-        """
-        检查路径是否安全，防止目录遍历攻击
+    def __init__(self, interval: float, burst: int, max_clients: int = 4096):
+        self.interval = interval
+        self.burst = burst
+        self.max_clients = max_clients
+        self._windows: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
 
-        Args:
-            path: 要检查的路径
+    def allow(self, client: Optional[str]) -> Tuple[bool, int]:
+        """
+        判断是否记录本条日志
 
         Returns:
-            bool: 路径是否安全
+            Tuple[bool, int]: (是否记录, 上个周期被忽略的条数)
         """
-        try:
-            # 检查路径是否包含危险字符
-            if any(char in path for char in self.dangerous_chars):
-                logger.warning(f"路径包含危险字符: {path}")
-                return False
+        key = client or '-'
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                self._windows.move_to_end(key)
+                if len(self._windows) > self.max_clients:
+                    self._windows.popitem(last=False)
+                return True, suppressed
+            if window[1] < self.burst:
+                window[1] += 1
+                return True, 0
+            window[2] += 1
+            return False, 0
+
+    def warning(self, log, client: Optional[str], message: str) -> None:
+        """按频率限制记录告警"""
+        allowed, suppressed = self.allow(client)
+        if allowed:
+            if suppressed:
+                message += f"（此前 {config.SECURITY_LOG_INTERVAL} 秒内另有 {suppressed} 条同类日志被忽略）"
+            log.warning(f"[{client or '-'}] {message}")
+
+
+class NegativeCache:
+    """非法或不存在路径的短期缓存，重复请求不再访问磁盘"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """返回缓存的失败原因，未命中或已过期返回None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return entry[1]
 
-            # 检查是否包含绝对路径
-            if os.path.isabs(path):
-                logger.warning(f"不允许绝对路径: {path}")
-                return False
+    def put(self, key: str, reason: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, reason)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-            # 检查路径格式：应该是 YYYYMMDD/HH-MM-SS 格式
-            if not re.match(self.allowed_pattern, path):
-                logger.warning(f"路径格式不正确: {path}")
-                return False
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
 
-            return True
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
 
-        except Exception as e:
-            logger.error(f"路径安全检查时发生错误: {e}")
-            return False
 
-    def get_safe_file_path(self, news_path: str) -> Optional[str]:
+# 失败原因
+INVALID_PATH = 'invalid'
+NOT_FOUND = 'not_found'
+
+
+class SecurityValidator:
+    """安全验证器"""
+
+    def __init__(self):
+        self.allowed_pattern = config.ALLOWED_PATH_PATTERN
+        self.dangerous_chars = config.DANGEROUS_CHARS
+        # 预编译；ASCII 模式下 \d 只匹配 0-9，fullmatch 不接受末尾换行
+        self._allowed_re = re.compile(self.allowed_pattern, re.ASCII)
+        self.negative_cache = NegativeCache(config.SECURITY_NEGATIVE_TTL, config.SECURITY_NEGATIVE_CACHE_SIZE)
+        self.log_throttle = LogThrottle(config.SECURITY_LOG_INTERVAL, config.SECURITY_LOG_BURST)
+
+    def _check_format(self, path: str) -> Optional[str]:
+        """校验路径格式，返回失败原因，合法时返回None"""
+        if any(char in path for char in self.dangerous_chars):
+            return "路径包含危险字符"
+        if os.path.isabs(path):
+            return "不允许绝对路径"
+        # 路径格式：YYYYMMDD/HH-MM-SS，只含数字、一个 "/" 和 "-"，不可能跳出新闻目录
+        if self._allowed_re.fullmatch(path) is None:
+            return "路径格式不正确"
+        return None
+
+    def is_safe_path(self, path: str, client: Optional[str] = None) -> bool:
         """
-        获取安全的文件路径
+        检查路径是否安全，防止目录遍历攻击
 
         Args:
-            news_path: 新闻文件路径
+            path: 要检查的路径
+            client: 客户端地址，用于限制日志频率
 
         Returns:
-            Optional[str]: 安全的完整文件路径，如果不安全则返回None
+            bool: 路径是否安全
         """
+        if self.negative_cache.get(path) == INVALID_PATH:
+            return False
         try:
-            # 验证路径安全性
-            if not self.is_safe_path(news_path):
-                return None
-
-            # 添加.md扩展名
-            if not news_path.endswith('.md'):
-                news_path += '.md'
-
-            # 使用safe_join确保路径安全
-            safe_path = safe_join(self.news_dir, news_path)
-            if safe_path is None:
-                logger.warning(f"safe_join返回None: {news_path}")
-                return None
-
-            # 确保文件在news目录下
-            if not safe_path.startswith(self.news_dir):
-                logger.warning(f"文件不在news目录下: {safe_path}")
-                return None
-
-            return safe_path
-
+            reason = self._check_format(path)
         except Exception as e:
-            logger.error(f"获取安全文件路径时发生错误: {e}")
-            return None
+            logger.error(f"路径安全检查时发生错误: {e}")
+            return False
+        if reason is None:
+            return True
+        self.negative_cache.put(path, INVALID_PATH)
+        self.log_throttle.warning(logger, client, f"{reason}: {path!r}")
+        return False
 
-    def validate_file_access(self, file_path: str) -> Tuple[bool, str]:
+    def check_news_path(self, news_path: str, client: Optional[str] = None) -> Optional[str]:
         """
-        验证文件访问权限
-
-        Args:
-            file_path: 文件路径
+        读接口的快速检查：格式非法或最近确认不存在时直接返回原因
 
         Returns:
-            Tuple[bool, str]: (是否可访问, 错误消息)
+            Optional[str]: INVALID_PATH / NOT_FOUND，可以继续读取时返回None
         """
-        try:
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
-                return False, "文件不存在"
-
-            # 检查是否为文件
-            if not os.path.isfile(file_path):
-                return False, "不是有效的文件"
-
-            # 检查读取权限
-            if not os.access(file_path, os.R_OK):
-                return False, "没有读取权限"
+        cached = self.negative_cache.get(news_path)
+        if cached is not None:
+            return cached
+        return None if self.is_safe_path(news_path, client) else INVALID_PATH
 
-            return True, ""
-
-        except Exception as e:
-            logger.error(f"文件访问验证时发生错误: {e}")
-            return False, f"验证失败: {str(e)}"
+    def remember_missing(self, news_path: str, client: Optional[str] = None) -> None:
+        """记录不存在的新闻路径，TTL 内的重复请求不再访问磁盘"""
+        self.negative_cache.put(news_path, NOT_FOUND)
+        self.log_throttle.warning(logger, client, f"请求的新闻不存在: {news_path}")
 
 
 # 全局安全验证器实例
-security_validator = SecurityValidator()
\ No newline at end of file
+security_validator = SecurityValidator()
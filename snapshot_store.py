@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+网页快照存储模块
+按内容哈希保存抓取到的原始网页（压缩存储，内容未变化时不重复保存），每篇新闻总结关联其快照ID，
+用于排查总结问题和用新的提示词重新总结
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from json_store import JsonStore, fsync_directory
+from logger_config import get_logger
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，缺失时使用 zlib
+    zstandard = None
+
+logger = get_logger('snapshot_store')
+
+# zlib 预设字典的最大有效长度（窗口大小）
+ZLIB_DICT_SIZE = 32 * 1024
+
+
+class SnapshotStore:
+    """
+    内容寻址的快照存储
+
+    目录结构:
+        blobs/<ID前两位>/<ID>   快照文件：一行 JSON 头（编码、字典、原始大小）+ 压缩数据
+        dicts/<字典ID>.dict     压缩字典；dicts/current 记录新快照使用的字典
+        links.json              新闻路径 -> 快照ID
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.blobs_dir = os.path.join(directory, 'blobs')
+        self.dicts_dir = os.path.join(directory, 'dicts')
+        self.links = JsonStore(os.path.join(directory, 'links.json'))
+        self._dicts: Dict[str, bytes] = {}
+
+    @property
+    def codec(self) -> str:
+        return 'zstd' if zstandard is not None else 'zlib'
+
+    @staticmethod
+    def snapshot_id(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.blobs_dir, snapshot_id[:2], snapshot_id)
+
+    def exists(self, snapshot_id: str) -> bool:
+        return os.path.exists(self._blob_path(snapshot_id))
+
+    # 写入和读取
+
+    def put(self, content: str) -> str:
+        """
+        保存网页快照
+
+        内容已存在时只更新文件修改时间（用于保留期计算），不重复写入
+
+        Returns:
+            str: 快照ID（内容的 SHA-256）
+        """
+        snapshot_id = self.snapshot_id(content)
+        path = self._blob_path(snapshot_id)
+        try:
+            os.utime(path)
+            return snapshot_id
+        except FileNotFoundError:
+            pass
+
+        if config.SNAPSHOT_DICTIONARY and self.current_dict_id() is None:
+            self._maybe_train()
+        raw = content.encode('utf-8')
+        dict_id = self.current_dict_id() if config.SNAPSHOT_DICTIONARY else None
+        header = {'codec': self.codec, 'dict': dict_id, 'size': len(raw)}
+        data = json.dumps(header).encode('utf-8') + b'\n' + self._compress(raw, self.codec, dict_id)
+        self._write_bytes(path, data)
+        return snapshot_id
+
+    def get(self, snapshot_id: str) -> Optional[str]:
+        """读取快照内容，不存在时返回None"""
+        try:
+            with open(self._blob_path(snapshot_id), 'rb') as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return self._decompress(data, header['codec'], header.get('dict')).decode('utf-8')
+
+    def _write_bytes(self, path: str, data: bytes) -> None:
+        """原子写入（内容按哈希命名，并发写入同一快照时结果相同）"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                if config.FSYNC_POLICY != 'none':
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        if config.FSYNC_POLICY == 'full':
+            fsync_directory(directory)
+
+    def _compress(self, raw: bytes, codec: str, dict_id: Optional[str]) -> bytes:
+        dict_data = self._load_dict(dict_id) if dict_id else None
+        if codec == 'zstd':
+            zdict = zstandard.ZstdCompressionDict(dict_data) if dict_data else None
+            return zstandard.ZstdCompressor(level=config.SNAPSHOT_ZSTD_LEVEL, dict_data=zdict).compress(raw)
+        compressor = zlib.compressobj(config.SNAPSHOT_ZLIB_LEVEL, zdict=dict_data) if dict_data else \
+            zlib.compressobj(config.SNAPSHOT_ZLIB_LEVEL)
+        return compressor.compress(raw) + compressor.flush()
+
+    def _decompress(self, data: bytes, codec: str, dict_id: Optional[str]) -> bytes:
+        dict_data = self._load_dict(dict_id) if dict_id else None
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("该快照使用 zstd 压缩，需要安装 zstandard")
+            zdict = zstandard.ZstdCompressionDict(dict_data) if dict_data else None
+            return zstandard.ZstdDecompressor(dict_data=zdict).decompress(data)
+        decompressor = zlib.decompressobj(zdict=dict_data) if dict_data else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+    # 压缩字典
+
+    def current_dict_id(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.dicts_dir, 'current'), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _load_dict(self, dict_id: str) -> bytes:
+        if dict_id not in self._dicts:
+            with open(os.path.join(self.dicts_dir, f'{dict_id}.dict'), 'rb') as f:
+                self._dicts[dict_id] = f.read()
+        return self._dicts[dict_id]
+
+    def _maybe_train(self) -> None:
+        try:
+            if len(self._blob_ids()) >= config.SNAPSHOT_DICT_MIN_SAMPLES:
+                self.train_dictionary()
+        except Exception as e:
+            logger.error(f"训练快照压缩字典失败: {e}")
+
+    def train_dictionary(self, max_samples: Optional[int] = None) -> Optional[str]:
+        """
+        用最近的快照训练压缩字典，之后保存的快照使用该字典
+
+        zstd 使用 train_dictionary；zlib 使用最近一个快照开头的 32KB（页面模板、脚本等公共部分）作为预设字典
+
+        Returns:
+            Optional[str]: 字典ID，快照不足时返回None
+        """
+        max_samples = max_samples or config.SNAPSHOT_DICT_MAX_SAMPLES
+        blobs = sorted(self._blob_ids(), key=lambda item: item[1], reverse=True)[:max_samples]
+        samples = [self.get(snapshot_id).encode('utf-8') for snapshot_id, _ in blobs]
+        if not samples:
+            return None
+        if self.codec == 'zstd':
+            dict_data = zstandard.train_dictionary(config.SNAPSHOT_DICT_SIZE, samples).as_bytes()
+        else:
+            dict_data = samples[0][:ZLIB_DICT_SIZE]
+        dict_id = hashlib.sha256(dict_data).hexdigest()[:16]
+        self._write_bytes(os.path.join(self.dicts_dir, f'{dict_id}.dict'), dict_data)
+        self._write_bytes(os.path.join(self.dicts_dir, 'current'), dict_id.encode('utf-8'))
+        logger.info(f"快照压缩字典已更新: {dict_id}（{self.codec}，样本 {len(samples)} 个，{len(dict_data)} 字节）")
+        return dict_id
+
+    # 新闻关联
+
+    def link(self, news_path: str, snapshot_id: str) -> None:
+        """记录新闻总结使用的快照"""
+        with self.links.update() as links:
+            links[news_path] = snapshot_id
+
+    def snapshot_for(self, news_path: str) -> Optional[str]:
+        return self.links.load().get(news_path)
+
+    # 保留期
+
+    def _blob_ids(self) -> List[Tuple[str, float]]:
+        """全部快照 (ID, 修改时间)"""
+        blobs = []
+        try:
+            prefixes = os.listdir(self.blobs_dir)
+        except FileNotFoundError:
+            return blobs
+        for prefix in prefixes:
+            prefix_dir = os.path.join(self.blobs_dir, prefix)
+            for entry in os.scandir(prefix_dir):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    blobs.append((entry.name, entry.stat().st_mtime))
+        return blobs
+
+    def prune(self, cutoff_time: datetime) -> Dict[str, int]:
+        """
+        删除截止时间之前的快照（与 clean_old_news 一同执行）
+
+        仍被保留的新闻引用的快照不删除；不再被任何快照使用的旧字典一并删除
+
+        Returns:
+            Dict[str, int]: 删除的关联、快照、字典数
+        """
+        cutoff_date = cutoff_time.strftime('%Y%m%d')
+        with self.links.update() as links:
+            expired = [news_path for news_path in links if news_path[:8] < cutoff_date]
+            for news_path in expired:
+                del links[news_path]
+            referenced = set(links.values())
+
+        cutoff = cutoff_time.timestamp()
+        removed_blobs = 0
+        used_dicts = set()
+        for snapshot_id, mtime in self._blob_ids():
+            path = self._blob_path(snapshot_id)
+            if mtime < cutoff and snapshot_id not in referenced:
+                os.remove(path)
+                removed_blobs += 1
+                continue
+            with open(path, 'rb') as f:
+                used_dicts.add(json.loads(f.readline()).get('dict'))
+
+        removed_dicts = 0
+        current = self.current_dict_id()
+        try:
+            filenames = os.listdir(self.dicts_dir)
+        except FileNotFoundError:
+            filenames = []
+        for filename in filenames:
+            dict_id, ext = os.path.splitext(filename)
+            if ext == '.dict' and dict_id != current and dict_id not in used_dicts:
+                os.remove(os.path.join(self.dicts_dir, filename))
+                self._dicts.pop(dict_id, None)
+                removed_dicts += 1
+
+        for prefix in os.listdir(self.blobs_dir) if os.path.isdir(self.blobs_dir) else []:
+            try:
+                os.rmdir(os.path.join(self.blobs_dir, prefix))
+            except OSError:
+                pass
+
+        result = {'links': len(expired), 'snapshots': removed_blobs, 'dicts': removed_dicts}
+        logger.info(f"网页快照清理完成: {result}")
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        blobs = self._blob_ids()
+        stored = sum(os.path.getsize(self._blob_path(snapshot_id)) for snapshot_id, _ in blobs)
+        return {'codec': self.codec, 'snapshots': len(blobs), 'bytes': stored, 'dict': self.current_dict_id()}
+
+
+# 全局快照存储实例
+snapshot_store = SnapshotStore(config.SNAPSHOT_DIR)
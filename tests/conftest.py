@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""测试公共设置：从仓库根目录导入模块"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""关键词提醒：用本地 HTTP 接收端检查投递、重试、待投递目录持久化和放弃投递"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import config
+from news_alerts import AlertDispatcher, AlertOutbox, SubscriptionRegistry, check_webhook_url
+
+
+class Receiver:
+    """本地 webhook 接收端，按顺序返回给定的状态码（用完后重复最后一个）"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.received = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                receiver.received.append(json.loads(body))
+                status = receiver.statuses.pop(0) if len(receiver.statuses) > 1 else receiver.statuses[0]
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver_factory(monkeypatch):
+    monkeypatch.setattr(config, 'ALERT_ALLOW_PRIVATE_HOSTS', True)
+    monkeypatch.setattr(config, 'ALERT_RETRY_BASE_SECONDS', 0)
+    monkeypatch.setattr(config, 'ALERT_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(config, 'ALERT_TIMEOUT', 5)
+    receivers = []
+
+    def create(*statuses):
+        receivers.append(Receiver(statuses))
+        return receivers[-1]
+
+    yield create
+    for receiver in receivers:
+        receiver.close()
+
+
+def make_message(url):
+    return {
+        'subscription_id': 'sub1',
+        'url': url,
+        'attempts': 0,
+        'next_attempt_at': 0,
+        'payload': {'subscription_id': 'sub1', 'keywords': ['算力'], 'path': '20250101/08-00-00', 'items': []}
+    }
+
+
+def test_private_hosts_rejected_by_default(tmp_path):
+    assert config.ALERT_ALLOW_PRIVATE_HOSTS is False
+    for url in ('http://127.0.0.1:8080/hook', 'http://10.0.0.1/', 'http://169.254.169.254/latest', 'http://[::1]/'):
+        with pytest.raises(ValueError):
+            check_webhook_url(url)
+    registry = SubscriptionRegistry(str(tmp_path / 'subscriptions.json'))
+    with pytest.raises(ValueError):
+        registry.add(['算力'], 'http://127.0.0.1:8080/hook')
+
+
+def test_opt_in_allows_local_receiver(tmp_path, receiver_factory):
+    receiver = receiver_factory(200)
+    registry = SubscriptionRegistry(str(tmp_path / 'subscriptions.json'))
+    subscription = registry.add(['算力'], receiver.url)
+    assert registry.list() == [subscription]
+
+
+def test_retry_survives_restart(tmp_path, receiver_factory):
+    receiver = receiver_factory(500, 200)
+    outbox = AlertOutbox(str(tmp_path))
+    name = outbox.put(make_message(receiver.url))
+
+    dispatcher = AlertDispatcher(outbox)
+    dispatcher._deliver(name)
+    assert outbox.pending() == [name]
+    saved = outbox.load(name)
+    assert saved['attempts'] == 1
+    assert '500' in saved['last_error']
+
+    # 重启后从待投递目录继续
+    restarted = AlertDispatcher(AlertOutbox(str(tmp_path)))
+    restarted._deliver(name)
+    assert restarted.outbox.pending() == []
+    assert restarted.delivered == 1
+    assert len(receiver.received) == 2
+    assert receiver.received[-1]['path'] == '20250101/08-00-00'
+
+
+def test_gives_up_after_max_attempts(tmp_path, receiver_factory):
+    receiver = receiver_factory(500)
+    outbox = AlertOutbox(str(tmp_path))
+    name = outbox.put(make_message(receiver.url))
+
+    dispatcher = AlertDispatcher(outbox)
+    for _ in range(config.ALERT_MAX_ATTEMPTS):
+        dispatcher._deliver(name)
+    assert outbox.pending() == []
+    with open(os.path.join(outbox.failed_directory, name), 'r', encoding='utf-8') as f:
+        failed = json.load(f)
+    assert failed['attempts'] == config.ALERT_MAX_ATTEMPTS
+    assert '500' in failed['last_error']
+    assert dispatcher.failed == 1
+    assert len(receiver.received) == config.ALERT_MAX_ATTEMPTS
+
+
+def test_redirect_not_followed(tmp_path, receiver_factory):
+    receiver = receiver_factory(302)
+    outbox = AlertOutbox(str(tmp_path))
+    name = outbox.put(make_message(receiver.url))
+    AlertDispatcher(outbox)._deliver(name)
+    assert '302' in outbox.load(name)['last_error']
+
+
+def test_background_delivery(tmp_path, receiver_factory, monkeypatch):
+    monkeypatch.setattr(config, 'ALERT_POLL_INTERVAL', 0.1)
+    receiver = receiver_factory(200)
+    outbox = AlertOutbox(str(tmp_path))
+    dispatcher = AlertDispatcher(outbox)
+    dispatcher.start()
+    try:
+        outbox.put(make_message(receiver.url))
+        dispatcher.notify()
+        deadline = time.monotonic() + 5
+        while outbox.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        dispatcher.shutdown()
+    assert outbox.pending() == []
+    assert dispatcher.delivered == 1
+    assert len(receiver.received) == 1
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""录制/回放：经代理录制一次完整的抓取流程，停掉上游后回放仍能生成相同的总结"""
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmark import stub_server
+from cassette import use_cassette
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_news(work_dir):
+    """在工作目录中执行一次 news.py，返回新保存的总结"""
+    before = set(_summaries(work_dir))
+    proc = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'news.py')], cwd=work_dir,
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    added = sorted(set(_summaries(work_dir)) - before)
+    assert len(added) == 1
+    with open(added[0], 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _summaries(work_dir):
+    for root, _, names in os.walk(os.path.join(work_dir, 'news')):
+        for name in names:
+            yield os.path.join(root, name)
+
+
+def test_record_then_replay(tmp_path, monkeypatch):
+    cassette_dir = str(tmp_path / 'cassette')
+    work_dir = tmp_path / 'work'
+    work_dir.mkdir()
+
+    with stub_server() as base_url:
+        monkeypatch.setenv('NEWS_SOURCE_URL', f"{base_url}/telegraph")
+        monkeypatch.setenv('LLM_PROVIDERS', json.dumps(
+            [{'name': 'stub', 'base_url': f"{base_url}/v1", 'api_key': 'stub-key', 'model': 'stub-model'}]))
+        with use_cassette(cassette_dir, 'record') as server:
+            recorded = run_news(str(work_dir))
+            assert server.get_status()['recorded'] == 2
+
+    monkeypatch.delenv('LLM_PROVIDERS')
+    with use_cassette(cassette_dir, 'replay') as server:
+        replayed = run_news(str(work_dir))
+        status = server.get_status()
+    assert replayed == recorded
+    assert status['matched'] == 2
+    assert status['missing'] == 0 and status['errors'] == 0
+
+
+def test_replay_without_recording(tmp_path):
+    with use_cassette(str(tmp_path / 'empty'), 'replay') as server:
+        proc = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'news.py')], cwd=str(tmp_path),
+                              capture_output=True, text=True, timeout=120)
+        status = server.get_status()
+    assert proc.returncode != 0
+    assert status['missing'] >= 1
+    assert not os.path.isdir(tmp_path / 'news')
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+"""入口模块的导入耗时不超过 benchmark.IMPORT_TIME_BUDGETS_MS 中的预算"""
+
+import pytest
+
+from benchmark import IMPORT_TIME_BUDGETS_MS, measure_import_time
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_TIME_BUDGETS_MS))
+def test_import_time_within_budget(module):
+    elapsed = measure_import_time(module)
+    assert elapsed <= IMPORT_TIME_BUDGETS_MS[module], f"导入 {module} 耗时 {elapsed}ms"
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""接口限流：接口整体已满时不扣减客户端的额度，令牌桶存储的清理"""
+
+import time
+
+import pytest
+
+from config import config
+from rate_limiter import MemoryRateStore, RateLimiter, SQLiteRateStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryRateStore()
+    return SQLiteRateStore(str(tmp_path / 'rate_limit.db'))
+
+
+def test_global_rejection_refunds_client_token(store, monkeypatch):
+    monkeypatch.setattr(config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(config, 'RATE_LIMIT_GLOBAL_FACTOR', 1)
+    limiter = RateLimiter(store)
+    per_minute, burst = 0.001, 2
+
+    # 客户端 a 用完接口整体的额度后，客户端 b 被拒绝，但自己的令牌不减少
+    assert limiter.check('run', 'a', per_minute, burst)[0]
+    assert limiter.check('run', 'a', per_minute, burst)[0]
+    for _ in range(3):
+        assert not limiter.check('run', 'b', per_minute, burst)[0]
+    assert store.take('run|b', per_minute / 60, burst, cost=burst)[0]
+
+
+def test_refund_does_not_exceed_burst(store):
+    store.take('run|a', 1.0, 2)
+    store.refund('run|a', 1.0, 2)
+    store.refund('run|a', 1.0, 2)
+    assert not store.take('run|a', 0.0, 2, cost=3)[0]
+    assert store.take('run|a', 0.0, 2, cost=2)[0]
+
+
+def test_prune_removes_idle_buckets(tmp_path):
+    store = SQLiteRateStore(str(tmp_path / 'rate_limit.db'))
+    store.take('news|idle', 1.0, 5)
+    store.take('news|active', 1.0, 5)
+    conn = store._connect()
+    conn.execute('UPDATE buckets SET updated = ? WHERE key = ?', (time.time() - 7200, 'news|idle'))
+
+    assert store.prune() == 1
+    assert [row[0] for row in conn.execute('SELECT key FROM buckets')] == ['news|active']
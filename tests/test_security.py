@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""路径校验：目录遍历输入一律拒绝，被接受的路径解析后都在新闻目录内"""
+
+import pytest
+
+from benchmark import check_path_validation, generate_traversal_inputs
+from security_utils import INVALID_PATH, SecurityValidator
+
+
+@pytest.fixture
+def validator():
+    validator = SecurityValidator()
+    validator.log_throttle.burst = 0
+    return validator
+
+
+def test_random_traversal_inputs(tmp_path):
+    result = check_path_validation(str(tmp_path))
+    assert result['violations'] == []
+
+
+@pytest.mark.parametrize('value', generate_traversal_inputs(0))
+def test_known_traversal_inputs_rejected(validator, value):
+    assert not validator.is_safe_path(value)
+    assert validator.check_news_path(value) == INVALID_PATH
+
+
+def test_valid_path_accepted(validator):
+    assert validator.is_safe_path('20250927/18-02-58')
+    assert validator.check_news_path('20250927/18-02-58') is None
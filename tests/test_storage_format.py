@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""总结格式的记录：文件后端按扩展名、SQLite 后端按 format 列，读取时不按内容判断"""
+
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from migrate_storage import fix_formats
+from news_parser import JSON, MARKDOWN, dump_summary, to_document
+from news_storage import FileStorage, SQLiteStorage
+
+MARKDOWN_SUMMARY = '## 金融\n- 央行<font color="red">降准</font>0.5个百分点\n'
+JSON_SUMMARY = dump_summary(to_document(MARKDOWN_SUMMARY))
+RUN_TIME = datetime(2026, 10, 19, 9, 0, 0)
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'file':
+        return FileStorage(str(tmp_path / 'news'))
+    return SQLiteStorage(str(tmp_path / 'news.db'))
+
+
+def test_round_trip_keeps_format(storage):
+    json_path = storage.save(JSON_SUMMARY, RUN_TIME, fmt=JSON)
+    markdown_path = storage.save(MARKDOWN_SUMMARY, RUN_TIME)
+
+    # 同一秒的第二次保存顺延，不覆盖另一种格式的总结
+    assert json_path != markdown_path
+    assert storage.read_summary(json_path) == (JSON_SUMMARY, JSON)
+    assert storage.read_summary(markdown_path) == (MARKDOWN_SUMMARY, MARKDOWN)
+    assert sorted(run[3] for run in storage.iter_runs()) == [JSON, MARKDOWN]
+
+
+def test_file_extension_follows_format(tmp_path):
+    storage = FileStorage(str(tmp_path / 'news'))
+    path = storage.save(JSON_SUMMARY, RUN_TIME, fmt=JSON)
+    assert os.listdir(tmp_path / 'news' / '20261019') == ['09-00-00.json']
+
+    storage.save(MARKDOWN_SUMMARY, RUN_TIME, overwrite=True)
+    assert os.listdir(tmp_path / 'news' / '20261019') == ['09-00-00.md']
+    assert storage.read_summary(path) == (MARKDOWN_SUMMARY, MARKDOWN)
+
+
+def test_fix_formats_renames_legacy_json(tmp_path):
+    storage = FileStorage(str(tmp_path / 'news'))
+    storage.save(MARKDOWN_SUMMARY, RUN_TIME)
+    legacy = tmp_path / 'news' / '20261019' / '09-05-00.md'
+    legacy.write_text(JSON_SUMMARY, encoding='utf-8')
+
+    assert fix_formats(storage) == 1
+    assert sorted(os.listdir(tmp_path / 'news' / '20261019')) == ['09-00-00.md', '09-05-00.json']
+    assert storage.read_summary('20261019/09-05-00') == (JSON_SUMMARY, JSON)
+
+
+def test_sqlite_adds_format_column(tmp_path):
+    db_path = str(tmp_path / 'news.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE runs (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, "
+        "run_time TEXT NOT NULL, content TEXT NOT NULL, saved_at TEXT NOT NULL)"
+    )
+    rows = [('20261019/09-00-00', JSON_SUMMARY), ('20261019/09-00-01', MARKDOWN_SUMMARY)]
+    for path, content in rows:
+        conn.execute(
+            "INSERT INTO runs (path, run_time, content, saved_at) VALUES (?, ?, ?, ?)",
+            (path, RUN_TIME.isoformat(), content, RUN_TIME.isoformat())
+        )
+    conn.commit()
+    conn.close()
+
+    storage = SQLiteStorage(db_path)
+    assert storage.read_summary('20261019/09-00-00') == (JSON_SUMMARY, JSON)
+    assert storage.read_summary('20261019/09-00-01') == (MARKDOWN_SUMMARY, MARKDOWN)
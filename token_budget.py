@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+token预算模块
+估算提示词token数、按预算截断网页内容，并记录每次运行和每天的token用量
+"""
+
+import html
+import re
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from config import config
+from json_store import JsonStore
+from logger_config import get_logger
+
+logger = get_logger('token_budget')
+
+# 中日韩字符和全角标点，常见分词器中约1个字符1个token
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+# 其余字符约4个字符1个token
+CHARS_PER_TOKEN = 4
+
+DROP_BLOCK_PATTERN = re.compile(r'<(script|style|noscript|svg|template|head)\b.*?</\1\s*>', re.S | re.I)
+COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.S)
+BLOCK_TAG_PATTERN = re.compile(r'<(?:br|/p|/div|/li|/h\d|/tr|/section|/article)\b[^>]*>', re.I)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+BLANK_PATTERN = re.compile(r'[ \t\r\f\v\u00a0]+')
+BLANK_LINES_PATTERN = re.compile(r'\n\s*\n+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数（启发式，偏保守）
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def extract_text(html_content: str) -> str:
+    """
+    从网页中提取正文文本
+
+    去掉脚本、样式、注释和标签，块级标签换行，合并空白。
+    电报页面的 HTML 中大部分是脚本和样式，提取后token数通常只有原来的一小部分。
+    """
+    text = DROP_BLOCK_PATTERN.sub(' ', html_content)
+    text = COMMENT_PATTERN.sub(' ', text)
+    text = BLOCK_TAG_PATTERN.sub('\n', text)
+    text = TAG_PATTERN.sub(' ', text)
+    text = html.unescape(text)
+    text = BLANK_PATTERN.sub(' ', text)
+    text = BLANK_LINES_PATTERN.sub('\n', text)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    截断文本使估算token数不超过上限
+
+    电报页面按时间倒序排列，保留开头即保留最新的新闻；尽量在换行处截断
+    """
+    if max_tokens <= 0:
+        return ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # 二分查找最长的前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+
+    cut = text.rfind('\n', 0, low)
+    return text[:cut] if cut > low // 2 else text[:low]
+
+
+class TokenLedger:
+    """
+    token用量记录
+
+    文件结构:
+        {'days': {YYYYMMDD: {'prompt_tokens', 'completion_tokens', 'total_tokens', 'calls', 'latency_seconds'}},
+         'runs': [{'run_time', 'provider', 'model', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+                   'estimated_prompt_tokens', 'truncated', 'latency_seconds'}]}
+    """
+
+    def __init__(self, path: str):
+        self.store = JsonStore(path)
+
+    @staticmethod
+    def _day_key(when: Optional[datetime] = None) -> str:
+        return (when or datetime.now()).strftime('%Y%m%d')
+
+    def record_call(self, usage: Any, latency: float, when: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        记录一次 chat.completions 调用的用量（包括对冲请求中未被采用的调用）
+
+        Args:
+            usage: response.usage，服务未返回时为None
+            latency: 调用耗时（秒）
+            when: 调用时间，默认为当前时间
+
+        Returns:
+            Dict[str, int]: 本次调用的token数
+        """
+        tokens = usage_to_dict(usage)
+        day_key = self._day_key(when)
+        with self.store.update() as data:
+            days = data.setdefault('days', {})
+            day = days.setdefault(day_key, {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0,
+                                            'calls': 0, 'latency_seconds': 0.0})
+            for key, value in tokens.items():
+                day[key] += value
+            day['calls'] += 1
+            day['latency_seconds'] = round(day['latency_seconds'] + latency, 3)
+
+            # 只保留最近的天数
+            for old_key in sorted(days)[:-config.TOKEN_USAGE_KEEP_DAYS]:
+                del days[old_key]
+        return tokens
+
+    def record_run(self, record: Dict[str, Any]) -> None:
+        """记录一次运行的用量汇总"""
+        with self.store.update() as data:
+            runs = data.setdefault('runs', [])
+            runs.append(record)
+            del runs[:-config.TOKEN_USAGE_KEEP_RUNS]
+
+    def used_today(self, when: Optional[datetime] = None) -> int:
+        """当天已使用的token数"""
+        day = self.store.load().get('days', {}).get(self._day_key(when))
+        return day['total_tokens'] if day else 0
+
+    def prompt_budget(self, when: Optional[datetime] = None) -> Optional[int]:
+        """
+        本次运行可用的提示词token数
+
+        Returns:
+            Optional[int]: 可用token数，不限制时返回None；当天预算用完时返回0
+        """
+        limits = []
+        if config.TOKEN_BUDGET_PER_RUN > 0:
+            limits.append(config.TOKEN_BUDGET_PER_RUN)
+        if config.TOKEN_BUDGET_PER_DAY > 0:
+            # 为输出预留空间
+            remaining = config.TOKEN_BUDGET_PER_DAY - self.used_today(when) - config.LLM_MAX_OUTPUT_TOKENS
+            limits.append(max(0, remaining))
+        return min(limits) if limits else None
+
+    def get_status(self) -> Dict[str, Any]:
+        """用量和预算（用于状态接口）"""
+        data = self.store.load()
+        today_key = self._day_key()
+        today = data.get('days', {}).get(today_key, {})
+        used = today.get('total_tokens', 0)
+        runs = data.get('runs', [])
+        return {
+            'budget_per_run': config.TOKEN_BUDGET_PER_RUN or None,
+            'budget_per_day': config.TOKEN_BUDGET_PER_DAY or None,
+            'today': dict(today, date=today_key),
+            'remaining_today': max(0, config.TOKEN_BUDGET_PER_DAY - used) if config.TOKEN_BUDGET_PER_DAY else None,
+            'last_run': runs[-1] if runs else None,
+            'days': {key: value['total_tokens'] for key, value in sorted(data.get('days', {}).items())}
+        }
+
+
+def usage_to_dict(usage: Any) -> Dict[str, int]:
+    """将 response.usage 转换为字典，缺失字段记为0"""
+    return {
+        key: int(getattr(usage, key, 0) or 0)
+        for key in ('prompt_tokens', 'completion_tokens', 'total_tokens')
+    }
+
+
+def fit_prompt(build, content: str, budget: Optional[int]) -> Optional[Tuple[str, int, bool]]:
+    """
+    按预算生成提示词
+
+    Args:
+        build: 生成提示词的函数，参数为网页内容
+        content: 网页内容
+        budget: 可用的提示词token数，None表示不限制
+
+    Returns:
+        Optional[Tuple[str, int, bool]]: (提示词, 估算token数, 是否截断了内容)；
+            预算连提示词模板都放不下、截断后没有内容时为None，不应再调用LLM
+    """
+    prompt = build(content)
+    estimated = estimate_tokens(prompt)
+    if budget is None or estimated <= budget:
+        return prompt, estimated, False
+
+    overhead = estimate_tokens(build(''))
+    content = truncate_to_tokens(content, budget - overhead)
+    if not content.strip():
+        return None
+    prompt = build(content)
+    return prompt, estimate_tokens(prompt), True
+
+
+# 全局用量记录实例
+token_ledger = TokenLedger(config.TOKEN_USAGE_PATH)